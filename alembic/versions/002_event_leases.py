@@ -0,0 +1,24 @@
+"""Lease columns on email_events for multi-replica work claiming.
+
+Revision ID: 002_event_leases
+Revises: 001_initial
+Create Date: 2026-10-19
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "002_event_leases"
+down_revision = "001_initial"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("email_events", sa.Column("lease_owner", sa.String(255), nullable=True))
+    op.add_column("email_events", sa.Column("lease_expires_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("email_events", "lease_expires_at")
+    op.drop_column("email_events", "lease_owner")
@@ -0,0 +1,22 @@
+"""Record prompt input tokens saved by body trimming per draft.
+
+Revision ID: 003_draft_tokens_saved
+Revises: 002_event_leases
+Create Date: 2026-10-19
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "003_draft_tokens_saved"
+down_revision = "002_event_leases"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("email_drafts", sa.Column("input_tokens_saved", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("email_drafts", "input_tokens_saved")
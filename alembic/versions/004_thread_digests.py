@@ -0,0 +1,36 @@
+"""Per-thread rolling context digests.
+
+Revision ID: 004_thread_digests
+Revises: 003_draft_tokens_saved
+Create Date: 2026-10-19
+"""
+
+import uuid
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "004_thread_digests"
+down_revision = "003_draft_tokens_saved"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "thread_digests",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4),
+        sa.Column("thread_id", sa.String(255), unique=True, nullable=False, index=True),
+        sa.Column("mailbox_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("mailboxes.id"), nullable=False),
+        sa.Column("summary", sa.Text(), nullable=False, server_default=""),
+        sa.Column("previous_summary", sa.Text(), nullable=False, server_default=""),
+        sa.Column("message_count", sa.Integer(), server_default=sa.text("0")),
+        sa.Column("last_event_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("email_events.id"), nullable=True),
+        sa.Column("last_received_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("thread_digests")
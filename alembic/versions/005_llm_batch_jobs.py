@@ -0,0 +1,42 @@
+"""Offline LLM batch jobs for normal-priority mail.
+
+Revision ID: 005_llm_batch_jobs
+Revises: 004_thread_digests
+Create Date: 2026-10-19
+"""
+
+import uuid
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "005_llm_batch_jobs"
+down_revision = "004_thread_digests"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "llm_batch_jobs",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4),
+        sa.Column("provider_batch_id", sa.String(255), nullable=True, index=True),
+        sa.Column("input_file_id", sa.String(255), nullable=True),
+        sa.Column("output_file_id", sa.String(255), nullable=True),
+        sa.Column("error_file_id", sa.String(255), nullable=True),
+        sa.Column("status", sa.String(50), server_default="submitted"),
+        sa.Column("request_count", sa.Integer(), server_default=sa.text("0")),
+        sa.Column("request_meta", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+    )
+    op.add_column(
+        "email_events",
+        sa.Column("batch_job_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("llm_batch_jobs.id"), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("email_events", "batch_job_id")
+    op.drop_table("llm_batch_jobs")
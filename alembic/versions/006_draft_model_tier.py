@@ -0,0 +1,24 @@
+"""Record model and routing tier per draft.
+
+Revision ID: 006_draft_model_tier
+Revises: 005_llm_batch_jobs
+Create Date: 2026-10-19
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "006_draft_model_tier"
+down_revision = "005_llm_batch_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("email_drafts", sa.Column("model", sa.String(100), nullable=True))
+    op.add_column("email_drafts", sa.Column("model_tier", sa.String(20), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("email_drafts", "model_tier")
+    op.drop_column("email_drafts", "model")
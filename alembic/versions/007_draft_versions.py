@@ -0,0 +1,38 @@
+"""Draft version history for change requests.
+
+Revision ID: 007_draft_versions
+Revises: 006_draft_model_tier
+Create Date: 2026-10-19
+"""
+
+import uuid
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "007_draft_versions"
+down_revision = "006_draft_model_tier"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "draft_versions",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4),
+        sa.Column("draft_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("email_drafts.id"), nullable=False, index=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("body_text", sa.Text(), nullable=False),
+        sa.Column("body_hash", sa.String(64), nullable=True),
+        sa.Column("model", sa.String(100), nullable=True),
+        sa.Column("feedback", sa.Text(), nullable=True),
+        sa.Column("regeneration_mode", sa.String(20), nullable=True),
+        sa.Column("regeneration_ms", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.UniqueConstraint("draft_id", "version"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("draft_versions")
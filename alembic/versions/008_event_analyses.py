@@ -0,0 +1,38 @@
+"""Per-event analysis computed at ingestion.
+
+Revision ID: 008_event_analyses
+Revises: 007_draft_versions
+Create Date: 2026-10-19
+"""
+
+import uuid
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "008_event_analyses"
+down_revision = "007_draft_versions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "event_analyses",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4),
+        sa.Column("email_event_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("email_events.id"), nullable=False, unique=True),
+        sa.Column("kb_version", sa.String(64), nullable=False),
+        sa.Column("priority", sa.String(20), nullable=True),
+        sa.Column("compliance_flags", sa.JSON(), nullable=False, server_default="[]"),
+        sa.Column("prompt_body", sa.Text(), nullable=False, server_default=""),
+        sa.Column("input_tokens", sa.Integer(), nullable=True),
+        sa.Column("tokens_saved", sa.Integer(), nullable=True),
+        sa.Column("category", sa.String(100), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("event_analyses")
@@ -0,0 +1,38 @@
+"""Token usage, latency and cost per LLM generation.
+
+Revision ID: 009_llm_usage
+Revises: 008_event_analyses
+Create Date: 2026-10-19
+"""
+
+import uuid
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "009_llm_usage"
+down_revision = "008_event_analyses"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "llm_usage",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4),
+        sa.Column("draft_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("email_drafts.id"), nullable=False, index=True),
+        sa.Column("mailbox_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("mailboxes.id"), nullable=False),
+        sa.Column("purpose", sa.String(20), nullable=False),
+        sa.Column("model", sa.String(100), nullable=False),
+        sa.Column("tone", sa.String(50), nullable=True),
+        sa.Column("prompt_tokens", sa.Integer(), server_default="0"),
+        sa.Column("completion_tokens", sa.Integer(), server_default="0"),
+        sa.Column("latency_ms", sa.Integer(), nullable=True),
+        sa.Column("cost_usd", sa.Numeric(12, 6), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), index=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("llm_usage")
@@ -0,0 +1,41 @@
+"""Persistent outbound queue for Slack approval messages.
+
+Revision ID: 010_slack_outbox
+Revises: 009_llm_usage
+Create Date: 2026-10-19
+"""
+
+import uuid
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "010_slack_outbox"
+down_revision = "009_llm_usage"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "slack_outbox",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4),
+        sa.Column("draft_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("email_drafts.id"), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("recipient", sa.String(50), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False, server_default="pending", index=True),
+        sa.Column("single", sa.Boolean(), server_default=sa.false()),
+        sa.Column("attempts", sa.Integer(), server_default="0"),
+        sa.Column("next_attempt_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("channel_id", sa.String(50), nullable=True),
+        sa.Column("message_ts", sa.String(50), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("sent_at", sa.DateTime(), nullable=True),
+        sa.UniqueConstraint("draft_id", "version"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("slack_outbox")
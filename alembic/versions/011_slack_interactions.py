@@ -0,0 +1,37 @@
+"""Processed Slack interactions for idempotent handling of redeliveries.
+
+Revision ID: 011_slack_interactions
+Revises: 010_slack_outbox
+Create Date: 2026-10-19
+"""
+
+import uuid
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "011_slack_interactions"
+down_revision = "010_slack_outbox"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "slack_interactions",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4),
+        sa.Column("fingerprint", sa.String(64), nullable=False, unique=True),
+        sa.Column("action_id", sa.String(50), nullable=False),
+        sa.Column("draft_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("email_drafts.id"), nullable=False),
+        sa.Column("draft_version", sa.Integer(), nullable=False),
+        sa.Column("message_ts", sa.String(50), nullable=True),
+        sa.Column("status", sa.String(20), nullable=False, server_default="processing"),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("slack_interactions")
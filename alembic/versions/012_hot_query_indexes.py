@@ -0,0 +1,52 @@
+"""Indexes for the hot queries (claiming, queue stats, draft/event lists, KB defaults).
+
+Built CONCURRENTLY so the migration does not block writes on large tables.
+
+Revision ID: 012_hot_query_indexes
+Revises: 011_slack_interactions
+Create Date: 2026-10-19
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "012_hot_query_indexes"
+down_revision = "011_slack_interactions"
+branch_labels = None
+depends_on = None
+
+# name, table, columns, partial index predicate
+INDEXES = [
+    # claim_unprocessed_events, batch claiming, queue_depths, in-flight counts
+    ("ix_email_events_unprocessed_received_at", "email_events", ["received_at"], "is_processed = false"),
+    # GET /api/events ordered by received_at desc
+    ("ix_email_events_received_at", "email_events", ["received_at"], None),
+    ("ix_email_events_mailbox_id", "email_events", ["mailbox_id"], None),
+    # GET /api/drafts?status=..., /api/notify, bulk approval
+    ("ix_email_drafts_status_created_at", "email_drafts", ["status", "created_at"], None),
+    ("ix_email_drafts_created_at", "email_drafts", ["created_at"], None),
+    # event.drafts, ~EmailEvent.drafts.any(), scheduler lookups
+    ("ix_email_drafts_email_event_id", "email_drafts", ["email_event_id"], None),
+    # default tone/signature lookups on every generation
+    ("ix_kb_tones_is_default", "kb_tones", ["is_default"], "is_default = true"),
+    ("ix_kb_signatures_is_default", "kb_signatures", ["is_default"], "is_default = true"),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
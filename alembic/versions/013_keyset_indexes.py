@@ -0,0 +1,40 @@
+"""Keyset pagination indexes: (sort column, id) for the draft and event lists.
+
+Replace the single-column sort indexes from 012, which cannot answer the
+(created_at, id) / (received_at, id) row comparison on their own.
+
+Revision ID: 013_keyset_indexes
+Revises: 012_hot_query_indexes
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "013_keyset_indexes"
+down_revision = "012_hot_query_indexes"
+branch_labels = None
+depends_on = None
+
+# new index, table, columns, replaced index, its columns
+INDEXES = [
+    ("ix_email_drafts_created_at_id", "email_drafts", ["created_at", "id"],
+     "ix_email_drafts_created_at", ["created_at"]),
+    ("ix_email_drafts_status_created_at_id", "email_drafts", ["status", "created_at", "id"],
+     "ix_email_drafts_status_created_at", ["status", "created_at"]),
+    ("ix_email_events_received_at_id", "email_events", ["received_at", "id"],
+     "ix_email_events_received_at", ["received_at"]),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, replaced, _ in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+            op.drop_index(replaced, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, replaced, replaced_columns in INDEXES:
+            op.create_index(replaced, table, replaced_columns, postgresql_concurrently=True, if_not_exists=True)
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,63 @@
+"""Side tables for zstd-compressed mail and draft bodies.
+
+The body columns of email_events / email_drafts stay until every row has been
+moved over (scripts/backfill_bodies.py, online and in batches); the ORM only
+reads them for rows that were not backfilled yet.
+
+Revision ID: 014_body_tables
+Revises: 013_keyset_indexes
+Create Date: 2026-10-19
+"""
+
+import sqlalchemy as sa
+import zstandard
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "014_body_tables"
+down_revision = "013_keyset_indexes"
+branch_labels = None
+depends_on = None
+
+# side table, its key column, parent table
+TABLES = [
+    ("email_event_bodies", "email_event_id", "email_events"),
+    ("email_draft_bodies", "email_draft_id", "email_drafts"),
+]
+
+
+def upgrade() -> None:
+    for table, key, parent in TABLES:
+        op.create_table(
+            table,
+            sa.Column(
+                key, postgresql.UUID(as_uuid=True),
+                sa.ForeignKey(f"{parent}.id", ondelete="CASCADE"), primary_key=True,
+            ),
+            sa.Column("body_text", sa.LargeBinary(), nullable=True),
+            sa.Column("body_html", sa.LargeBinary(), nullable=True),
+        )
+        # Already compressed: TOAST should move large values out of line, not pglz them again
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN body_text SET STORAGE EXTERNAL")
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN body_html SET STORAGE EXTERNAL")
+    op.alter_column("email_drafts", "body_text", existing_type=sa.Text(), nullable=True)
+
+
+def downgrade() -> None:
+    # Move the bodies back into the parent tables before dropping the side tables
+    conn = op.get_bind()
+    decompressor = zstandard.ZstdDecompressor()
+
+    def text_of(value):
+        return decompressor.decompress(value).decode("utf-8") if value is not None else None
+
+    for table, key, parent in TABLES:
+        rows = conn.execute(sa.text(f"SELECT {key}, body_text, body_html FROM {table}")).fetchall()
+        for row_id, body_text, body_html in rows:
+            conn.execute(
+                sa.text(f"UPDATE {parent} SET body_text = :text, body_html = :html WHERE id = :id"),
+                {"id": row_id, "text": text_of(body_text), "html": text_of(body_html)},
+            )
+        op.drop_table(table)
+    op.execute("UPDATE email_drafts SET body_text = '' WHERE body_text IS NULL")
+    op.alter_column("email_drafts", "body_text", existing_type=sa.Text(), nullable=False)
@@ -0,0 +1,147 @@
+"""Monthly range partitioning of email_events by received_at; per-mailbox retention.
+
+Rebuilds email_events as a partitioned table and copies the existing rows month
+by month. Unique keys of a partitioned table must include the partition key, so
+the primary key becomes (id, received_at), gmail_message_id is unique together
+with received_at, and the foreign keys pointing at email_events are dropped.
+
+The copy holds an exclusive lock on email_events until it is done: stop the
+app (polling, agent) for the duration. New partitions are created ahead of time
+by the retention job (services/retention.py); mail dated outside every partition
+lands in email_events_default.
+
+Revision ID: 015_partition_email_events
+Revises: 014_body_tables
+Create Date: 2026-10-19
+"""
+
+import uuid
+from datetime import datetime
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "015_partition_email_events"
+down_revision = "014_body_tables"
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+COLUMNS = [
+    "id", "mailbox_id", "gmail_message_id", "thread_id", "sender", "recipient", "subject",
+    "body_text", "body_html", "received_at", "category", "cc", "bcc", "priority", "is_processed",
+    "lease_owner", "lease_expires_at", "batch_job_id", "created_at",
+]
+
+# Foreign keys to email_events.id: constraint, table, column, ondelete
+REFERENCES = [
+    ("email_drafts_email_event_id_fkey", "email_drafts", "email_event_id", None),
+    ("event_analyses_email_event_id_fkey", "event_analyses", "email_event_id", None),
+    ("email_event_bodies_email_event_id_fkey", "email_event_bodies", "email_event_id", "CASCADE"),
+    ("thread_digests_last_event_id_fkey", "thread_digests", "last_event_id", None),
+]
+
+# name, columns, unique, where
+INDEXES = [
+    ("ix_email_events_mailbox_id", ["mailbox_id"], False, None),
+    ("ix_email_events_thread_id", ["thread_id"], False, None),
+    ("ix_email_events_received_at_id", ["received_at", "id"], False, None),
+    ("ix_email_events_unprocessed_received_at", ["received_at"], False, "is_processed = false"),
+]
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def _create_table(name: str, partitioned: bool) -> None:
+    op.create_table(
+        name,
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False, default=uuid.uuid4),
+        sa.Column("mailbox_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("mailboxes.id"), nullable=False),
+        sa.Column("gmail_message_id", sa.String(255)),
+        sa.Column("thread_id", sa.String(255)),
+        sa.Column("sender", sa.String(255), nullable=False),
+        sa.Column("recipient", sa.String(255), nullable=False),
+        sa.Column("subject", sa.String(500), nullable=True),
+        sa.Column("body_text", sa.Text(), nullable=True),
+        sa.Column("body_html", sa.Text(), nullable=True),
+        sa.Column("received_at", sa.DateTime(), nullable=False),
+        sa.Column("category", sa.String(100), nullable=True),
+        sa.Column("cc", sa.Text(), nullable=True),
+        sa.Column("bcc", sa.Text(), nullable=True),
+        sa.Column("priority", sa.String(20), server_default="normal"),
+        sa.Column("is_processed", sa.Boolean(), server_default=sa.text("false")),
+        sa.Column("lease_owner", sa.String(255), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(), nullable=True),
+        sa.Column("batch_job_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("llm_batch_jobs.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint(*(["id", "received_at"] if partitioned else ["id"]), name="email_events_pkey"),
+        **({"postgresql_partition_by": "RANGE (received_at)"} if partitioned else {}),
+    )
+
+
+def _create_indexes(gmail_message_id_columns: list[str]) -> None:
+    for name, columns, unique, where in INDEXES:
+        op.create_index(
+            name, "email_events", columns, unique=unique,
+            postgresql_where=sa.text(where) if where else None,
+        )
+    op.create_index("ix_email_events_gmail_message_id", "email_events", gmail_message_id_columns, unique=True)
+
+
+def _copy(source: str, where: str = "", params: dict | None = None) -> None:
+    columns = ", ".join(COLUMNS)
+    op.get_bind().execute(
+        sa.text(f"INSERT INTO email_events ({columns}) SELECT {columns} FROM {source} {where}"),
+        params or {},
+    )
+
+
+def upgrade() -> None:
+    op.add_column("mailboxes", sa.Column("retention_days", sa.Integer(), nullable=True))
+
+    for constraint, table, _, _ in REFERENCES:
+        op.drop_constraint(constraint, table, type_="foreignkey")
+
+    op.rename_table("email_events", "email_events_unpartitioned")
+    op.execute("ALTER TABLE email_events_unpartitioned RENAME CONSTRAINT email_events_pkey TO email_events_unpartitioned_pkey")
+    _create_table("email_events", partitioned=True)
+
+    conn = op.get_bind()
+    now = datetime.utcnow()
+    first = conn.execute(sa.text("SELECT min(received_at) FROM email_events_unpartitioned")).scalar() or now
+    month = first.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last = _add_months(now.replace(day=1, hour=0, minute=0, second=0, microsecond=0), MONTHS_AHEAD)
+    while month <= last:
+        upper = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE email_events_p{month:%Y_%m} PARTITION OF email_events "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+        )
+        _copy("email_events_unpartitioned", "WHERE received_at >= :lower AND received_at < :upper",
+              {"lower": month, "upper": upper})
+        month = upper
+    op.execute("CREATE TABLE email_events_default PARTITION OF email_events DEFAULT")
+    _copy("email_events_unpartitioned", "WHERE received_at >= :lower", {"lower": month})
+
+    op.drop_table("email_events_unpartitioned")
+    _create_indexes(["gmail_message_id", "received_at"])
+    op.execute("ANALYZE email_events")
+
+
+def downgrade() -> None:
+    op.rename_table("email_events", "email_events_partitioned")
+    op.execute("ALTER TABLE email_events_partitioned RENAME CONSTRAINT email_events_pkey TO email_events_partitioned_pkey")
+    _create_table("email_events", partitioned=False)
+    _copy("email_events_partitioned")
+    # Drops every partition with it
+    op.drop_table("email_events_partitioned")
+    _create_indexes(["gmail_message_id"])
+
+    for constraint, table, column, ondelete in REFERENCES:
+        op.create_foreign_key(constraint, table, "email_events", [column], ["id"], ondelete=ondelete)
+    op.drop_column("mailboxes", "retention_days")
@@ -0,0 +1,50 @@
+"""Full-text search column on email_events with a GIN index.
+
+search_vector is filled by the app (the bodies are stored compressed, so it
+cannot be a generated column); rows from before this revision are not found
+by the search until scripts/backfill_search.py has indexed them (online, in
+batches, safe to rerun).
+
+CREATE INDEX CONCURRENTLY is not supported on a partitioned table, so the index
+is created on the parent only (invalid), built concurrently on every partition
+and attached; once all partitions are attached the parent index becomes valid
+and new partitions get it automatically.
+
+Revision ID: 016_event_search_vector
+Revises: 015_partition_email_events
+Create Date: 2026-10-19
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "016_event_search_vector"
+down_revision = "015_partition_email_events"
+branch_labels = None
+depends_on = None
+
+INDEX = "ix_email_events_search_vector"
+
+
+def upgrade() -> None:
+    op.add_column("email_events", sa.Column("search_vector", postgresql.TSVECTOR(), nullable=True))
+
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        op.execute(f"CREATE INDEX IF NOT EXISTS {INDEX} ON ONLY email_events USING gin (search_vector)")
+        partitions = conn.execute(sa.text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid"
+            " WHERE i.inhparent = 'email_events'::regclass"
+        )).scalars().all()
+        for partition in partitions:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_search_vector_idx"
+                f" ON {partition} USING gin (search_vector)"
+            )
+            op.execute(f"ALTER INDEX {INDEX} ATTACH PARTITION {partition}_search_vector_idx")
+
+
+def downgrade() -> None:
+    op.drop_index(INDEX, table_name="email_events")
+    op.drop_column("email_events", "search_vector")
@@ -0,0 +1,25 @@
+"""Count failed batch attempts per event.
+
+Revision ID: 017_event_batch_attempts
+Revises: 016_event_search_vector
+Create Date: 2026-10-19
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "017_event_batch_attempts"
+down_revision = "016_event_search_vector"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "email_events",
+        sa.Column("batch_attempts", sa.Integer(), nullable=False, server_default=sa.text("0")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("email_events", "batch_attempts")
@@ -0,0 +1,33 @@
+"""Record the model tier of the draft version each decision and history entry refers to.
+
+email_drafts.model_tier is overwritten on regeneration, so outcomes joined on it
+credit change requests on fast-tier drafts to the strong tier. Existing approvals
+and rejections get the draft's tier (their version is the current one); earlier
+change requests cannot be attributed and stay NULL.
+
+Revision ID: 018_decision_model_tier
+Revises: 017_event_batch_attempts
+Create Date: 2026-10-19
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "018_decision_model_tier"
+down_revision = "017_event_batch_attempts"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("approval_actions", sa.Column("model_tier", sa.String(20), nullable=True))
+    op.add_column("draft_versions", sa.Column("model_tier", sa.String(20), nullable=True))
+    op.execute(
+        "UPDATE approval_actions a SET model_tier = d.model_tier FROM email_drafts d"
+        " WHERE d.id = a.draft_id AND a.action IN ('approved', 'rejected')"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("draft_versions", "model_tier")
+    op.drop_column("approval_actions", "model_tier")
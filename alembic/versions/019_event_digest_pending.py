@@ -0,0 +1,29 @@
+"""Mark batch-generated events whose message is not yet in the thread digest.
+
+Batch results are folded into the digest lazily, on the next generation in the
+thread (see digest.get_thread_context), instead of one interactive summary per
+result while the batch is collected.
+
+Revision ID: 019_event_digest_pending
+Revises: 018_decision_model_tier
+Create Date: 2026-10-19
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "019_event_digest_pending"
+down_revision = "018_decision_model_tier"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "email_events",
+        sa.Column("digest_pending", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("email_events", "digest_pending")
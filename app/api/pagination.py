@@ -0,0 +1,60 @@
+import base64
+import uuid
+from datetime import datetime
+
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+# Lists stay plain JSON arrays; the cursor of the next page travels in this header
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(sort_value: datetime, row_id: uuid.UUID) -> str:
+    raw = f"{sort_value.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        sort_value, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(sort_value), uuid.UUID(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_offset_cursor(offset: int) -> str:
+    """Cursor for ranked results, which have no stable sort column to seek on."""
+    return base64.urlsafe_b64encode(f"offset|{offset}".encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_offset_cursor(cursor: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        kind, offset = raw.split("|", 1)
+        if kind != "offset" or int(offset) < 0:
+            raise ValueError(raw)
+        return int(offset)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_page(query, sort_column, id_column, cursor: str | None, limit: int):
+    """Newest first, continuing after the cursor row.
+
+    Seeks with a row comparison on (sort_column, id_column), which an index on
+    both columns answers directly, so deep pages cost the same as the first.
+    """
+    if cursor:
+        query = query.filter(tuple_(sort_column, id_column) < decode_cursor(cursor))
+    return query.order_by(sort_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def set_next_cursor(response: Response, rows: list, limit: int, sort_key: str) -> list:
+    """Trim the look-ahead row and expose the next cursor if there is a next page."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(last, sort_key), last.id)
+    return rows
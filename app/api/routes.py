@@ -1,24 +1,54 @@
+import asyncio
 import logging
-from typing import Optional
-
-from fastapi import APIRouter, BackgroundTasks, Depends
-from pydantic import BaseModel
+import uuid
+from datetime import datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
+from pydantic import BaseModel, Field
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db.base import get_db
-from app.db.models import EmailDraft, EmailEvent, Mailbox
-from app.services.agent import process_new_emails
+from app.api.pagination import (
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    decode_offset_cursor,
+    encode_offset_cursor,
+    keyset_page,
+    set_next_cursor,
+)
+from app.db.base import SessionLocal, get_async_db, get_db
+from app.db.models import EmailDraft, EmailEvent, EventAnalysis, Mailbox
+from app.services.agent import (
+    classifier_stats,
+    generate_operator_draft,
+    process_new_emails,
+    queue_depths,
+    regeneration_stats,
+    triage_new_events,
+)
+from app.services.approval import bulk_decide
+from app.services.fair_queue import fair_scheduler
 from app.services.gmail import (
     create_gmail_draft,
     fetch_new_emails,
     get_or_create_label,
     set_label,
 )
-from app.services.slack import post_draft_for_approval
+from app.services.jobs import job_runner
+from app.services.llm import completions
+from app.services.model_router import tier_stats
+from app.services.scheduler import process_and_publish
+from app.services.search import search_events
+from app.services.slack_outbox import enqueue_approval, outbox_stats
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Set on search responses whose matches were cut to the newest SEARCH_MAX_CANDIDATES
+SEARCH_TRUNCATED_HEADER = "X-Search-Truncated"
+
 
 @router.get("/ping")
 def ping():
@@ -37,6 +67,7 @@ def ingest_emails(
     for mailbox in mailboxes:
         try:
             new_events = fetch_new_emails(db, mailbox)
+            triage_new_events(db, new_events)
             total_new += len(new_events)
         except Exception as e:
             logger.error(f"Ingestion error for mailbox {mailbox.email_address}: {e}")
@@ -63,28 +94,96 @@ def process_emails(db: Session = Depends(get_db)):
 
 
 @router.post("/notify")
-async def notify_pending_drafts(db: Session = Depends(get_db)):
-    """Send all pending drafts to Slack for approval."""
-    drafts = db.query(EmailDraft).filter_by(status="pending_approval").all()
+async def notify_pending_drafts(db: AsyncSession = Depends(get_async_db)):
+    """Queue pending drafts for Slack approval; versions already posted are skipped."""
+    drafts = (await db.scalars(select(EmailDraft).filter_by(status="pending_approval"))).all()
     notified = 0
     for draft in drafts:
-        event = db.query(EmailEvent).filter_by(id=draft.email_event_id).first()
-        if event:
-            try:
-                await post_draft_for_approval(draft, event)
-                notified += 1
-            except Exception as e:
-                logger.error(f"Slack notification error for draft {draft.id}: {e}")
-    return {"status": "ok", "notified": notified}
+        try:
+            notified += await db.run_sync(enqueue_approval, draft)
+        except Exception as e:
+            logger.error(f"Slack notification error for draft {draft.id}: {e}")
+    return {"status": "ok", "notified": notified, "already_notified": len(drafts) - notified}
+
+
+@router.get("/slack/outbox/stats")
+def slack_outbox_stats(db: Session = Depends(get_db)):
+    """Slack outbox entries per status (pending, sending, sent, digested, skipped, failed)."""
+    return outbox_stats(db)
+
+
+@router.get("/jobs/stats")
+def job_stats():
+    """Background jobs of this replica per status."""
+    return job_runner.stats()
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Status and result of a background job (only on the replica that ran it)."""
+    job = job_runner.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@router.get("/queue/stats")
+def queue_stats(db: Session = Depends(get_db)):
+    """Queue depth and wait times per priority class (wait times are per replica)."""
+    depths = queue_depths(db)
+    waits = fair_scheduler.stats()
+    return {
+        cls: {"queue_depth": depths[cls], **waits[cls]}
+        for cls in depths
+    }
+
+
+@router.get("/classifier/stats")
+def classifier_statistics(db: Session = Depends(get_db)):
+    """Event categories and LLM calls avoided by skipping no-reply mail."""
+    return classifier_stats(db)
+
+
+@router.get("/router/stats")
+def router_stats(db: Session = Depends(get_db)):
+    """Latency and approval rates per model tier, for tuning ROUTER_STRONG_THRESHOLD."""
+    return tier_stats(db)
+
+
+@router.get("/llm/stats")
+def llm_stats():
+    """Hedge rate and hedge win rate of LLM completions (this replica)."""
+    return completions.stats()
+
+
+@router.get("/regeneration/stats")
+def regeneration_statistics(db: Session = Depends(get_db)):
+    """Latency of revision-mode regeneration vs. full regeneration."""
+    return regeneration_stats(db)
 
 
 @router.get("/drafts")
-def list_drafts(status: str = None, db: Session = Depends(get_db)):
-    """List drafts, optionally filtered by status."""
-    query = db.query(EmailDraft)
+def list_drafts(
+    response: Response,
+    status: str = None,
+    tone: str = None,
+    email_event_id: str = None,
+    cursor: str = None,
+    limit: int = Query(default=50, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    """List drafts newest first, optionally filtered; next page via the X-Next-Cursor header."""
+    query = db.query(
+        EmailDraft.id, EmailDraft.subject, EmailDraft.status, EmailDraft.tone, EmailDraft.created_at
+    )
     if status:
-        query = query.filter_by(status=status)
-    drafts = query.order_by(EmailDraft.created_at.desc()).limit(50).all()
+        query = query.filter(EmailDraft.status == status)
+    if tone:
+        query = query.filter(EmailDraft.tone == tone)
+    if email_event_id:
+        query = query.filter(EmailDraft.email_event_id == email_event_id)
+    drafts = keyset_page(query, EmailDraft.created_at, EmailDraft.id, cursor, limit).all()
+    drafts = set_next_cursor(response, drafts, limit, "created_at")
     return [
         {
             "id": str(d.id),
@@ -97,13 +196,90 @@ def list_drafts(status: str = None, db: Session = Depends(get_db)):
     ]
 
 
+@router.get("/drafts/{draft_id}/versions")
+def list_draft_versions(draft_id: str, db: Session = Depends(get_db)):
+    """Earlier versions of a draft, replaced after change requests."""
+    draft = db.query(EmailDraft).filter_by(id=draft_id).first()
+    if not draft:
+        raise HTTPException(status_code=404, detail="Draft not found")
+    return [
+        {
+            "version": v.version,
+            "body_text": v.body_text,
+            "model": v.model,
+            "feedback": v.feedback,
+            "regeneration_mode": v.regeneration_mode,
+            "regeneration_ms": v.regeneration_ms,
+            "created_at": v.created_at.isoformat() if v.created_at else None,
+        }
+        for v in draft.versions
+    ]
+
+
+class BulkDecisionRequest(BaseModel):
+    action: Literal["approve", "reject"]
+    draft_ids: Optional[list[uuid.UUID]] = None
+    # Filter instead of ids: pending drafts of one mailbox and/or without compliance flags
+    mailbox_id: Optional[uuid.UUID] = None
+    without_compliance_flags: bool = False
+    limit: int = Field(200, ge=1, le=1000)
+
+
+@router.post("/drafts/bulk")
+async def bulk_decide_drafts(req: BulkDecisionRequest, db: AsyncSession = Depends(get_async_db)):
+    """Approve or reject many pending drafts at once; returns one result per draft."""
+    if not req.draft_ids and not req.mailbox_id and not req.without_compliance_flags:
+        raise HTTPException(status_code=400, detail="draft_ids or a filter is required")
+
+    query = select(EmailDraft.id).filter(EmailDraft.status == "pending_approval")
+    if req.draft_ids:
+        query = query.filter(EmailDraft.id.in_(req.draft_ids))
+    if req.mailbox_id or req.without_compliance_flags:
+        query = query.join(EmailEvent, EmailDraft.email_event_id == EmailEvent.id)
+    if req.mailbox_id:
+        query = query.filter(EmailEvent.mailbox_id == req.mailbox_id)
+    if req.without_compliance_flags:
+        # Events without a stored analysis are left out: their flags are unknown
+        query = query.join(EventAnalysis, EventAnalysis.email_event_id == EmailEvent.id).filter(
+            func.json_array_length(EventAnalysis.compliance_flags) == 0
+        )
+    draft_ids = (await db.scalars(query.order_by(EmailDraft.created_at).limit(req.limit))).all()
+
+    results = await bulk_decide(draft_ids, req.action)
+    if req.draft_ids:
+        # Requested ids that were not pending at all
+        found = set(draft_ids)
+        results += [
+            {"draft_id": str(draft_id), "ok": False, "error": "Draft not found or not pending approval."}
+            for draft_id in req.draft_ids if draft_id not in found
+        ]
+    succeeded = sum(1 for r in results if r["ok"])
+    return {"status": "ok", "succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+
+
 @router.get("/events")
-def list_events(is_processed: bool = None, db: Session = Depends(get_db)):
-    """List email events."""
-    query = db.query(EmailEvent)
+def list_events(
+    response: Response,
+    is_processed: bool = None,
+    mailbox_id: str = None,
+    priority: str = None,
+    cursor: str = None,
+    limit: int = Query(default=50, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    """List email events newest first, optionally filtered; next page via the X-Next-Cursor header."""
+    query = db.query(
+        EmailEvent.id, EmailEvent.sender, EmailEvent.subject, EmailEvent.priority,
+        EmailEvent.is_processed, EmailEvent.received_at,
+    )
     if is_processed is not None:
-        query = query.filter_by(is_processed=is_processed)
-    events = query.order_by(EmailEvent.received_at.desc()).limit(50).all()
+        query = query.filter(EmailEvent.is_processed == is_processed)
+    if mailbox_id:
+        query = query.filter(EmailEvent.mailbox_id == mailbox_id)
+    if priority:
+        query = query.filter(EmailEvent.priority == priority)
+    events = keyset_page(query, EmailEvent.received_at, EmailEvent.id, cursor, limit).all()
+    events = set_next_cursor(response, events, limit, "received_at")
     return [
         {
             "id": str(e.id),
@@ -117,38 +293,41 @@ def list_events(is_processed: bool = None, db: Session = Depends(get_db)):
     ]
 
 
+@router.get("/events/search")
+def search_email_events(
+    response: Response,
+    q: str = Query(min_length=2, max_length=200),
+    mailbox_id: str = None,
+    received_after: datetime = None,
+    received_before: datetime = None,
+    cursor: str = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """Full-text search over subject, sender and body, best match first.
+
+    q accepts web search syntax ("exact phrase", -excluded, or). Highlights are
+    HTML-escaped text with the matches wrapped in <mark>. Next page via the
+    X-Next-Cursor header.
+
+    Only the newest SEARCH_MAX_CANDIDATES matches are ranked, so older matches
+    of a common term are missing from every page. The response then carries
+    X-Search-Truncated: true; narrow the search (mailbox, date range, more
+    words) to reach them.
+    """
+    offset = decode_offset_cursor(cursor) if cursor else 0
+    results, truncated = search_events(db, q, offset, limit, mailbox_id, received_after, received_before)
+    if truncated:
+        response.headers[SEARCH_TRUNCATED_HEADER] = "true"
+    if len(results) > limit:
+        results = results[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_offset_cursor(offset + limit)
+    return results
+
+
 async def _process_and_notify(db: Session):
     """Background: process emails and notify Slack."""
-    drafts = process_new_emails(db)
-    for draft in drafts:
-        event = db.query(EmailEvent).filter_by(id=draft.email_event_id).first()
-        if event:
-            mailbox_id = str(event.mailbox_id)
-
-            # Create Gmail draft and set label
-            try:
-                gmail_draft_id = create_gmail_draft(
-                    mailbox_id=mailbox_id,
-                    thread_id=event.thread_id,
-                    to=event.sender,
-                    subject=event.subject,
-                    body=draft.body_text,
-                )
-                draft.gmail_draft_id = gmail_draft_id
-                db.commit()
-            except Exception as e:
-                logger.error(f"Gmail draft creation failed: {e}")
-
-            try:
-                label_id = get_or_create_label(mailbox_id, "needs_approval")
-                set_label(mailbox_id, event.gmail_message_id, label_id)
-            except Exception as e:
-                logger.error(f"Label setting failed: {e}")
-
-            try:
-                await post_draft_for_approval(draft, event)
-            except Exception as e:
-                logger.error(f"Background notify error: {e}")
+    await process_and_publish(db)
 
 
 class OperatorDraftRequest(BaseModel):
@@ -160,57 +339,43 @@ class OperatorDraftRequest(BaseModel):
 @router.post("/operator/draft")
 async def operator_create_draft(
     req: OperatorDraftRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Operator command: create a draft for a specific email event or thread."""
     event = None
 
     if req.email_event_id:
-        event = db.query(EmailEvent).filter_by(id=req.email_event_id).first()
+        event = await db.scalar(select(EmailEvent).filter_by(id=req.email_event_id))
     elif req.thread_id:
-        event = (
-            db.query(EmailEvent)
+        event = await db.scalar(
+            select(EmailEvent)
             .filter_by(thread_id=req.thread_id)
             .order_by(EmailEvent.received_at.desc())
-            .first()
+            .limit(1)
         )
 
     if not event:
         return {"ok": False, "error": "Email event not found"}
 
-    # Process using agent (re-process even if already processed)
-    from app.services.agent import (
-        _calculate_body_hash,
-        _check_compliance,
-        _check_vip,
-        _generate_ai_reply,
-    )
-    from app.db.models import KBCompliance, KBSignature, KBTone, KBVip
-
-    default_tone = db.query(KBTone).filter_by(is_default=True).first()
-    default_signature = db.query(KBSignature).filter_by(is_default=True).first()
-    compliance_rules = db.query(KBCompliance).filter_by(is_active=True).all()
-    compliance_flags = _check_compliance(event.body_text or "", compliance_rules)
-
-    tone_prompt = default_tone.prompt_template if default_tone else "Antworte professionell und freundlich auf Deutsch."
-    if req.instructions:
-        tone_prompt += f"\n\nZusaetzliche Anweisungen vom Operator:\n{req.instructions}"
-
-    signature_text = default_signature.content_text if default_signature else ""
-    draft_body = _generate_ai_reply(event, tone_prompt, signature_text, compliance_flags)
-
-    draft = EmailDraft(
-        email_event_id=event.id,
-        subject=event.subject,
-        body_text=draft_body,
-        body_hash=_calculate_body_hash(draft_body),
-        tone=default_tone.name if default_tone else "default",
-        status="pending_approval",
-        version=1,
-    )
-    db.add(draft)
-    db.commit()
-    db.refresh(draft)
+    # LLM and Gmail calls block: run them in a worker thread with its own session
+    return await asyncio.to_thread(_create_operator_draft, event.id, req.instructions)
+
+
+def _create_operator_draft(event_id, instructions: str | None) -> dict:
+    db = SessionLocal()
+    try:
+        event = db.query(EmailEvent).filter_by(id=event_id).first()
+        return _publish_operator_draft(db, event, instructions)
+    finally:
+        db.close()
+
+
+def _publish_operator_draft(db: Session, event: EmailEvent, instructions: str | None) -> dict:
+    try:
+        draft = generate_operator_draft(db, event, instructions)
+    except Exception as e:
+        logger.error(f"Operator draft generation failed for event {event.id}: {e}")
+        return {"ok": False, "error": str(e)}
 
     # Create Gmail draft
     mailbox_id = str(event.mailbox_id)
@@ -234,9 +399,9 @@ async def operator_create_draft(
     except Exception as e:
         logger.error(f"Label setting failed for operator draft: {e}")
 
-    # Send Slack DM
+    # Queue Slack DM
     try:
-        await post_draft_for_approval(draft, event)
+        enqueue_approval(db, draft)
     except Exception as e:
         logger.error(f"Slack DM failed for operator draft: {e}")
 
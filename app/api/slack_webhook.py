@@ -1,23 +1,22 @@
+import asyncio
 import json
 import logging
+import uuid
 
-import httpx
 from fastapi import APIRouter, Depends, Header, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.config import settings
-from app.db.base import get_db
+from app.db.base import SessionLocal, get_async_db
 from app.db.models import ApprovalAction, EmailDraft, EmailEvent
-from app.services.agent import _calculate_body_hash, regenerate_draft
-from app.services.gmail import (
-    check_thread_has_label,
-    create_gmail_draft,
-    get_or_create_label,
-    remove_label,
-    send_reply,
-    set_label,
-)
-from app.services.slack import post_draft_for_approval, verify_slack_signature
+from app.services.agent import regenerate_draft
+from app.services.approval import approve_draft, reject_draft
+from app.services.gmail import create_gmail_draft
+from app.services.idempotency import begin_interaction, finish_interaction, interaction_fingerprint
+from app.services.jobs import job_runner
+from app.services.slack import open_modal, report_interaction_result, verify_slack_signature
+from app.services.slack_outbox import enqueue_approval, request_single_post
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -26,7 +25,7 @@ router = APIRouter()
 @router.post("/slack/interactions")
 async def handle_slack_interaction(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     x_slack_request_timestamp: str = Header(default=""),
     x_slack_signature: str = Header(default=""),
 ):
@@ -50,112 +49,118 @@ async def handle_slack_interaction(
     return {"ok": True}
 
 
-async def _handle_block_actions(payload: dict, db: Session) -> dict:
+async def _get_draft(db: AsyncSession, draft_id: str) -> EmailDraft | None:
+    try:
+        draft_id = uuid.UUID(draft_id)
+    except ValueError:
+        return None
+    return await db.scalar(select(EmailDraft).filter_by(id=draft_id))
+
+
+async def _handle_block_actions(payload: dict, db: AsyncSession) -> dict:
     action = payload["actions"][0]
     action_id = action["action_id"]
-    draft_id = action["value"]
+    # Approval buttons carry "<draft_id>:<version>", older messages only the draft id
+    draft_id, _, version = action["value"].partition(":")
     slack_user = payload["user"]["id"]
 
-    draft = db.query(EmailDraft).filter_by(id=draft_id).first()
+    draft = await _get_draft(db, draft_id)
     if not draft:
         return {"ok": False, "error": "Draft not found"}
 
-    event = draft.email_event
-
-    if action_id == "approve_draft":
-        return await _handle_approve(draft, event, payload, db)
-
-    elif action_id == "reject_draft":
-        return await _handle_reject(draft, event, payload, db)
+    if action_id in ("approve_draft", "reject_draft"):
+        version = int(version) if version else draft.version
+        if version != draft.version:
+            # The message shows an older text than would be sent
+            job_runner.submit(
+                "report", report_interaction_result, payload,
+                ":warning: Dieser Entwurf wurde inzwischen ueberarbeitet, bitte die neue Nachricht verwenden.",
+            )
+            return {"ok": False, "error": "Outdated draft version"}
+
+        message_ts = payload.get("container", {}).get("message_ts") or payload.get("message", {}).get("ts")
+        fingerprint = interaction_fingerprint(action_id, draft.id, version, message_ts)
+        stored = await db.run_sync(begin_interaction, fingerprint, action_id, draft.id, version, message_ts)
+        if stored is not None:
+            # Slack retry or double click: answer from the first delivery, no Gmail calls
+            logger.info(f"Duplicate {action_id} for draft {draft.id} by {slack_user} ignored")
+            return stored
+
+        # Gmail calls take longer than Slack's 3 second limit: acknowledge, then work
+        job = job_runner.submit(action_id, _run_draft_action, action_id, draft.id, payload, fingerprint)
+        logger.info(f"{action_id} for draft {draft.id} by {slack_user} queued as job {job.id}")
+        return {"ok": True}
 
     elif action_id == "request_changes_draft":
         return await _handle_request_changes(draft, payload)
 
-    return {"ok": True}
+    elif action_id == "show_draft":
+        # Button in a digest message: post the full approval message for this draft
+        if draft.status == "pending_approval":
+            await db.run_sync(request_single_post, draft)
 
+    return {"ok": True}
 
-async def _handle_approve(draft: EmailDraft, event: EmailEvent, payload: dict, db: Session) -> dict:
-    mailbox_id = str(event.mailbox_id)
-
-    # 1. Hash verification: ensure draft body hasn't been tampered with
-    current_hash = _calculate_body_hash(draft.body_text)
-    if draft.body_hash and current_hash != draft.body_hash:
-        logger.warning(f"Hash mismatch for draft {draft.id} — body was modified outside the flow")
-        return {"ok": False, "error": "Draft body was modified. Please review again."}
 
-    # 2. Duplicate-send check: ensure we haven't already sent on this thread
+async def _run_draft_action(action_id: str, draft_id, payload: dict, fingerprint: str) -> dict:
+    """Background job: approve or reject a draft, then report the outcome in Slack."""
+    handler = _handle_approve if action_id == "approve_draft" else _handle_reject
     try:
-        sent_label_id = get_or_create_label(mailbox_id, "sent_by_agent")
-        if check_thread_has_label(mailbox_id, event.thread_id, sent_label_id):
-            logger.warning(f"Thread {event.thread_id} already has sent_by_agent label — duplicate send prevented")
-            draft.status = "sent"
-            db.commit()
-            return {"ok": False, "error": "Email already sent for this thread."}
+        result = await asyncio.to_thread(_in_session, handler, draft_id, payload)
     except Exception as e:
-        logger.error(f"Label check failed: {e}")
-
-    # 3. Send the email
-    draft.status = "approved"
-    approval = ApprovalAction(
-        draft_id=draft.id,
-        reviewer_id=draft.email_event.mailbox.user_id,
-        action="approved",
-        slack_message_ts=payload.get("message", {}).get("ts"),
-        slack_channel_id=payload.get("channel", {}).get("id"),
-    )
-    db.add(approval)
+        logger.error(f"{action_id} for draft {draft_id} failed: {e}")
+        result = {"ok": False, "error": str(e)}
+    await asyncio.to_thread(_finish_interaction, fingerprint, result)
 
+    slack_user = payload["user"]["id"]
+    if result.get("ok"):
+        verb = "Gesendet" if action_id == "approve_draft" else "Abgelehnt"
+        text, final = f"{verb} von <@{slack_user}>", True
+    else:
+        text, final = f":warning: Aktion fehlgeschlagen: {result.get('error')}", False
     try:
-        send_reply(
-            mailbox_id=mailbox_id,
-            thread_id=event.thread_id,
-            to=event.sender,
-            subject=event.subject,
-            body=draft.body_text,
-        )
-        draft.status = "sent"
-
-        # 4. Label management: set sent_by_agent, remove needs_approval
-        try:
-            sent_label_id = get_or_create_label(mailbox_id, "sent_by_agent")
-            set_label(mailbox_id, event.gmail_message_id, sent_label_id)
+        await report_interaction_result(payload, text, final=final)
+    except Exception as e:
+        logger.error(f"Reporting {action_id} result for draft {draft_id} failed: {e}")
+    return result
 
-            needs_approval_label_id = get_or_create_label(mailbox_id, "needs_approval")
-            remove_label(mailbox_id, event.gmail_message_id, needs_approval_label_id)
-        except Exception as e:
-            logger.error(f"Label update after send failed: {e}")
 
+def _finish_interaction(fingerprint: str, result: dict) -> None:
+    db = SessionLocal()
+    try:
+        finish_interaction(db, fingerprint, result)
     except Exception as e:
-        draft.status = "approved"
-        db.commit()
-        return {"ok": False, "error": str(e)}
+        logger.error(f"Storing interaction result failed: {e}")
+    finally:
+        db.close()
 
-    db.commit()
-    return {"ok": True}
 
+def _in_session(handler, draft_id, *args) -> dict:
+    """Run a handler with its own session (jobs outlive the request's session)."""
+    db = SessionLocal()
+    try:
+        draft = db.query(EmailDraft).filter_by(id=draft_id).first()
+        if not draft:
+            return {"ok": False, "error": "Draft not found"}
+        return handler(draft, draft.email_event, *args, db)
+    finally:
+        db.close()
 
-async def _handle_reject(draft: EmailDraft, event: EmailEvent, payload: dict, db: Session) -> dict:
-    draft.status = "rejected"
 
-    approval = ApprovalAction(
-        draft_id=draft.id,
-        reviewer_id=draft.email_event.mailbox.user_id,
-        action="rejected",
+def _handle_approve(draft: EmailDraft, event: EmailEvent, payload: dict, db: Session) -> dict:
+    return approve_draft(
+        db, draft, event,
         slack_message_ts=payload.get("message", {}).get("ts"),
         slack_channel_id=payload.get("channel", {}).get("id"),
     )
-    db.add(approval)
 
-    # Remove needs_approval label
-    try:
-        mailbox_id = str(event.mailbox_id)
-        needs_approval_label_id = get_or_create_label(mailbox_id, "needs_approval")
-        remove_label(mailbox_id, event.gmail_message_id, needs_approval_label_id)
-    except Exception as e:
-        logger.error(f"Label removal on reject failed: {e}")
 
-    db.commit()
-    return {"ok": True}
+def _handle_reject(draft: EmailDraft, event: EmailEvent, payload: dict, db: Session) -> dict:
+    return reject_draft(
+        db, draft, event,
+        slack_message_ts=payload.get("message", {}).get("ts"),
+        slack_channel_id=payload.get("channel", {}).get("id"),
+    )
 
 
 async def _handle_request_changes(draft: EmailDraft, payload: dict) -> dict:
@@ -167,6 +172,7 @@ async def _handle_request_changes(draft: EmailDraft, payload: dict) -> dict:
     modal = {
         "type": "modal",
         "callback_id": f"changes_modal_{draft.id}",
+        "private_metadata": str(draft.version),
         "title": {"type": "plain_text", "text": "Aenderungen anfordern"},
         "submit": {"type": "plain_text", "text": "Absenden"},
         "close": {"type": "plain_text", "text": "Abbrechen"},
@@ -188,20 +194,14 @@ async def _handle_request_changes(draft: EmailDraft, payload: dict) -> dict:
         ],
     }
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            "https://slack.com/api/views.open",
-            headers={"Authorization": f"Bearer {settings.SLACK_BOT_TOKEN}"},
-            json={"trigger_id": trigger_id, "view": modal},
-        )
-        result = resp.json()
-        if not result.get("ok"):
-            logger.error(f"Failed to open modal: {result}")
+    result = await open_modal(trigger_id, modal)
+    if not result.get("ok"):
+        logger.error(f"Failed to open modal: {result}")
 
     return {"ok": True}
 
 
-async def _handle_view_submission(payload: dict, db: Session) -> dict:
+async def _handle_view_submission(payload: dict, db: AsyncSession) -> dict:
     """Handle the modal submission with feedback for re-drafting."""
     callback_id = payload.get("view", {}).get("callback_id", "")
 
@@ -209,7 +209,7 @@ async def _handle_view_submission(payload: dict, db: Session) -> dict:
         return {"ok": True}
 
     draft_id = callback_id.replace("changes_modal_", "")
-    draft = db.query(EmailDraft).filter_by(id=draft_id).first()
+    draft = await _get_draft(db, draft_id)
     if not draft:
         return {"ok": False, "error": "Draft not found"}
 
@@ -222,17 +222,65 @@ async def _handle_view_submission(payload: dict, db: Session) -> dict:
     )
 
     if not feedback:
-        return {"ok": False, "error": "No feedback provided"}
+        return {"response_action": "errors", "errors": {"feedback_block": "Bitte Feedback eingeben."}}
+
+    view = payload.get("view", {})
+    version = int(view.get("private_metadata") or draft.version)
+    if draft.status != "pending_approval" or version != draft.version:
+        # Checked again under the row lock in _apply_changes
+        return {
+            "response_action": "errors",
+            "errors": {"feedback_block": "Dieser Entwurf wurde inzwischen gesendet, abgelehnt oder ueberarbeitet."},
+        }
+    fingerprint = interaction_fingerprint("request_changes", draft.id, version, view.get("id"))
+    stored = await db.run_sync(begin_interaction, fingerprint, "request_changes", draft.id, version, view.get("id"))
+    if stored is not None:
+        logger.info(f"Duplicate change request for draft {draft.id} ignored")
+        return {}
+
+    # Regeneration takes several seconds: close the modal now, report the outcome by DM
+    job = job_runner.submit("request_changes", _run_changes, draft.id, version, feedback, payload, fingerprint)
+    logger.info(f"Changes for draft {draft.id} queued as job {job.id}")
+
+    # Return empty body to close the modal
+    return {}
 
-    event = draft.email_event
-    slack_user = payload.get("user", {}).get("id", "")
 
-    # 1. Record the edit request
+async def _run_changes(draft_id, version: int, feedback: str, payload: dict, fingerprint: str) -> dict:
+    """Background job: regenerate a draft with feedback and queue the new version."""
+    try:
+        result = await asyncio.to_thread(_in_session, _apply_changes, draft_id, version, feedback)
+    except Exception as e:
+        logger.error(f"Changes for draft {draft_id} failed: {e}")
+        # Regeneration sends no mail, so a failed attempt may be repeated
+        result = {"ok": False, "error": str(e), "retryable": True}
+    await asyncio.to_thread(_finish_interaction, fingerprint, result)
+    if not result.get("ok"):
+        try:
+            await report_interaction_result(payload, f":warning: Ueberarbeitung fehlgeschlagen: {result.get('error')}")
+        except Exception as e:
+            logger.error(f"Reporting failed regeneration of draft {draft_id} failed: {e}")
+    return result
+
+
+def _apply_changes(draft: EmailDraft, event: EmailEvent, version: int, feedback: str, db: Session) -> dict:
+    # Row lock until the new version is committed, as in approve_draft: the feedback
+    # was written for the version shown in the modal and only applies to that one
+    db.refresh(draft, with_for_update=True)
+    if draft.status != "pending_approval":
+        db.rollback()
+        return {"ok": False, "error": f"Draft is already {draft.status}."}
+    if draft.version != version:
+        db.rollback()
+        return {"ok": False, "error": "Draft was revised in the meantime, please use the new message."}
+
+    # 1. Record the edit request (committed together with the new version)
     approval = ApprovalAction(
         draft_id=draft.id,
         reviewer_id=draft.email_event.mailbox.user_id,
         action="edit_requested",
         comment=feedback,
+        model_tier=draft.model_tier,
     )
     db.add(approval)
 
@@ -241,8 +289,9 @@ async def _handle_view_submission(payload: dict, db: Session) -> dict:
         draft = regenerate_draft(db, draft, feedback)
     except Exception as e:
         logger.error(f"Draft regeneration failed: {e}")
-        db.commit()
-        return {"response_action": "errors", "errors": {"feedback_block": f"Fehler: {e}"}}
+        # No new version, so no edit request either; the user may try again
+        db.rollback()
+        return {"ok": False, "error": str(e), "retryable": True}
 
     # 3. Create new Gmail draft
     try:
@@ -258,11 +307,10 @@ async def _handle_view_submission(payload: dict, db: Session) -> dict:
     except Exception as e:
         logger.error(f"Gmail draft creation after changes failed: {e}")
 
-    # 4. Send new DM with updated draft
+    # 4. Queue new DM with updated draft
     try:
-        await post_draft_for_approval(draft, event)
+        enqueue_approval(db, draft)
     except Exception as e:
         logger.error(f"Slack DM for updated draft failed: {e}")
 
-    # Return empty body to close the modal
-    return {}
+    return {"ok": True, "draft_id": str(draft.id), "version": draft.version}
@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.db.base import get_db
+from app.db.models import EmailDraft
+from app.services.usage import GROUP_COLUMNS, usage_report
+
+router = APIRouter(prefix="/usage")
+
+
+@router.get("")
+def get_usage(
+    group_by: str = Query(default="day", description="Comma-separated: mailbox, model, tone, purpose, day"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    """Tokens, estimated cost and latency of LLM generations, aggregated."""
+    groups = [g.strip() for g in group_by.split(",") if g.strip()]
+    unknown = [g for g in groups if g not in GROUP_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown group_by: {', '.join(unknown)}")
+    return usage_report(db, groups, since, until)
+
+
+@router.get("/drafts/{draft_id}")
+def get_draft_usage(draft_id: str, db: Session = Depends(get_db)):
+    """Every generation that went into a draft (initial draft and regenerations)."""
+    draft = db.query(EmailDraft).filter_by(id=draft_id).first()
+    if not draft:
+        raise HTTPException(status_code=404, detail="Draft not found")
+    return [
+        {
+            "purpose": u.purpose,
+            "model": u.model,
+            "prompt_tokens": u.prompt_tokens,
+            "completion_tokens": u.completion_tokens,
+            "latency_ms": u.latency_ms,
+            "cost_usd": float(u.cost_usd) if u.cost_usd is not None else None,
+            "created_at": u.created_at.isoformat() if u.created_at else None,
+        }
+        for u in draft.llm_usage
+    ]
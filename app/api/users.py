@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from sqlalchemy.orm import Session
 
 from app.db.base import get_db
@@ -17,6 +17,12 @@ class UserCreate(BaseModel):
 class MailboxCreate(BaseModel):
     email_address: str
     provider: str = "gmail"
+    retention_days: int | None = Field(default=None, ge=0)
+
+
+class MailboxRetention(BaseModel):
+    # Days mail is kept before it is archived and deleted; None = EVENT_RETENTION_DAYS, 0 = forever
+    retention_days: int | None = Field(default=None, ge=0)
 
 
 @router.post("/users")
@@ -86,6 +92,7 @@ def create_mailbox(user_id: str, data: MailboxCreate, db: Session = Depends(get_
         user_id=user.id,
         email_address=data.email_address,
         provider=data.provider,
+        retention_days=data.retention_days,
     )
     db.add(mailbox)
     db.commit()
@@ -96,6 +103,7 @@ def create_mailbox(user_id: str, data: MailboxCreate, db: Session = Depends(get_
         "email_address": mailbox.email_address,
         "provider": mailbox.provider,
         "is_active": mailbox.is_active,
+        "retention_days": mailbox.retention_days,
         "message": "Now connect Gmail via /api/auth/google?mailbox_id=" + str(mailbox.id),
     }
 
@@ -111,7 +119,18 @@ def list_mailboxes(db: Session = Depends(get_db)):
             "provider": m.provider,
             "is_active": m.is_active,
             "has_credentials": m.credentials_ref is not None,
+            "retention_days": m.retention_days,
             "last_sync_at": m.last_sync_at.isoformat() if m.last_sync_at else None,
         }
         for m in mailboxes
     ]
+
+
+@router.put("/mailboxes/{mailbox_id}/retention")
+def set_mailbox_retention(mailbox_id: str, data: MailboxRetention, db: Session = Depends(get_db)):
+    mailbox = db.query(Mailbox).filter_by(id=mailbox_id).first()
+    if not mailbox:
+        raise HTTPException(status_code=404, detail="Mailbox not found")
+    mailbox.retention_days = data.retention_days
+    db.commit()
+    return {"id": str(mailbox.id), "retention_days": mailbox.retention_days}
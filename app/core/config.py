@@ -8,6 +8,23 @@ class Settings(BaseSettings):
     DB_USER: str = "dev_user"
     DB_PASSWORD: str = "dev_password"
     DB_NAME: str = "dev_db"
+    # Async engine (async def routes)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    # Mail and draft bodies are stored zstd-compressed in side tables
+    BODY_ZSTD_LEVEL: int = 3
+    BODY_BACKFILL_BATCH_SIZE: int = 500
+    BODY_BACKFILL_PAUSE_SECONDS: float = 0.2
+    # email_events is partitioned by month; old mail is archived to ARCHIVE_DIR and dropped
+    EVENT_RETENTION_DAYS: int = 0
+    PARTITION_MONTHS_AHEAD: int = 3
+    RETENTION_ARCHIVE_DIR: str = "/app/data/archive"
+    RETENTION_BATCH_SIZE: int = 1000
+    RETENTION_CHECK_HOURS: int = 24
+    # Full-text search ranks the newest N matches
+    SEARCH_MAX_CANDIDATES: int = 1000
 
     GOOGLE_CLIENT_ID: str = ""
     GOOGLE_CLIENT_SECRET: str = ""
@@ -15,12 +32,78 @@ class Settings(BaseSettings):
     SLACK_SIGNING_SECRET: str = ""
     SLACK_APPROVAL_CHANNEL: str = "#mailki-approvals"
     SLACK_APPROVER_USER_ID: str = "U0904E3AAR5"
+    SLACK_STREAM_DRAFTS: bool = False
+    SLACK_STREAM_UPDATE_SECONDS: float = 1.0
+    SLACK_DIGEST_THRESHOLD: int = 5
+    SLACK_MESSAGES_PER_SECOND: float = 1.0
+    SLACK_OUTBOX_MAX_ATTEMPTS: int = 5
+    SLACK_OUTBOX_POLL_SECONDS: float = 2.0
+    # Slack interactions are acknowledged at once and run as background jobs
+    JOB_RUNNER_CONCURRENCY: int = 4
+    JOB_SHUTDOWN_TIMEOUT_SECONDS: float = 20.0
+    # Repeated deliveries of the same interaction are answered from memory this long
+    SLACK_DEDUP_TTL_SECONDS: int = 600
+    # An interaction still processing after this long is taken over by its next delivery
+    SLACK_INTERACTION_TIMEOUT_SECONDS: int = 300
+    # Drafts sent in parallel by POST /api/drafts/bulk
+    BULK_APPROVAL_CONCURRENCY: int = 8
 
     OPENAI_API_KEY: str = ""
     OPENAI_MODEL: str = "gpt-4o-mini"
+    # Model tiers for complexity-based routing (empty = OPENAI_MODEL)
+    OPENAI_FAST_MODEL: str = ""
+    OPENAI_STRONG_MODEL: str = ""
+    ROUTER_STRONG_THRESHOLD: float = 0.5
+    DRAFT_REVISION_MODE: bool = True
+    PROMPT_INPUT_TOKEN_BUDGET: int = 1500
+    THREAD_DIGEST_ENABLED: bool = True
+    THREAD_DIGEST_MAX_TOKENS: int = 300
+    # Few-shot examples from replies approved without changes
+    PRECEDENTS_ENABLED: bool = True
+    PRECEDENTS_TOP_K: int = 2
+    PRECEDENTS_MIN_SIMILARITY: float = 0.5
+
+    # Local classifier that skips mail which never needs a reply
+    CLASSIFIER_ENABLED: bool = True
+    CLASSIFIER_SKIP_THRESHOLD: float = 0.9
+    CLASSIFIER_MIN_SAMPLES: int = 50
+    CLASSIFIER_MAX_TRAINING_SAMPLES: int = 20000
+    CLASSIFIER_RETRAIN_HOURS: int = 24
+
+    # Offline batch generation for normal-priority mail
+    BATCH_MODE_ENABLED: bool = False
+    OPENAI_BATCH_BASE_URL: str = ""
+    BATCH_MIN_REQUESTS: int = 20
+    BATCH_MAX_REQUESTS: int = 1000
+    BATCH_MAX_WAIT_MINUTES: int = 30
+    BATCH_MAX_ATTEMPTS: int = 3
 
     POLL_INTERVAL_MINUTES: int = 5
 
+    # Work claiming (multi-replica draft generation)
+    WORKER_ID: str = ""
+    CLAIM_BATCH_SIZE: int = 20
+    CLAIM_LEASE_SECONDS: int = 300
+    CLAIM_WINDOW_FACTOR: int = 4
+
+    # Fair scheduling across mailboxes (weights keyed by mailbox id, default 1.0)
+    MAILBOX_WEIGHTS: dict[str, float] = {}
+    MAILBOX_MAX_IN_FLIGHT: int = 5
+
+    # Circuit breakers around OpenAI, Gmail and Slack (per-name thresholds override the default)
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_FAILURE_THRESHOLDS: dict[str, int] = {}
+    BREAKER_RESET_SECONDS: float = 30.0
+    OPENAI_TIMEOUT_SECONDS: float = 30.0
+
+    # Hedged completions: duplicate a request still pending after the given latency percentile
+    LLM_HEDGING_ENABLED: bool = False
+    LLM_HEDGE_PERCENTILE: float = 0.95
+    LLM_HEDGE_BUDGET: float = 0.05
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    # USD per 1M tokens as [input, output], keyed by model; extends usage.MODEL_PRICES
+    LLM_PRICES: dict[str, list[float]] = {}
+
     model_config = {"env_file": ".env"}
 
 
@@ -0,0 +1,28 @@
+import threading
+
+import zstandard
+
+from app.core.config import settings
+
+# zstd (de)compressors are not thread-safe; every thread keeps its own pair
+_local = threading.local()
+
+
+def _codecs() -> tuple[zstandard.ZstdCompressor, zstandard.ZstdDecompressor]:
+    codecs = getattr(_local, "codecs", None)
+    if codecs is None:
+        codecs = (zstandard.ZstdCompressor(level=settings.BODY_ZSTD_LEVEL), zstandard.ZstdDecompressor())
+        _local.codecs = codecs
+    return codecs
+
+
+def compress_text(value: str | None) -> bytes | None:
+    if value is None:
+        return None
+    return _codecs()[0].compress(value.encode("utf-8"))
+
+
+def decompress_text(value: bytes | None) -> str | None:
+    if value is None:
+        return None
+    return _codecs()[1].decompress(value).decode("utf-8")
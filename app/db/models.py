@@ -7,14 +7,37 @@ from sqlalchemy import (
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     Integer,
+    JSON,
+    LargeBinary,
+    Numeric,
     String,
     Text,
+    UniqueConstraint,
+    inspect,
+    text,
 )
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+from sqlalchemy.orm import deferred, object_session, relationship
 
 from .base import Base
+from .compression import compress_text, decompress_text
+
+
+def _lock_legacy_bodies(row) -> None:
+    """Lock a stored row and reload its bodies before they move to the side table.
+
+    The backfill (services/body_storage.py) locks the rows it moves with SKIP
+    LOCKED, so after this the row is either already moved (body is set) or stays
+    put until the caller commits. Without it, a row loaded before the backfill
+    moved it would insert a second side row.
+    """
+    if not inspect(row).persistent:
+        return
+    db = object_session(row)
+    db.refresh(row, ["legacy_body_text", "legacy_body_html"], with_for_update=True)
+    db.expire(row, ["body"])
 
 
 class User(Base):
@@ -42,6 +65,8 @@ class Mailbox(Base):
     credentials_ref = Column(String(255))
     is_active = Column(Boolean, default=True)
     last_sync_at = Column(DateTime)
+    # Days mail is kept before it is archived (None = EVENT_RETENTION_DAYS, 0 = forever)
+    retention_days = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="mailboxes")
@@ -49,39 +74,148 @@ class Mailbox(Base):
 
 
 class EmailEvent(Base):
+    """Ingested mail, range-partitioned by month of received_at (see services/retention.py).
+
+    Unique keys of a partitioned table must contain the partition key, so the
+    primary key is (id, received_at) and tables pointing at an event carry no
+    foreign key constraint; their relationships join on id alone.
+    """
+
     __tablename__ = "email_events"
+    __table_args__ = (
+        Index(
+            "ix_email_events_unprocessed_received_at", "received_at",
+            postgresql_where=text("is_processed = false"),
+        ),
+        # Keyset pagination of GET /api/events
+        Index("ix_email_events_received_at_id", "received_at", "id"),
+        # received_at comes from Gmail's internalDate, so a message always maps to the same key
+        Index("ix_email_events_gmail_message_id", "gmail_message_id", "received_at", unique=True),
+        # Full-text search (services/search.py)
+        Index("ix_email_events_search_vector", "search_vector", postgresql_using="gin"),
+        {"postgresql_partition_by": "RANGE (received_at)"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    mailbox_id = Column(UUID(as_uuid=True), ForeignKey("mailboxes.id"), nullable=False)
-    gmail_message_id = Column(String(255), unique=True, index=True)
+    mailbox_id = Column(UUID(as_uuid=True), ForeignKey("mailboxes.id"), nullable=False, index=True)
+    gmail_message_id = Column(String(255))
     thread_id = Column(String(255), index=True)
     sender = Column(String(255), nullable=False)
     recipient = Column(String(255), nullable=False)
     subject = Column(String(500))
-    body_text = Column(Text)
-    body_html = Column(Text)
-    received_at = Column(DateTime, nullable=False)
+    # Rows from before 014 until backfilled; new bodies live in email_event_bodies
+    legacy_body_text = deferred(Column("body_text", Text))
+    legacy_body_html = deferred(Column("body_html", Text))
+    received_at = Column(DateTime, primary_key=True)
     category = Column(String(100))
     cc = Column(Text, nullable=True)
     bcc = Column(Text, nullable=True)
     priority = Column(String(20), default="normal")
     is_processed = Column(Boolean, default=False)
+    lease_owner = Column(String(255), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    batch_job_id = Column(UUID(as_uuid=True), ForeignKey("llm_batch_jobs.id"), nullable=True)
+    # Batch results that failed for this event; after BATCH_MAX_ATTEMPTS it is generated interactively
+    batch_attempts = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    # Batch result whose message still has to be folded into the thread digest (services/digest.py)
+    digest_pending = Column(Boolean, nullable=False, default=False, server_default=text("false"))
+    # Subject, sender and body; set on insert by the app (see services/search.py)
+    search_vector = deferred(Column(TSVECTOR, nullable=True))
     created_at = Column(DateTime, default=datetime.utcnow)
 
     mailbox = relationship("Mailbox", back_populates="email_events")
-    drafts = relationship("EmailDraft", back_populates="email_event")
+    drafts = relationship(
+        "EmailDraft", back_populates="email_event",
+        primaryjoin="EmailEvent.id == foreign(EmailDraft.email_event_id)",
+    )
+    analysis = relationship(
+        "EventAnalysis", back_populates="email_event", uselist=False,
+        primaryjoin="EmailEvent.id == foreign(EventAnalysis.email_event_id)",
+    )
+    body = relationship(
+        "EmailEventBody", uselist=False, cascade="all, delete-orphan",
+        primaryjoin="EmailEvent.id == foreign(EmailEventBody.email_event_id)",
+    )
+
+    @property
+    def body_text(self) -> str | None:
+        if self.body is not None:
+            return decompress_text(self.body.body_text)
+        return self.legacy_body_text
+
+    @body_text.setter
+    def body_text(self, value: str | None) -> None:
+        self._stored_body().body_text = compress_text(value)
+
+    @property
+    def body_html(self) -> str | None:
+        if self.body is not None:
+            return decompress_text(self.body.body_html)
+        return self.legacy_body_html
+
+    @body_html.setter
+    def body_html(self, value: str | None) -> None:
+        self._stored_body().body_html = compress_text(value)
+
+    def _stored_body(self) -> "EmailEventBody":
+        # Moves a not yet backfilled row's bodies over before one of them changes
+        if self.body is None:
+            _lock_legacy_bodies(self)
+        if self.body is None:
+            self.body = EmailEventBody(
+                body_text=compress_text(self.legacy_body_text),
+                body_html=compress_text(self.legacy_body_html),
+            )
+            self.legacy_body_text = None
+            self.legacy_body_html = None
+        return self.body
+
+
+class EmailEventBody(Base):
+    """zstd-compressed bodies of an email event, loaded only when accessed."""
+
+    __tablename__ = "email_event_bodies"
+
+    email_event_id = Column(UUID(as_uuid=True), primary_key=True)
+    body_text = Column(LargeBinary)
+    body_html = Column(LargeBinary)
+
+
+class EventAnalysis(Base):
+    __tablename__ = "event_analyses"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    email_event_id = Column(UUID(as_uuid=True), nullable=False, unique=True)
+    kb_version = Column(String(64), nullable=False)
+    priority = Column(String(20), nullable=True)
+    compliance_flags = Column(JSON, nullable=False, default=list)
+    prompt_body = Column(Text, nullable=False, default="")
+    input_tokens = Column(Integer, nullable=True)
+    tokens_saved = Column(Integer, nullable=True)
+    category = Column(String(100), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    email_event = relationship(
+        "EmailEvent", back_populates="analysis",
+        primaryjoin="EmailEvent.id == foreign(EventAnalysis.email_event_id)",
+    )
 
 
 class EmailDraft(Base):
     __tablename__ = "email_drafts"
+    __table_args__ = (
+        # Keyset pagination of GET /api/drafts, with and without status filter
+        Index("ix_email_drafts_created_at_id", "created_at", "id"),
+        Index("ix_email_drafts_status_created_at_id", "status", "created_at", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    email_event_id = Column(
-        UUID(as_uuid=True), ForeignKey("email_events.id"), nullable=False
-    )
+    email_event_id = Column(UUID(as_uuid=True), nullable=False, index=True)
     subject = Column(String(500))
-    body_text = Column(Text, nullable=False)
-    body_html = Column(Text)
+    # Rows from before 014 until backfilled; new bodies live in email_draft_bodies
+    legacy_body_text = deferred(Column("body_text", Text))
+    legacy_body_html = deferred(Column("body_html", Text))
     tone = Column(String(50))
     gmail_draft_id = Column(String(255), nullable=True, index=True)
     body_hash = Column(String(64), nullable=True)
@@ -91,11 +225,87 @@ class EmailDraft(Base):
         default="draft",
     )
     version = Column(Integer, default=1)
+    input_tokens_saved = Column(Integer, nullable=True)
+    model = Column(String(100), nullable=True)
+    model_tier = Column(String(20), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    email_event = relationship("EmailEvent", back_populates="drafts")
+    email_event = relationship(
+        "EmailEvent", back_populates="drafts",
+        primaryjoin="EmailEvent.id == foreign(EmailDraft.email_event_id)",
+    )
     approval_actions = relationship("ApprovalAction", back_populates="draft")
+    versions = relationship(
+        "DraftVersion", back_populates="draft", order_by="DraftVersion.version"
+    )
+    llm_usage = relationship("LLMUsage", back_populates="draft", order_by="LLMUsage.created_at")
+    body = relationship("EmailDraftBody", uselist=False, cascade="all, delete-orphan")
+
+    @property
+    def body_text(self) -> str | None:
+        if self.body is not None:
+            return decompress_text(self.body.body_text)
+        return self.legacy_body_text
+
+    @body_text.setter
+    def body_text(self, value: str | None) -> None:
+        self._stored_body().body_text = compress_text(value)
+
+    @property
+    def body_html(self) -> str | None:
+        if self.body is not None:
+            return decompress_text(self.body.body_html)
+        return self.legacy_body_html
+
+    @body_html.setter
+    def body_html(self, value: str | None) -> None:
+        self._stored_body().body_html = compress_text(value)
+
+    def _stored_body(self) -> "EmailDraftBody":
+        if self.body is None:
+            _lock_legacy_bodies(self)
+        if self.body is None:
+            self.body = EmailDraftBody(
+                body_text=compress_text(self.legacy_body_text),
+                body_html=compress_text(self.legacy_body_html),
+            )
+            self.legacy_body_text = None
+            self.legacy_body_html = None
+        return self.body
+
+
+class EmailDraftBody(Base):
+    """zstd-compressed bodies of a draft, loaded only when accessed."""
+
+    __tablename__ = "email_draft_bodies"
+
+    email_draft_id = Column(
+        UUID(as_uuid=True), ForeignKey("email_drafts.id", ondelete="CASCADE"), primary_key=True
+    )
+    body_text = Column(LargeBinary)
+    body_html = Column(LargeBinary)
+
+
+class DraftVersion(Base):
+    __tablename__ = "draft_versions"
+    __table_args__ = (UniqueConstraint("draft_id", "version"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    draft_id = Column(
+        UUID(as_uuid=True), ForeignKey("email_drafts.id"), nullable=False, index=True
+    )
+    version = Column(Integer, nullable=False)
+    body_text = Column(Text, nullable=False)
+    body_hash = Column(String(64), nullable=True)
+    model = Column(String(100), nullable=True)
+    model_tier = Column(String(20), nullable=True)
+    feedback = Column(Text)
+    regeneration_mode = Column(String(20))
+    regeneration_ms = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    draft = relationship("EmailDraft", back_populates="versions")
 
 
 class ApprovalAction(Base):
@@ -111,6 +321,8 @@ class ApprovalAction(Base):
         nullable=False,
     )
     comment = Column(Text)
+    # Tier of the draft version decided on (email_drafts.model_tier changes on regeneration)
+    model_tier = Column(String(20), nullable=True)
     slack_message_ts = Column(String(100))
     slack_channel_id = Column(String(100))
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -119,11 +331,99 @@ class ApprovalAction(Base):
     reviewer = relationship("User", back_populates="approval_actions")
 
 
+class LLMUsage(Base):
+    __tablename__ = "llm_usage"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    draft_id = Column(UUID(as_uuid=True), ForeignKey("email_drafts.id"), nullable=False, index=True)
+    mailbox_id = Column(UUID(as_uuid=True), ForeignKey("mailboxes.id"), nullable=False)
+    purpose = Column(String(20), nullable=False)
+    model = Column(String(100), nullable=False)
+    tone = Column(String(50), nullable=True)
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    latency_ms = Column(Integer, nullable=True)
+    cost_usd = Column(Numeric(12, 6), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    draft = relationship("EmailDraft", back_populates="llm_usage")
+
+
+class SlackOutbox(Base):
+    __tablename__ = "slack_outbox"
+    __table_args__ = (UniqueConstraint("draft_id", "version"),)
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    draft_id = Column(UUID(as_uuid=True), ForeignKey("email_drafts.id"), nullable=False)
+    version = Column(Integer, nullable=False)
+    recipient = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="pending", index=True)
+    single = Column(Boolean, default=False)
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    channel_id = Column(String(50), nullable=True)
+    message_ts = Column(String(50), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    draft = relationship("EmailDraft")
+
+
+class SlackInteraction(Base):
+    """One processed Slack interaction; the unique fingerprint rejects redeliveries."""
+
+    __tablename__ = "slack_interactions"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    fingerprint = Column(String(64), nullable=False, unique=True)
+    action_id = Column(String(50), nullable=False)
+    draft_id = Column(UUID(as_uuid=True), ForeignKey("email_drafts.id"), nullable=False)
+    draft_version = Column(Integer, nullable=False)
+    message_ts = Column(String(50), nullable=True)
+    status = Column(String(20), nullable=False, default="processing")  # processing / done
+    result = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class LLMBatchJob(Base):
+    __tablename__ = "llm_batch_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    provider_batch_id = Column(String(255), nullable=True, index=True)
+    input_file_id = Column(String(255), nullable=True)
+    output_file_id = Column(String(255), nullable=True)
+    error_file_id = Column(String(255), nullable=True)
+    status = Column(String(50), default="submitted")
+    request_count = Column(Integer, default=0)
+    request_meta = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+
+
+class ThreadDigest(Base):
+    __tablename__ = "thread_digests"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    thread_id = Column(String(255), unique=True, nullable=False, index=True)
+    mailbox_id = Column(UUID(as_uuid=True), ForeignKey("mailboxes.id"), nullable=False)
+    summary = Column(Text, nullable=False, default="")
+    previous_summary = Column(Text, nullable=False, default="")
+    message_count = Column(Integer, default=0)
+    last_event_id = Column(UUID(as_uuid=True), nullable=True)
+    last_received_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 # --- Knowledge Base Tables ---
 
 
 class KBSignature(Base):
     __tablename__ = "kb_signatures"
+    __table_args__ = (
+        Index("ix_kb_signatures_is_default", "is_default", postgresql_where=text("is_default = true")),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(100), nullable=False)
@@ -136,6 +436,9 @@ class KBSignature(Base):
 
 class KBTone(Base):
     __tablename__ = "kb_tones"
+    __table_args__ = (
+        Index("ix_kb_tones_is_default", "is_default", postgresql_where=text("is_default = true")),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(100), nullable=False, unique=True)
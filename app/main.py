@@ -13,8 +13,17 @@ from .api.logs import router as logs_router
 from .api.settings import router as settings_router
 from .api.routes import router as api_router
 from .api.slack_webhook import router as slack_router
+from .api.usage import router as usage_router
 from .api.users import router as users_router
+from .core.config import settings
+from .db.base import async_engine
+from .services.breaker import breaker_states
+from .services.jobs import job_runner
+from .services.retention import retention_loop
 from .services.scheduler import poll_emails_loop
+from .services.slack import close_client as close_slack_client
+from .services.slack import start_client as start_slack_client
+from .services.slack_outbox import outbox_loop
 
 logging.basicConfig(
     level=logging.INFO,
@@ -26,10 +35,18 @@ STATIC_DIR = Path(__file__).parent / "static"
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await start_slack_client()
     task = asyncio.create_task(poll_emails_loop())
+    outbox_task = asyncio.create_task(outbox_loop())
+    retention_task = asyncio.create_task(retention_loop())
     logging.getLogger(__name__).info("Mailki Email Agent started")
     yield
     task.cancel()
+    outbox_task.cancel()
+    retention_task.cancel()
+    await job_runner.shutdown(settings.JOB_SHUTDOWN_TIMEOUT_SECONDS)
+    await close_slack_client()
+    await async_engine.dispose()
     logging.getLogger(__name__).info("Mailki Email Agent stopped")
 
 
@@ -38,7 +55,9 @@ app = FastAPI(title="Mailki Email Agent", lifespan=lifespan)
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
+    breakers = breaker_states()
+    degraded = any(b["state"] != "closed" for b in breakers.values())
+    return {"status": "degraded" if degraded else "ok", "breakers": breakers}
 
 
 @app.get("/")
@@ -53,5 +72,6 @@ app.include_router(users_router, prefix="/api")
 app.include_router(kb_router, prefix="/api")
 app.include_router(logs_router, prefix="/api")
 app.include_router(settings_router, prefix="/api")
+app.include_router(usage_router, prefix="/api")
 
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
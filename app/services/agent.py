@@ -1,37 +1,374 @@
 import hashlib
 import logging
-import re
-
-from openai import OpenAI
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator
+
+from openai import AsyncOpenAI
+from sqlalchemy import func, or_, select, update
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.db.models import EmailDraft, EmailEvent, KBCompliance, KBSignature, KBTone, KBVip
+from app.db.models import (
+    DraftVersion,
+    EmailDraft,
+    EmailEvent,
+    KBSignature,
+    KBTone,
+)
+from app.services.analysis import KnowledgeBase, analyze_event, get_event_analysis
+from app.services.breaker import openai_breaker
+from app.services.classifier import SKIP_CATEGORIES, classify_events
+from app.services.digest import get_thread_context, update_thread_digest
+from app.services.fair_queue import (
+    PRIORITY_CLASSES,
+    PRIORITY_RANKS,
+    fair_scheduler,
+    priority_class,
+    priority_rank_expr,
+)
+from app.services.llm import completions
+from app.services.model_router import record_latency, route_event
+from app.services.precedents import precedent_context
+from app.services.prompt import count_tokens
+from app.services.slack import (
+    delete_approval_message,
+    post_approval_placeholder,
+    stream_into_approval_message,
+    update_approval_message,
+)
+from app.services.slack_outbox import enqueue_approval, mark_posted, record_posted
+from app.services.usage import record_usage, usage_from_response
 
 logger = logging.getLogger(__name__)
 
+# Identifies this replica as lease owner on claimed email events
+WORKER_ID = settings.WORKER_ID or f"{socket.gethostname()}:{os.getpid()}"
+
+
+def triage_new_events(db: Session, events: list[EmailEvent]) -> list[EmailEvent]:
+    """Classify freshly ingested events and store their analysis (see analysis.analyze_event).
+
+    Events classified into a category that never needs a reply are marked processed
+    so they are never sent to the LLM. Returns the events that still need a draft.
+    """
+    if not events:
+        return []
+    kb = KnowledgeBase.load(db)
+    remaining = []
+    categories = classify_events(events) if settings.CLASSIFIER_ENABLED else [None] * len(events)
+    for event, category in zip(events, categories):
+        event.category = category or event.category
+        analysis = analyze_event(db, event, kb)
+        # VIP mail is always answered, whatever the classifier says
+        if category in SKIP_CATEGORIES and not analysis.priority:
+            event.is_processed = True
+            logger.info(f"Skipping generation for event {event.id}: classified as {category}")
+        else:
+            remaining.append(event)
+    db.commit()
+    return remaining
+
+
+def classifier_stats(db: Session) -> dict:
+    """Events per category, and how many LLM calls the skip categories avoided."""
+    counts = dict(
+        db.query(EmailEvent.category, func.count(EmailEvent.id))
+        .group_by(EmailEvent.category)
+        .all()
+    )
+    avoided = (
+        db.query(func.count(EmailEvent.id))
+        .filter(EmailEvent.category.in_(SKIP_CATEGORIES), ~EmailEvent.drafts.any())
+        .scalar()
+    )
+    return {
+        "categories": {(k or "unclassified"): v for k, v in counts.items()},
+        "llm_calls_avoided": avoided,
+    }
+
+
+def claim_candidates(db: Session, limit: int, now: datetime, batch_mode: bool = False):
+    """Locking query for the candidate window of claim_unprocessed_events.
+
+    The window is built per mailbox: each mailbox contributes its first
+    min(limit, MAILBOX_MAX_IN_FLIGHT) * CLAIM_WINDOW_FACTOR claimable events (by
+    priority class and age), and the window takes them by priority class, then
+    round-robin over the mailboxes. A single mailbox with a large backlog thus
+    cannot fill the window and starve the others.
+    """
+    claimable = [
+        EmailEvent.is_processed.is_(False),
+        EmailEvent.batch_job_id.is_(None),
+        or_(EmailEvent.lease_expires_at.is_(None), EmailEvent.lease_expires_at < now),
+    ]
+    if batch_mode:
+        # Normal/low priority mail is generated offline (see batch.submit_batch_job),
+        # unless its batch requests kept failing
+        claimable.append(or_(
+            priority_rank_expr() < PRIORITY_RANKS["normal"],
+            EmailEvent.batch_attempts >= settings.BATCH_MAX_ATTEMPTS,
+        ))
+    ranked = (
+        select(
+            EmailEvent.id,
+            EmailEvent.received_at,
+            func.row_number()
+            .over(partition_by=EmailEvent.mailbox_id, order_by=(priority_rank_expr(), EmailEvent.received_at))
+            .label("position"),
+        )
+        .where(*claimable)
+        .subquery()
+    )
+    per_mailbox = min(limit, settings.MAILBOX_MAX_IN_FLIGHT) * settings.CLAIM_WINDOW_FACTOR
+    return (
+        db.query(EmailEvent)
+        .join(ranked, (EmailEvent.id == ranked.c.id) & (EmailEvent.received_at == ranked.c.received_at))
+        # Rechecked on the locked rows: another worker may have claimed them meanwhile
+        .filter(ranked.c.position <= per_mailbox, *claimable)
+        .order_by(priority_rank_expr(), ranked.c.position, EmailEvent.received_at)
+        .limit(limit * settings.CLAIM_WINDOW_FACTOR)
+        .with_for_update(skip_locked=True, of=EmailEvent)
+    )
+
+
+def claim_unprocessed_events(db: Session, limit: int | None = None) -> list[EmailEvent]:
+    """Lease a batch of unprocessed emails to this worker.
+
+    Rows currently locked by another replica are skipped (FOR UPDATE SKIP LOCKED),
+    so concurrent claimers never receive the same event. Events whose lease has
+    expired (e.g. the owning worker crashed) become claimable again.
+
+    A window of candidates from every mailbox is locked (see claim_candidates),
+    and the fair scheduler picks the batch from it (see fair_queue.FairScheduler);
+    the remaining candidates are released again on commit.
+    """
+    now = datetime.utcnow()
+    limit = limit or settings.CLAIM_BATCH_SIZE
+    candidates = claim_candidates(
+        db, limit, now, batch_mode=settings.BATCH_MODE_ENABLED and bool(settings.OPENAI_API_KEY)
+    ).all()
+    if not candidates:
+        db.commit()
+        return []
+
+    in_flight = dict(
+        db.query(EmailEvent.mailbox_id, func.count(EmailEvent.id))
+        .filter_by(is_processed=False)
+        .filter(EmailEvent.lease_owner.isnot(None), EmailEvent.lease_expires_at >= now)
+        .group_by(EmailEvent.mailbox_id)
+        .all()
+    )
+    events = fair_scheduler.select(
+        candidates, {str(k): v for k, v in in_flight.items()}, limit
+    )
+
+    expires_at = now + timedelta(seconds=settings.CLAIM_LEASE_SECONDS)
+    for event in events:
+        if event.lease_owner and event.lease_owner != WORKER_ID:
+            logger.warning(f"Recovering expired lease of {event.lease_owner} on event {event.id}")
+        event.lease_owner = WORKER_ID
+        event.lease_expires_at = expires_at
+
+    # Commit releases the row locks; the lease keeps other workers away
+    db.commit()
+    return events
+
+
+def queue_depths(db: Session) -> dict[str, int]:
+    """Number of unprocessed events per priority class."""
+    depths = {cls: 0 for cls in PRIORITY_CLASSES}
+    rows = (
+        db.query(EmailEvent.priority, func.count(EmailEvent.id))
+        .filter_by(is_processed=False)
+        .group_by(EmailEvent.priority)
+        .all()
+    )
+    for priority, count in rows:
+        depths[priority_class(priority)] += count
+    return depths
+
 
 def process_new_emails(db: Session) -> list[EmailDraft]:
-    """Process unprocessed emails: check KB rules, generate AI draft."""
-    unprocessed = db.query(EmailEvent).filter_by(is_processed=False).all()
+    """Process unprocessed emails: check KB rules, generate AI draft.
+
+    Work is claimed in leased batches, so several replicas (and the /api/process
+    endpoint) can run this concurrently without generating duplicate drafts.
+    """
+    drafts = []
+
+    default_tone = db.query(KBTone).filter_by(is_default=True).first()
+    default_signature = db.query(KBSignature).filter_by(is_default=True).first()
+    kb = KnowledgeBase.load(db)
+
+    while True:
+        if not openai_breaker.available:
+            logger.warning("OpenAI circuit open, leaving unprocessed mail queued")
+            break
+        batch = claim_unprocessed_events(db)
+        if not batch:
+            break
+        drafts.extend(
+            _process_batch(db, batch, default_tone, default_signature, kb)
+        )
+
+    return drafts
+
+
+async def process_new_emails_streaming(db: Session) -> list[EmailDraft]:
+    """Like process_new_emails, but streams each reply into its Slack approval message.
+
+    The approval message is posted before generation starts and updated as tokens
+    arrive; the draft (and its body hash) is only stored once the stream finishes,
+    and only then are the buttons shown. Returned drafts are already posted to Slack
+    (unless Slack was unreachable, in which case they stay pending for /api/notify).
+    """
     drafts = []
 
     default_tone = db.query(KBTone).filter_by(is_default=True).first()
     default_signature = db.query(KBSignature).filter_by(is_default=True).first()
-    vips = db.query(KBVip).all()
-    compliance_rules = db.query(KBCompliance).filter_by(is_active=True).all()
+    kb = KnowledgeBase.load(db)
+
+    tone_prompt = default_tone.prompt_template if default_tone else "Antworte professionell und freundlich auf Deutsch."
+    signature_text = default_signature.content_text if default_signature else ""
+
+    while True:
+        if not openai_breaker.available:
+            logger.warning("OpenAI circuit open, leaving unprocessed mail queued")
+            break
+        batch = claim_unprocessed_events(db)
+        if not batch:
+            break
+
+        for event in batch:
+            if not _renew_lease(db, event):
+                continue
+
+            analysis = get_event_analysis(db, event, kb)
+            compliance_flags = analysis.compliance_flags
+            prompt_body, tokens_saved = analysis.prompt_body, analysis.tokens_saved
+            thread_context = get_thread_context(db, event)
+            precedents = precedent_context(db, event, prompt_body, signature_text)
+            tier, model = route_event(db, event, prompt_body, compliance_flags)
+
+            # Not added to the session until the stream is complete
+            draft = EmailDraft(
+                id=uuid.uuid4(),
+                email_event_id=event.id,
+                subject=event.subject,
+                tone=default_tone.name if default_tone else "default",
+                version=1,
+                input_tokens_saved=tokens_saved,
+                model=model,
+                model_tier=tier,
+            )
+
+            started = time.monotonic()
+
+            try:
+                channel_id, ts = await post_approval_placeholder(draft, event)
+            except Exception as e:
+                # Slack unavailable: generate without streaming and queue the message instead
+                logger.error(f"Slack placeholder failed for event {event.id}: {e}")
+                channel_id = ts = None
+                try:
+                    reply, usage = _generate_ai_reply(
+                        event, tone_prompt, signature_text, compliance_flags, prompt_body, thread_context, model,
+                        precedents,
+                    )
+                except Exception as e:
+                    _defer_event(db, event, e)
+                    continue
+            else:
+                usage = {}
+                try:
+                    reply = await stream_into_approval_message(
+                        channel_id, ts, draft, event,
+                        _stream_ai_reply(
+                            event, tone_prompt, compliance_flags, prompt_body, thread_context, model, precedents,
+                            usage,
+                        ),
+                    )
+                    reply = reply.strip()
+                except Exception as e:
+                    _defer_event(db, event, e)
+                    try:
+                        await delete_approval_message(channel_id, ts)
+                    except Exception as e:
+                        logger.error(f"Removing approval placeholder for event {event.id} failed: {e}")
+                    continue
+
+                if signature_text:
+                    reply += f"\n\n{signature_text}"
+            record_latency(tier, time.monotonic() - started)
+
+            draft.body_text = reply
+            draft.body_hash = _calculate_body_hash(reply)
+            draft.status = "pending_approval"
+            db.add(draft)
+            record_usage(db, draft, event, usage, "stream" if channel_id else "draft")
+            update_thread_digest(db, event, prompt_body, draft)
+            if channel_id:
+                # Stored with the draft, so /api/notify never posts it a second time
+                record_posted(db, draft, channel_id, ts)
+            if not _complete_event(db, event):
+                if channel_id:
+                    try:
+                        await delete_approval_message(channel_id, ts)
+                    except Exception as e:
+                        logger.error(f"Removing approval placeholder for event {event.id} failed: {e}")
+                continue
+
+            if channel_id:
+                try:
+                    result = await update_approval_message(channel_id, ts, draft, event, reply, final=True)
+                    if not result.get("ok"):
+                        raise ValueError(f"Slack error: {result.get('error')}")
+                    mark_posted(db, draft)
+                except Exception as e:
+                    logger.error(f"Final Slack update failed for draft {draft.id}, left to the outbox: {e}")
+                    mark_posted(db, draft, e)
+            else:
+                enqueue_approval(db, draft)
+            drafts.append(draft)
 
-    for event in unprocessed:
-        priority = _check_vip(event.sender, vips)
-        if priority:
-            event.priority = priority
+    return drafts
 
-        compliance_flags = _check_compliance(event.body_text or "", compliance_rules)
+
+def _process_batch(
+    db: Session,
+    batch: list[EmailEvent],
+    default_tone: KBTone | None,
+    default_signature: KBSignature | None,
+    kb: KnowledgeBase,
+) -> list[EmailDraft]:
+    drafts = []
+    for event in batch:
+        if not _renew_lease(db, event):
+            continue
+
+        analysis = get_event_analysis(db, event, kb)
+        compliance_flags = analysis.compliance_flags
+        prompt_body, tokens_saved = analysis.prompt_body, analysis.tokens_saved
+        thread_context = get_thread_context(db, event)
+        tier, model = route_event(db, event, prompt_body, compliance_flags)
 
         tone_prompt = default_tone.prompt_template if default_tone else "Antworte professionell und freundlich auf Deutsch."
         signature_text = default_signature.content_text if default_signature else ""
-
-        draft_body = _generate_ai_reply(event, tone_prompt, signature_text, compliance_flags)
+        precedents = precedent_context(db, event, prompt_body, signature_text)
+
+        started = time.monotonic()
+        try:
+            draft_body, usage = _generate_ai_reply(
+                event, tone_prompt, signature_text, compliance_flags, prompt_body, thread_context, model, precedents
+            )
+        except Exception as e:
+            _defer_event(db, event, e)
+            continue
+        record_latency(tier, time.monotonic() - started)
 
         draft = EmailDraft(
             email_event_id=event.id,
@@ -41,28 +378,193 @@ def process_new_emails(db: Session) -> list[EmailDraft]:
             tone=default_tone.name if default_tone else "default",
             status="pending_approval",
             version=1,
+            input_tokens_saved=tokens_saved,
+            model=model,
+            model_tier=tier,
         )
         db.add(draft)
-        event.is_processed = True
-        drafts.append(draft)
-
-    if drafts:
-        db.commit()
+        record_usage(db, draft, event, usage, "draft")
+        update_thread_digest(db, event, prompt_body, draft)
+        if _complete_event(db, event):
+            drafts.append(draft)
 
     return drafts
 
 
+def _leased(event: EmailEvent):
+    """UPDATE on event that only applies while this worker still holds its lease."""
+    return (
+        update(EmailEvent)
+        .where(
+            EmailEvent.id == event.id,
+            EmailEvent.received_at == event.received_at,
+            EmailEvent.is_processed.is_(False),
+            EmailEvent.lease_owner == WORKER_ID,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _complete_event(db: Session, event: EmailEvent) -> bool:
+    """Mark a leased event processed and commit its draft, one event per transaction.
+
+    Generation can outlast the lease (CLAIM_LEASE_SECONDS), after which another
+    replica may have re-claimed the event. If this worker no longer holds the lease,
+    the draft and everything else pending in the session is rolled back and False
+    is returned.
+    """
+    done = db.execute(_leased(event).values(is_processed=True, lease_owner=None, lease_expires_at=None)).rowcount
+    if not done:
+        db.rollback()
+        logger.warning(f"Lost lease on event {event.id} during generation, dropping its draft")
+        return False
+    db.commit()
+    return True
+
+
+def _renew_lease(db: Session, event: EmailEvent) -> bool:
+    """Extend this worker's lease on event before generating for it.
+
+    A batch is generated sequentially, so later events would otherwise sit out
+    most of their lease waiting. False if another worker has claimed the event
+    since (or it is done).
+    """
+    expires_at = datetime.utcnow() + timedelta(seconds=settings.CLAIM_LEASE_SECONDS)
+    renewed = db.execute(_leased(event).values(lease_expires_at=expires_at)).rowcount
+    db.commit()
+    if not renewed:
+        logger.warning(f"Lease on event {event.id} was taken over before processing, skipping")
+    return bool(renewed)
+
+
+def _defer_event(db: Session, event: EmailEvent, error: Exception) -> None:
+    """Put an event back in the queue for a later attempt instead of drafting a placeholder.
+
+    The lease is released but keeps an expiry in the future, so no worker claims the
+    event again before the OpenAI circuit could have recovered. Leaves the event
+    alone if another worker has claimed it in the meantime.
+    """
+    delay = max(openai_breaker.retry_after(), settings.BREAKER_RESET_SECONDS)
+    logger.warning(f"Generation for event {event.id} failed, retrying in {delay:.0f}s: {error}")
+    db.execute(_leased(event).values(lease_owner=None, lease_expires_at=datetime.utcnow() + timedelta(seconds=delay)))
+    db.commit()
+
+
 def _generate_ai_reply(
     event: EmailEvent,
     tone_prompt: str,
     signature: str,
     compliance_flags: list[str],
-) -> str:
-    """Generate a reply using OpenAI. Falls back to placeholder if no API key."""
+    prompt_body: str | None = None,
+    thread_context: str = "",
+    model: str | None = None,
+    precedents: str = "",
+) -> tuple[str, dict | None]:
+    """Generate a reply using OpenAI. Falls back to placeholder if no API key.
+
+    Returns the reply and its usage (see usage.usage_from_response; None for a placeholder).
+
+    Errors are raised (CircuitOpenError without calling OpenAI while its circuit is
+    open) so the caller can defer the event instead of proposing a placeholder.
+
+    prompt_body is the cleaned, token-budgeted email body (see analysis.get_event_analysis);
+    the raw event body is used if it is not given. thread_context is the digest of
+    earlier messages in the thread (see digest.get_thread_context). model defaults
+    to OPENAI_MODEL; callers pass the tier chosen by model_router.route_event.
+    precedents are similar approved replies (see precedents.precedent_context).
+    """
+    if not settings.OPENAI_API_KEY:
+        logger.warning("No OPENAI_API_KEY set, using placeholder reply")
+        return _placeholder_reply(event, signature), None
+
+    system_prompt, user_prompt = _build_prompts(
+        event, tone_prompt, compliance_flags, prompt_body, thread_context, precedents
+    )
+
+    model = model or settings.OPENAI_MODEL
+    started = time.monotonic()
+    with openai_breaker:
+        response = completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            max_tokens=500,
+            temperature=0.7,
+        )
+    reply = response.choices[0].message.content.strip()
+
+    if signature:
+        reply += f"\n\n{signature}"
+
+    return reply, usage_from_response(response, model, time.monotonic() - started)
+
+
+async def _stream_ai_reply(
+    event: EmailEvent,
+    tone_prompt: str,
+    compliance_flags: list[str],
+    prompt_body: str | None = None,
+    thread_context: str = "",
+    model: str | None = None,
+    precedents: str = "",
+    usage: dict | None = None,
+) -> AsyncIterator[str]:
+    """Stream the reply text (without signature) chunk by chunk as tokens arrive.
+
+    If a usage dict is given, it is filled in once the stream is complete.
+    """
     if not settings.OPENAI_API_KEY:
         logger.warning("No OPENAI_API_KEY set, using placeholder reply")
-        return _placeholder_reply(event, signature)
+        yield _placeholder_reply(event, "")
+        return
 
+    system_prompt, user_prompt = _build_prompts(
+        event, tone_prompt, compliance_flags, prompt_body, thread_context, precedents
+    )
+
+    model = model or settings.OPENAI_MODEL
+    started = time.monotonic()
+    client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, timeout=settings.OPENAI_TIMEOUT_SECONDS)
+    # Only the request and the chunk reads run inside the breaker, never the yields:
+    # whatever the consumer does with a chunk is not an OpenAI failure
+    with openai_breaker:
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            max_tokens=500,
+            temperature=0.7,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+    async with stream:
+        chunks = aiter(stream)
+        while True:
+            with openai_breaker:
+                try:
+                    chunk = await anext(chunks)
+                except StopAsyncIteration:
+                    break
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if chunk.usage and usage is not None:
+                # Sent as a last chunk without choices
+                usage.update(usage_from_response(chunk, model, time.monotonic() - started))
+
+
+def _build_prompts(
+    event: EmailEvent,
+    tone_prompt: str,
+    compliance_flags: list[str],
+    prompt_body: str | None = None,
+    thread_context: str = "",
+    precedents: str = "",
+) -> tuple[str, str]:
+    """Build the (system, user) prompt pair for a reply to the given email."""
     compliance_note = ""
     if compliance_flags:
         compliance_note = (
@@ -78,36 +580,26 @@ def _generate_ai_reply(
         "Halte die Antwort kurz und praezise."
         f"{compliance_note}"
     )
+    if precedents:
+        system_prompt += (
+            "\n\nBeispiele frueherer, unveraendert freigegebener Antworten auf aehnliche "
+            "E-Mails (nur als Orientierung fuer Stil und Inhalt, nicht woertlich uebernehmen):\n\n"
+            f"{precedents}"
+        )
+
+    thread_note = ""
+    if thread_context:
+        thread_note = f"Bisheriger Verlauf dieses Threads (Zusammenfassung):\n{thread_context}\n\n"
 
     user_prompt = (
+        f"{thread_note}"
         f"Beantworte folgende E-Mail:\n\n"
         f"Von: {event.sender}\n"
         f"Betreff: {event.subject}\n"
-        f"Nachricht:\n{event.body_text}\n\n"
+        f"Nachricht:\n{prompt_body if prompt_body is not None else event.body_text}\n\n"
         f"---\nAntwort:"
     )
-
-    try:
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        response = client.chat.completions.create(
-            model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            max_tokens=500,
-            temperature=0.7,
-        )
-        reply = response.choices[0].message.content.strip()
-
-        if signature:
-            reply += f"\n\n{signature}"
-
-        return reply
-
-    except Exception as e:
-        logger.error(f"OpenAI API error: {e}")
-        return _placeholder_reply(event, signature)
+    return system_prompt, user_prompt
 
 
 def _placeholder_reply(event: EmailEvent, signature: str) -> str:
@@ -128,22 +620,65 @@ def _calculate_body_hash(body: str) -> str:
 
 
 def regenerate_draft(db: Session, draft: "EmailDraft", feedback: str) -> "EmailDraft":
-    """Regenerate a draft with reviewer feedback incorporated into the tone prompt."""
+    """Regenerate a draft with reviewer feedback.
+
+    With DRAFT_REVISION_MODE the previous draft is revised as an edit instruction
+    with a tight output budget, keeping what the reviewer did not ask to change.
+    Otherwise (or if the revision fails) the reply is regenerated from the original
+    email with the feedback added to the tone prompt. The replaced version is kept
+    in draft_versions. Requested changes always escalate to the strong model tier.
+    """
     event = draft.email_event
 
     default_tone = db.query(KBTone).filter_by(is_default=True).first()
     default_signature = db.query(KBSignature).filter_by(is_default=True).first()
-    compliance_rules = db.query(KBCompliance).filter_by(is_active=True).all()
+    signature_text = default_signature.content_text if default_signature else ""
+    tier, model = route_event(db, event, "", [], escalate=True)
+
+    history = DraftVersion(
+        draft_id=draft.id,
+        version=draft.version,
+        body_text=draft.body_text,
+        body_hash=draft.body_hash,
+        model=draft.model,
+        model_tier=draft.model_tier,
+        feedback=feedback,
+    )
 
-    compliance_flags = _check_compliance(event.body_text or "", compliance_rules)
+    started = time.monotonic()
+    new_body = None
+    usage = None
+    mode = "revision"
+    if settings.DRAFT_REVISION_MODE and settings.OPENAI_API_KEY:
+        revised = _revise_ai_reply(event, draft.body_text, feedback, signature_text, model)
+        if revised is not None:
+            new_body, usage = revised
 
-    tone_prompt = default_tone.prompt_template if default_tone else "Antworte professionell und freundlich auf Deutsch."
-    tone_prompt += f"\n\nWICHTIG - Aenderungswuensche des Reviewers:\n{feedback}"
-    signature_text = default_signature.content_text if default_signature else ""
+    if new_body is None:
+        mode = "full"
+        analysis = get_event_analysis(db, event)
+        thread_context = get_thread_context(db, event)
+
+        tone_prompt = default_tone.prompt_template if default_tone else "Antworte professionell und freundlich auf Deutsch."
+        tone_prompt += f"\n\nWICHTIG - Aenderungswuensche des Reviewers:\n{feedback}"
+
+        new_body, usage = _generate_ai_reply(
+            event, tone_prompt, signature_text, analysis.compliance_flags, analysis.prompt_body,
+            thread_context, model,
+        )
+        draft.input_tokens_saved = analysis.tokens_saved
 
-    new_body = _generate_ai_reply(event, tone_prompt, signature_text, compliance_flags)
+    elapsed = time.monotonic() - started
+    record_latency(tier, elapsed)
+    history.regeneration_mode = mode
+    history.regeneration_ms = int(elapsed * 1000)
+    db.add(history)
+    record_usage(db, draft, event, usage, "revision" if mode == "revision" else "regeneration")
+    logger.info(f"Draft {draft.id} v{draft.version} regenerated ({mode}) in {elapsed:.2f}s")
 
     draft.body_text = new_body
+    draft.model = model
+    draft.model_tier = tier
     draft.body_hash = _calculate_body_hash(new_body)
     draft.version += 1
     draft.status = "pending_approval"
@@ -152,18 +687,117 @@ def regenerate_draft(db: Session, draft: "EmailDraft", feedback: str) -> "EmailD
     return draft
 
 
-def _check_vip(sender: str, vips: list[KBVip]) -> str | None:
-    """Check if sender matches a VIP pattern. Returns priority or None."""
-    for vip in vips:
-        if vip.email_pattern in sender:
-            return vip.priority
-    return None
+def generate_operator_draft(db: Session, event: EmailEvent, instructions: str | None = None) -> EmailDraft:
+    """Create a new draft for an event on operator request, even if it was already processed."""
+    default_tone = db.query(KBTone).filter_by(is_default=True).first()
+    default_signature = db.query(KBSignature).filter_by(is_default=True).first()
+    analysis = get_event_analysis(db, event)
+    thread_context = get_thread_context(db, event)
+    tier, model = route_event(db, event, analysis.prompt_body, analysis.compliance_flags)
+
+    tone_prompt = default_tone.prompt_template if default_tone else "Antworte professionell und freundlich auf Deutsch."
+    if instructions:
+        tone_prompt += f"\n\nZusaetzliche Anweisungen vom Operator:\n{instructions}"
+
+    signature_text = default_signature.content_text if default_signature else ""
+    precedents = precedent_context(db, event, analysis.prompt_body, signature_text)
+    started = time.monotonic()
+    draft_body, usage = _generate_ai_reply(
+        event, tone_prompt, signature_text, analysis.compliance_flags, analysis.prompt_body,
+        thread_context, model, precedents,
+    )
+    record_latency(tier, time.monotonic() - started)
+
+    draft = EmailDraft(
+        email_event_id=event.id,
+        subject=event.subject,
+        body_text=draft_body,
+        body_hash=_calculate_body_hash(draft_body),
+        tone=default_tone.name if default_tone else "default",
+        status="pending_approval",
+        version=1,
+        input_tokens_saved=analysis.tokens_saved,
+        model=model,
+        model_tier=tier,
+    )
+    db.add(draft)
+    record_usage(db, draft, event, usage, "operator")
+    db.commit()
+    db.refresh(draft)
+    return draft
+
+
+def _revise_ai_reply(
+    event: EmailEvent,
+    previous_body: str,
+    feedback: str,
+    signature: str,
+    model: str,
+) -> tuple[str, dict] | None:
+    """Apply reviewer feedback as an edit to the previous draft. Returns (reply, usage), None on failure."""
+    body = previous_body
+    if signature and body.endswith(signature):
+        body = body[: -len(signature)].rstrip()
+
+    # The revision should be about as long as the draft it edits
+    max_tokens = min(500, int(count_tokens(body, model) * 1.3) + 50)
+
+    system_prompt = (
+        "Du ueberarbeitest einen bestehenden E-Mail-Entwurf nach den Wuenschen eines Reviewers. "
+        "Aendere nur, was das Feedback verlangt; alle anderen Formulierungen bleiben unveraendert. "
+        "Gib den vollstaendigen ueberarbeiteten Antworttext zurueck, ohne Betreffzeile und ohne Kommentar."
+    )
+    user_prompt = (
+        f"E-Mail von {event.sender}, Betreff: {event.subject}\n\n"
+        f"Bisheriger Entwurf:\n{body}\n\n"
+        f"Feedback des Reviewers:\n{feedback}\n\n"
+        f"---\nUeberarbeiteter Entwurf:"
+    )
+
+    started = time.monotonic()
+    try:
+        with openai_breaker:
+            response = completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                max_tokens=max_tokens,
+                temperature=0.3,
+            )
+        reply = response.choices[0].message.content.strip()
+    except Exception as e:
+        logger.error(f"OpenAI revision error, falling back to full regeneration: {e}")
+        return None
+    # Feedback that adds content can outgrow the tight budget; a cut-off revision must not reach approval
+    if response.choices[0].finish_reason == "length":
+        logger.warning(f"Revision hit its {max_tokens} token limit, falling back to full regeneration")
+        return None
 
+    if signature:
+        reply += f"\n\n{signature}"
+    return reply, usage_from_response(response, model, time.monotonic() - started)
+
+
+def regeneration_stats(db: Session) -> dict[str, dict]:
+    """Latency of revision-mode edits compared with full regeneration."""
+    rows = (
+        db.query(
+            DraftVersion.regeneration_mode,
+            func.count(DraftVersion.id),
+            func.avg(DraftVersion.regeneration_ms),
+            func.percentile_cont(0.95).within_group(DraftVersion.regeneration_ms),
+        )
+        .group_by(DraftVersion.regeneration_mode)
+        .all()
+    )
+    return {
+        mode: {
+            "count": count,
+            "latency_ms_avg": round(float(avg_ms), 1) if avg_ms is not None else None,
+            "latency_ms_p95": round(float(p95_ms), 1) if p95_ms is not None else None,
+        }
+        for mode, count, avg_ms, p95_ms in rows
+    }
 
-def _check_compliance(body: str, rules: list[KBCompliance]) -> list[str]:
-    """Check email body against compliance rules. Returns list of flags."""
-    flags = []
-    for rule in rules:
-        if rule.pattern and re.search(rule.pattern, body, re.IGNORECASE):
-            flags.append(f"{rule.rule_name}: {rule.description}")
-    return flags
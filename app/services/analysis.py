@@ -0,0 +1,90 @@
+import hashlib
+import json
+import re
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import EmailEvent, EventAnalysis, KBCompliance, KBVip
+from app.services.prompt import count_tokens, prepare_email_body
+
+
+class KnowledgeBase:
+    """The KB rows an event analysis depends on, with a fingerprint of their content.
+
+    The version changes whenever a VIP or active compliance rule is added, edited
+    or removed (or the prompt token budget changes), which invalidates every
+    stored analysis computed against an older version.
+    """
+
+    def __init__(self, vips: list[KBVip], compliance_rules: list[KBCompliance]):
+        self.vips = vips
+        self.compliance_rules = compliance_rules
+        fingerprint = {
+            "vips": sorted([v.email_pattern, v.priority or ""] for v in vips),
+            "compliance": sorted(
+                [r.rule_name, r.description or "", r.pattern or ""] for r in compliance_rules
+            ),
+            "token_budget": settings.PROMPT_INPUT_TOKEN_BUDGET,
+        }
+        self.version = hashlib.sha256(json.dumps(fingerprint).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def load(cls, db: Session) -> "KnowledgeBase":
+        return cls(
+            db.query(KBVip).all(),
+            db.query(KBCompliance).filter_by(is_active=True).all(),
+        )
+
+
+def check_vip(sender: str, vips: list[KBVip]) -> str | None:
+    """Check if sender matches a VIP pattern. Returns priority or None."""
+    for vip in vips:
+        if vip.email_pattern in sender:
+            return vip.priority
+    return None
+
+
+def check_compliance(body: str, rules: list[KBCompliance]) -> list[str]:
+    """Check email body against compliance rules. Returns list of flags."""
+    flags = []
+    for rule in rules:
+        if rule.pattern and re.search(rule.pattern, body, re.IGNORECASE):
+            flags.append(f"{rule.rule_name}: {rule.description}")
+    return flags
+
+
+def analyze_event(db: Session, event: EmailEvent, kb: KnowledgeBase) -> EventAnalysis:
+    """Compute and store VIP priority, compliance flags and the prompt body of an event."""
+    analysis = event.analysis
+    if analysis is None:
+        analysis = EventAnalysis(email_event_id=event.id)
+        db.add(analysis)
+        event.analysis = analysis
+
+    priority = check_vip(event.sender, kb.vips)
+    prompt_body, tokens_saved = prepare_email_body(event.body_text or "")
+
+    analysis.kb_version = kb.version
+    analysis.priority = priority
+    analysis.compliance_flags = check_compliance(event.body_text or "", kb.compliance_rules)
+    analysis.prompt_body = prompt_body
+    analysis.input_tokens = count_tokens(prompt_body)
+    analysis.tokens_saved = tokens_saved
+    analysis.category = event.category
+
+    if priority:
+        event.priority = priority
+    return analysis
+
+
+def get_event_analysis(db: Session, event: EmailEvent, kb: KnowledgeBase | None = None) -> EventAnalysis:
+    """Stored analysis of an event, recomputed only if the KB changed since.
+
+    Pass a KnowledgeBase when analysing several events to load the KB once.
+    """
+    kb = kb or KnowledgeBase.load(db)
+    analysis = event.analysis
+    if analysis is None or analysis.kb_version != kb.version:
+        analysis = analyze_event(db, event, kb)
+    return analysis
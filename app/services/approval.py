@@ -0,0 +1,246 @@
+import asyncio
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.db.models import ApprovalAction, EmailDraft, EmailEvent
+from app.services.agent import _calculate_body_hash
+from app.services.gmail import (
+    check_thread_has_label,
+    get_or_create_label,
+    modify_labels,
+    remove_label,
+    send_reply,
+    set_label,
+)
+from app.services.precedents import add_precedent
+
+logger = logging.getLogger(__name__)
+
+# Bounds the drafts sent in parallel by bulk approval (independent of the default executor)
+_bulk_executor = ThreadPoolExecutor(
+    max_workers=settings.BULK_APPROVAL_CONCURRENCY, thread_name_prefix="bulk-approval"
+)
+
+
+def approve_draft(
+    db: Session,
+    draft: EmailDraft,
+    event: EmailEvent,
+    slack_message_ts: str | None = None,
+    slack_channel_id: str | None = None,
+    update_labels: bool = True,
+) -> dict:
+    """Verify and send an approved draft.
+
+    sent_by_agent is set right after the send, as it guards the thread against a
+    second send. With update_labels=False the caller removes needs_approval itself
+    (bulk approval batches that per mailbox).
+    """
+    mailbox_id = str(event.mailbox_id)
+
+    # Row lock until the decision is committed: a concurrent approval (Slack click,
+    # bulk call, other replica) waits here and then sees the draft as sent
+    db.refresh(draft, with_for_update=True)
+    if draft.status in ("sent", "rejected"):
+        return {"ok": False, "error": f"Draft is already {draft.status}."}
+
+    # 1. Hash verification: ensure draft body hasn't been tampered with
+    current_hash = _calculate_body_hash(draft.body_text)
+    if draft.body_hash and current_hash != draft.body_hash:
+        logger.warning(f"Hash mismatch for draft {draft.id} — body was modified outside the flow")
+        return {"ok": False, "error": "Draft body was modified. Please review again."}
+
+    # 2. Duplicate-send check: ensure we haven't already sent on this thread
+    try:
+        sent_label_id = get_or_create_label(mailbox_id, "sent_by_agent")
+        if check_thread_has_label(mailbox_id, event.thread_id, sent_label_id):
+            logger.warning(f"Thread {event.thread_id} already has sent_by_agent label — duplicate send prevented")
+            draft.status = "sent"
+            db.commit()
+            return {"ok": False, "error": "Email already sent for this thread."}
+    except Exception as e:
+        logger.error(f"Label check failed: {e}")
+
+    # 3. Send the email
+    draft.status = "approved"
+    approval = ApprovalAction(
+        draft_id=draft.id,
+        reviewer_id=draft.email_event.mailbox.user_id,
+        action="approved",
+        model_tier=draft.model_tier,
+        slack_message_ts=slack_message_ts,
+        slack_channel_id=slack_channel_id,
+    )
+    db.add(approval)
+
+    try:
+        send_reply(
+            mailbox_id=mailbox_id,
+            thread_id=event.thread_id,
+            to=event.sender,
+            subject=event.subject,
+            body=draft.body_text,
+        )
+        draft.status = "sent"
+
+        # 4. Label management: set sent_by_agent, remove needs_approval
+        try:
+            sent_label_id = get_or_create_label(mailbox_id, "sent_by_agent")
+            set_label(mailbox_id, event.gmail_message_id, sent_label_id)
+
+            if update_labels:
+                needs_approval_label_id = get_or_create_label(mailbox_id, "needs_approval")
+                remove_label(mailbox_id, event.gmail_message_id, needs_approval_label_id)
+        except Exception as e:
+            logger.error(f"Label update after send failed: {e}")
+
+    except Exception as e:
+        # Nothing was sent: the interaction may be retried
+        draft.status = "approved"
+        db.commit()
+        return {"ok": False, "error": str(e), "retryable": True}
+
+    db.commit()
+
+    try:
+        add_precedent(draft, event)
+    except Exception as e:
+        logger.error(f"Adding draft {draft.id} to precedent index failed: {e}")
+
+    return {"ok": True}
+
+
+def reject_draft(
+    db: Session,
+    draft: EmailDraft,
+    event: EmailEvent,
+    slack_message_ts: str | None = None,
+    slack_channel_id: str | None = None,
+    update_labels: bool = True,
+) -> dict:
+    db.refresh(draft, with_for_update=True)
+    if draft.status in ("sent", "rejected"):
+        return {"ok": False, "error": f"Draft is already {draft.status}."}
+
+    draft.status = "rejected"
+
+    approval = ApprovalAction(
+        draft_id=draft.id,
+        reviewer_id=draft.email_event.mailbox.user_id,
+        action="rejected",
+        model_tier=draft.model_tier,
+        slack_message_ts=slack_message_ts,
+        slack_channel_id=slack_channel_id,
+    )
+    db.add(approval)
+
+    # Remove needs_approval label
+    if update_labels:
+        try:
+            mailbox_id = str(event.mailbox_id)
+            needs_approval_label_id = get_or_create_label(mailbox_id, "needs_approval")
+            remove_label(mailbox_id, event.gmail_message_id, needs_approval_label_id)
+        except Exception as e:
+            logger.error(f"Label removal on reject failed: {e}")
+
+    db.commit()
+    return {"ok": True}
+
+
+def _decide_one(draft_id, action: str) -> tuple[dict, tuple[str, str] | None]:
+    """Approve/reject one draft in its own session (runs in a worker thread).
+
+    Returns the result and, on success, the (mailbox_id, gmail_message_id) whose
+    needs_approval label still has to be removed.
+    """
+    db = SessionLocal()
+    try:
+        draft = db.query(EmailDraft).filter_by(id=draft_id).first()
+        if draft is None:
+            return {"ok": False, "error": "Draft not found"}, None
+        if draft.status not in ("pending_approval", "approved"):
+            return {"ok": False, "error": f"Draft is already {draft.status}."}, None
+
+        event = draft.email_event
+        decide = approve_draft if action == "approve" else reject_draft
+        result = decide(db, draft, event, update_labels=False)
+        if not result.get("ok"):
+            return result, None
+        return result, (str(event.mailbox_id), event.gmail_message_id)
+    except Exception as e:
+        db.rollback()
+        return {"ok": False, "error": str(e)}, None
+    finally:
+        db.close()
+
+
+def _remove_needs_approval(mailbox_id: str, message_ids: list[str]) -> None:
+    needs_approval = get_or_create_label(mailbox_id, "needs_approval")
+    modify_labels(mailbox_id, message_ids, remove=[needs_approval])
+
+
+def _duplicates_per_thread(draft_ids: list) -> set[str]:
+    """Ids of drafts whose thread has a newer draft among draft_ids."""
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(EmailDraft.id, EmailEvent.mailbox_id, EmailEvent.thread_id)
+            .join(EmailEvent, EmailDraft.email_event_id == EmailEvent.id)
+            .filter(EmailDraft.id.in_(draft_ids))
+            .order_by(EmailDraft.created_at.desc())
+            .all()
+        )
+    finally:
+        db.close()
+    seen = set()
+    duplicates = set()
+    for draft_id, mailbox_id, thread_id in rows:
+        if (mailbox_id, thread_id) in seen:
+            duplicates.add(str(draft_id))
+        seen.add((mailbox_id, thread_id))
+    return duplicates
+
+
+async def bulk_decide(draft_ids: list, action: str) -> list[dict]:
+    """Approve ("approve") or reject ("reject") many drafts.
+
+    Drafts are processed BULK_APPROVAL_CONCURRENCY at a time, each with its own
+    session; the needs_approval removals are collected and applied with one
+    batchModify call per mailbox at the end. At most one reply is sent per thread
+    and call (the newest draft), since parallel sends would all pass the
+    sent_by_agent check. Returns one result per draft, in input order.
+    """
+    skipped = await asyncio.to_thread(_duplicates_per_thread, draft_ids) if action == "approve" else set()
+
+    async def decide(draft_id):
+        if str(draft_id) in skipped:
+            return {"ok": False, "error": "A newer draft of this thread is approved in the same request."}, None
+        return await loop.run_in_executor(_bulk_executor, _decide_one, draft_id, action)
+
+    loop = asyncio.get_running_loop()
+    outcomes = await asyncio.gather(*(decide(draft_id) for draft_id in draft_ids))
+
+    messages: dict[str, list[str]] = defaultdict(list)
+    for _, labels in outcomes:
+        if labels:
+            messages[labels[0]].append(labels[1])
+    label_errors = {}
+    for mailbox_id, message_ids in messages.items():
+        try:
+            await asyncio.to_thread(_remove_needs_approval, mailbox_id, message_ids)
+        except Exception as e:
+            logger.error(f"Bulk label update for mailbox {mailbox_id} failed: {e}")
+            label_errors[mailbox_id] = str(e)
+
+    results = []
+    for draft_id, (result, labels) in zip(draft_ids, outcomes):
+        entry = {"draft_id": str(draft_id), **result}
+        if labels and labels[0] in label_errors:
+            entry["label_error"] = label_errors[labels[0]]
+        results.append(entry)
+    return results
@@ -0,0 +1,262 @@
+import json
+import logging
+from datetime import datetime, timedelta
+
+from openai import OpenAI
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import EmailDraft, EmailEvent, KBSignature, KBTone, LLMBatchJob
+from app.services.agent import _build_prompts, _calculate_body_hash
+from app.services.analysis import KnowledgeBase, get_event_analysis
+from app.services.digest import get_thread_context, mark_digest_pending
+from app.services.fair_queue import PRIORITY_RANKS, priority_rank_expr
+from app.services.model_router import route_event
+from app.services.precedents import precedent_context
+from app.services.usage import record_usage
+
+logger = logging.getLogger(__name__)
+
+# Provider batch states after which no further polling is needed
+TERMINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+def _batch_client() -> OpenAI:
+    # A base URL makes it possible to run against a local stand-in batch server
+    return OpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BATCH_BASE_URL or None,
+    )
+
+
+def submit_batch_job(db: Session) -> LLMBatchJob | None:
+    """Collect deferred (normal/low priority) events into one JSONL batch job.
+
+    Nothing is submitted until BATCH_MIN_REQUESTS events are waiting or the oldest
+    one has waited BATCH_MAX_WAIT_MINUTES. Events whose batch results failed
+    BATCH_MAX_ATTEMPTS times are left to interactive generation.
+    """
+    if not settings.OPENAI_API_KEY:
+        return None
+
+    now = datetime.utcnow()
+    events = (
+        db.query(EmailEvent)
+        .filter_by(is_processed=False, batch_job_id=None)
+        .filter(priority_rank_expr() >= PRIORITY_RANKS["normal"])
+        .filter(EmailEvent.batch_attempts < settings.BATCH_MAX_ATTEMPTS)
+        .filter(or_(EmailEvent.lease_expires_at.is_(None), EmailEvent.lease_expires_at < now))
+        .order_by(EmailEvent.received_at)
+        .limit(settings.BATCH_MAX_REQUESTS)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    oldest_wait = min((e.created_at or e.received_at for e in events), default=now)
+    if not events or (
+        len(events) < settings.BATCH_MIN_REQUESTS
+        and now - oldest_wait < timedelta(minutes=settings.BATCH_MAX_WAIT_MINUTES)
+    ):
+        db.commit()
+        return None
+
+    default_tone = db.query(KBTone).filter_by(is_default=True).first()
+    kb = KnowledgeBase.load(db)
+    default_signature = db.query(KBSignature).filter_by(is_default=True).first()
+    tone_prompt = default_tone.prompt_template if default_tone else "Antworte professionell und freundlich auf Deutsch."
+    signature_text = default_signature.content_text if default_signature else ""
+
+    lines = []
+    request_meta = {}
+    for event in events:
+        analysis = get_event_analysis(db, event, kb)
+        compliance_flags = analysis.compliance_flags
+        prompt_body, tokens_saved = analysis.prompt_body, analysis.tokens_saved
+        thread_context = get_thread_context(db, event)
+        precedents = precedent_context(db, event, prompt_body, signature_text)
+        tier, model = route_event(db, event, prompt_body, compliance_flags)
+        system_prompt, user_prompt = _build_prompts(
+            event, tone_prompt, compliance_flags, prompt_body, thread_context, precedents
+        )
+        lines.append(json.dumps({
+            "custom_id": str(event.id),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                "max_tokens": 500,
+                "temperature": 0.7,
+            },
+        }))
+        request_meta[str(event.id)] = {"tokens_saved": tokens_saved, "model": model, "tier": tier}
+
+    try:
+        client = _batch_client()
+        input_file = client.files.create(
+            file=("mailki_batch.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+    except Exception as e:
+        logger.error(f"Batch submission failed, events stay queued: {e}")
+        db.rollback()
+        return None
+
+    job = LLMBatchJob(
+        provider_batch_id=batch.id,
+        input_file_id=input_file.id,
+        status=batch.status,
+        request_count=len(events),
+        request_meta=request_meta,
+    )
+    db.add(job)
+    db.flush()
+    for event in events:
+        event.batch_job_id = job.id
+    db.commit()
+
+    logger.info(f"Submitted batch {batch.id} with {len(events)} requests")
+    return job
+
+
+def collect_batch_results(db: Session) -> list[EmailDraft]:
+    """Poll open batch jobs and turn finished results into drafts in bulk.
+
+    Each job is locked and committed on its own, so a slow or failing job does not
+    hold the others. The replies are not summarized into their thread digests
+    here (that would be one interactive LLM call per result); they are marked and
+    folded in by the next generation in the thread (see digest.mark_digest_pending).
+    """
+    job_ids = db.scalars(select(LLMBatchJob.id).where(LLMBatchJob.status.notin_(TERMINAL_STATES))).all()
+    db.commit()
+    if not job_ids:
+        return []
+
+    client = _batch_client()
+    default_tone = db.query(KBTone).filter_by(is_default=True).first()
+    default_signature = db.query(KBSignature).filter_by(is_default=True).first()
+    signature_text = default_signature.content_text if default_signature else ""
+
+    drafts = []
+    for job_id in job_ids:
+        job = (
+            db.query(LLMBatchJob)
+            .filter(LLMBatchJob.id == job_id, LLMBatchJob.status.notin_(TERMINAL_STATES))
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if job is None:
+            # Collected by another replica meanwhile
+            db.commit()
+            continue
+        drafts.extend(_collect_job(db, client, job, default_tone, signature_text))
+        db.commit()
+    return drafts
+
+
+def _collect_job(
+    db: Session,
+    client: OpenAI,
+    job: LLMBatchJob,
+    default_tone: KBTone | None,
+    signature_text: str,
+) -> list[EmailDraft]:
+    """Poll one locked job; if it finished, store its drafts and requeue its failures. Does not commit."""
+    try:
+        batch = client.batches.retrieve(job.provider_batch_id)
+    except Exception as e:
+        logger.error(f"Polling batch {job.provider_batch_id} failed: {e}")
+        return []
+
+    job.status = batch.status
+    if batch.status not in TERMINAL_STATES:
+        return []
+
+    job.output_file_id = batch.output_file_id
+    job.error_file_id = batch.error_file_id
+    job.completed_at = datetime.utcnow()
+
+    replies = {}
+    if batch.output_file_id:
+        try:
+            replies = _parse_output(client.files.content(batch.output_file_id).text)
+        except Exception as e:
+            logger.error(f"Reading output of batch {job.provider_batch_id} failed: {e}")
+
+    events = db.query(EmailEvent).filter_by(batch_job_id=job.id, is_processed=False).all()
+    new_drafts = []
+    for event in events:
+        reply, usage = replies.get(str(event.id), (None, None))
+        if reply is None:
+            # Failed or missing result: back to the queue for the next batch
+            event.batch_job_id = None
+            event.batch_attempts = (event.batch_attempts or 0) + 1
+            if event.batch_attempts >= settings.BATCH_MAX_ATTEMPTS:
+                logger.warning(
+                    f"Batch generation for event {event.id} failed {event.batch_attempts} times, "
+                    f"leaving it to interactive generation"
+                )
+            continue
+
+        if signature_text:
+            reply += f"\n\n{signature_text}"
+        meta = (job.request_meta or {}).get(str(event.id), {})
+        draft = EmailDraft(
+            email_event_id=event.id,
+            subject=event.subject,
+            body_text=reply,
+            body_hash=_calculate_body_hash(reply),
+            tone=default_tone.name if default_tone else "default",
+            status="pending_approval",
+            version=1,
+            input_tokens_saved=meta.get("tokens_saved"),
+            model=meta.get("model"),
+            model_tier=meta.get("tier"),
+        )
+        record_usage(db, draft, event, usage, "batch")
+        # The prompt was built from the digest before this message
+        mark_digest_pending(event)
+        new_drafts.append(draft)
+        event.is_processed = True
+
+    db.add_all(new_drafts)
+    logger.info(
+        f"Batch {job.provider_batch_id} {batch.status}: "
+        f"{len(new_drafts)} drafts, {len(events) - len(new_drafts)} requeued"
+    )
+    return new_drafts
+
+
+def _parse_output(content: str) -> dict[str, tuple[str, dict]]:
+    """Map custom_id -> (reply text, usage) for successful lines of a batch output file."""
+    replies = {}
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        response = item.get("response") or {}
+        if response.get("status_code") != 200:
+            continue
+        try:
+            body = response["body"]
+            usage = body.get("usage") or {}
+            replies[item["custom_id"]] = (
+                body["choices"][0]["message"]["content"].strip(),
+                {
+                    "model": body.get("model", ""),
+                    "prompt_tokens": usage.get("prompt_tokens", 0),
+                    "completion_tokens": usage.get("completion_tokens", 0),
+                    "latency_ms": None,
+                },
+            )
+        except (KeyError, IndexError, AttributeError):
+            logger.warning(f"Malformed batch result for {item.get('custom_id')}")
+    return replies
@@ -0,0 +1,120 @@
+import logging
+import time
+
+from sqlalchemy import or_, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.compression import compress_text
+from app.db.models import EmailDraft, EmailDraftBody, EmailEvent, EmailEventBody
+
+logger = logging.getLogger(__name__)
+
+# parent model, side table model, its key column
+BODY_TABLES = [
+    (EmailEvent, EmailEventBody, "email_event_id"),
+    (EmailDraft, EmailDraftBody, "email_draft_id"),
+]
+
+
+def _backfill_batch(db: Session, model, body_model, key: str, after, batch_size: int):
+    """Move the bodies of the next batch_size rows (by id) into the side table.
+
+    Returns (last id seen or None when done, rows moved). Rows locked by someone
+    else are skipped and stay on the legacy columns, where they are still read
+    correctly; a later run picks them up.
+    """
+    query = db.query(model.id, model.legacy_body_text, model.legacy_body_html).order_by(model.id)
+    if after is not None:
+        query = query.filter(model.id > after)
+    rows = query.limit(batch_size).with_for_update(skip_locked=True).all()
+    if not rows:
+        db.commit()
+        return None, 0
+
+    legacy = [row for row in rows if row.legacy_body_text is not None or row.legacy_body_html is not None]
+    if legacy:
+        db.execute(
+            insert(body_model)
+            .values([
+                {
+                    key: row.id,
+                    "body_text": compress_text(row.legacy_body_text),
+                    "body_html": compress_text(row.legacy_body_html),
+                }
+                for row in legacy
+            ])
+            # A body written through the ORM in the meantime is newer than the legacy one
+            .on_conflict_do_nothing(index_elements=[key])
+        )
+        db.execute(
+            update(model)
+            .where(model.id.in_([row.id for row in legacy]))
+            .values(legacy_body_text=None, legacy_body_html=None)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    return rows[-1].id, len(legacy)
+
+
+def backfill_bodies(
+    db: Session,
+    batch_size: int | None = None,
+    pause_seconds: float | None = None,
+) -> dict[str, int]:
+    """Move all legacy bodies into the compressed side tables, online.
+
+    Walks each table by primary key in batches of BODY_BACKFILL_BATCH_SIZE, one
+    short transaction per batch, sleeping BODY_BACKFILL_PAUSE_SECONDS in between
+    so the agent and the API keep their share of the database. Safe to rerun.
+    Returns the number of rows moved per table.
+    """
+    batch_size = batch_size or settings.BODY_BACKFILL_BATCH_SIZE
+    pause_seconds = settings.BODY_BACKFILL_PAUSE_SECONDS if pause_seconds is None else pause_seconds
+    moved = {}
+    for model, body_model, key in BODY_TABLES:
+        table = model.__tablename__
+        moved[table] = 0
+        after = None
+        started = time.monotonic()
+        while True:
+            after, count = _backfill_batch(db, model, body_model, key, after, batch_size)
+            if after is None:
+                break
+            moved[table] += count
+            if count:
+                time.sleep(pause_seconds)
+        logger.info(f"Moved {moved[table]} {table} bodies in {time.monotonic() - started:.0f}s")
+    return moved
+
+
+def legacy_body_counts(db: Session) -> dict[str, int]:
+    """Rows per table whose bodies are still on the legacy columns."""
+    return {
+        model.__tablename__: db.query(model.id)
+        .filter(or_(model.legacy_body_text.isnot(None), model.legacy_body_html.isnot(None)))
+        .count()
+        for model, _, _ in BODY_TABLES
+    }
+
+
+def storage_report(db: Session) -> dict[str, dict[str, int]]:
+    """On-disk size in bytes of the body-carrying tables: heap, TOAST, indexes."""
+    tables = [model.__tablename__ for model, _, _ in BODY_TABLES]
+    tables += [body_model.__tablename__ for _, body_model, _ in BODY_TABLES]
+    report = {}
+    for table in tables:
+        row = db.execute(
+            text(
+                # Summed over the partitions for email_events (a plain table is its own tree)
+                "SELECT sum(pg_relation_size(c.oid)) AS heap,"
+                " sum(COALESCE(pg_total_relation_size(NULLIF(c.reltoastrelid, 0)), 0)) AS toast,"
+                " sum(pg_indexes_size(c.oid)) AS indexes,"
+                " sum(pg_total_relation_size(c.oid)) AS total"
+                " FROM pg_partition_tree(CAST(:table AS regclass)) t JOIN pg_class c ON c.oid = t.relid"
+            ),
+            {"table": table},
+        ).one()
+        report[table] = {key: int(value or 0) for key, value in row._mapping.items()}
+    return report
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable
+
+import openai
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit open, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Per-dependency circuit breaker, used as a (sync) context manager around a call.
+
+    closed     calls pass; failure_threshold consecutive failures open the circuit
+    open       calls fail fast with CircuitOpenError for reset_seconds
+    half_open  one trial call passes; success closes the circuit, failure re-opens it
+
+    is_failure decides which exceptions count against the dependency; others (e.g.
+    a 4xx caused by our own request) pass through without touching the state.
+    Works around awaited calls too, as long as the await is inside the with block.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int | None = None,
+        reset_seconds: float | None = None,
+        is_failure: Callable[[BaseException], bool] | None = None,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.BREAKER_FAILURE_THRESHOLDS.get(
+            name, settings.BREAKER_FAILURE_THRESHOLD
+        )
+        self.reset_seconds = reset_seconds or settings.BREAKER_RESET_SECONDS
+        self.is_failure = is_failure or (lambda exc: True)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._opened_count = 0
+        self._rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    @property
+    def available(self) -> bool:
+        """False while calls would be rejected, so callers can skip work up front."""
+        return self.state != OPEN
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(self._opened_at + self.reset_seconds - time.monotonic(), 0.0)
+
+    def __enter__(self):
+        with self._lock:
+            state = self._current_state()
+            if state == OPEN or (state == HALF_OPEN and self._trial_running):
+                self._rejected += 1
+                retry_after = max(self._opened_at + self.reset_seconds - time.monotonic(), 0.0)
+                raise CircuitOpenError(self.name, retry_after)
+            if state == HALF_OPEN:
+                self._trial_running = True
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with self._lock:
+            if exc is None:
+                if self._state != CLOSED:
+                    logger.info(f"Circuit {self.name} closed again")
+                self._state = CLOSED
+                self._failures = 0
+                self._trial_running = False
+            elif self.is_failure(exc):
+                self._failures += 1
+                if self._trial_running or self._failures >= self.failure_threshold:
+                    if self._state != OPEN:
+                        self._opened_count += 1
+                        logger.warning(
+                            f"Circuit {self.name} opened after {self._failures} failures: {exc}"
+                        )
+                    self._state = OPEN
+                    self._opened_at = time.monotonic()
+                self._trial_running = False
+            else:
+                self._trial_running = False
+        return False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            state = self._current_state()
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "retry_after": (
+                    round(max(self._opened_at + self.reset_seconds - time.monotonic(), 0.0), 1)
+                    if state == OPEN else 0.0
+                ),
+                "times_opened": self._opened_count,
+                "calls_rejected": self._rejected,
+            }
+
+    def _current_state(self) -> str:
+        # Caller holds the lock; an open circuit turns half-open once reset_seconds passed
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self._state = HALF_OPEN
+            self._trial_running = False
+        return self._state
+
+
+def _is_openai_outage(exc: BaseException) -> bool:
+    # A consumer abandoning a stream (closed generator, cancelled task) or failing
+    # itself (e.g. Slack while streaming) says nothing about the API
+    if isinstance(exc, (GeneratorExit, asyncio.CancelledError)):
+        return False
+    if not isinstance(exc, (openai.APIError, TimeoutError)):
+        return False
+    # Our own bad requests (400/401/404/422) are not an outage of the API
+    status = getattr(exc, "status_code", None)
+    return status is None or status == 429 or status >= 500
+
+
+def _is_gmail_outage(exc: BaseException) -> bool:
+    if isinstance(exc, ValueError):
+        # Missing credentials for one mailbox
+        return False
+    status = getattr(getattr(exc, "resp", None), "status", None)
+    return status is None or int(status) == 429 or int(status) >= 500
+
+
+openai_breaker = CircuitBreaker("openai", is_failure=_is_openai_outage)
+gmail_breaker = CircuitBreaker("gmail", is_failure=_is_gmail_outage)
+slack_breaker = CircuitBreaker("slack")
+
+BREAKERS = {b.name: b for b in (openai_breaker, gmail_breaker, slack_breaker)}
+
+
+def breaker_states() -> dict[str, dict]:
+    return {name: breaker.snapshot() for name, breaker in BREAKERS.items()}
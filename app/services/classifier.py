@@ -0,0 +1,211 @@
+import logging
+import re
+import threading
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.config import settings
+from app.db.models import EmailDraft, EmailEvent
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = Path("/app/data/classifier.npz")
+
+# Categories that never get a reply; events with these are not sent to the LLM
+SKIP_CATEGORIES = {"no_reply", "bounce", "auto_reply", "newsletter", "no_reply_needed"}
+
+# Learned classes, index = row in the log-probability matrix
+CLASSES = ("needs_reply", "no_reply_needed")
+
+N_FEATURES = 2 ** 18
+
+_NO_REPLY_SENDER = re.compile(r"(no[-_.]?reply|do[-_.]?not[-_.]?reply|noreply|notifications?@)", re.IGNORECASE)
+_BOUNCE_SENDER = re.compile(r"(mailer-daemon|postmaster)@", re.IGNORECASE)
+_BOUNCE_SUBJECT = re.compile(
+    r"(undeliverable|unzustellbar|delivery status notification|mail delivery failed|returned mail|"
+    r"nicht zugestellt)",
+    re.IGNORECASE,
+)
+_AUTO_REPLY_SUBJECT = re.compile(
+    r"^\s*(automatische antwort|abwesenheit|out of office|auto(matic)?[ -]?reply|autoreply|"
+    r"abwesenheitsnotiz)",
+    re.IGNORECASE,
+)
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def classify_headers(headers: dict[str, str]) -> str | None:
+    """Header rules, applied at ingestion. Header names must be lower-cased."""
+    auto_submitted = headers.get("auto-submitted", "").lower()
+    if (auto_submitted and auto_submitted != "no") or "x-autoreply" in headers or "x-autorespond" in headers:
+        return "auto_reply"
+    if "list-unsubscribe" in headers or "list-id" in headers:
+        return "newsletter"
+    if headers.get("precedence", "").lower() in ("bulk", "list", "junk"):
+        return "newsletter"
+    return None
+
+
+def classify_rules(sender: str, subject: str) -> str | None:
+    """Sender/subject rules for mail that never needs a reply."""
+    subject = subject or ""
+    if _BOUNCE_SENDER.search(sender) or _BOUNCE_SUBJECT.search(subject):
+        return "bounce"
+    if _AUTO_REPLY_SUBJECT.search(subject):
+        return "auto_reply"
+    if _NO_REPLY_SENDER.search(sender):
+        return "no_reply"
+    return None
+
+
+def _features(event: EmailEvent) -> np.ndarray:
+    """Hashed unigram + bigram features of sender domain, subject and body."""
+    domain = event.sender.rsplit("@", 1)[-1].strip(" >").lower()
+    tokens = _TOKEN.findall(f"{event.subject or ''} {(event.body_text or '')[:4000]}".lower())
+    grams = [f"from:{domain}"] + tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return np.fromiter(
+        (zlib.crc32(g.encode("utf-8")) & (N_FEATURES - 1) for g in grams),
+        dtype=np.int64,
+        count=len(grams),
+    )
+
+
+class NaiveBayesClassifier:
+    """Multinomial naive Bayes over hashed n-gram features, scored in batches."""
+
+    def __init__(self, log_prob: np.ndarray, log_prior: np.ndarray, trained_at: datetime):
+        self.log_prob = log_prob
+        self.log_prior = log_prior
+        self.trained_at = trained_at
+
+    @classmethod
+    def fit(cls, feature_lists: list[np.ndarray], labels: np.ndarray, alpha: float = 1.0):
+        counts = np.zeros((len(CLASSES), N_FEATURES), dtype=np.float64)
+        for c in range(len(CLASSES)):
+            docs = [f for f, label in zip(feature_lists, labels) if label == c]
+            if docs:
+                counts[c] = np.bincount(np.concatenate(docs), minlength=N_FEATURES)
+        smoothed = counts + alpha
+        log_prob = np.log(smoothed / smoothed.sum(axis=1, keepdims=True)).astype(np.float32)
+        class_counts = np.bincount(labels, minlength=len(CLASSES)).astype(np.float64)
+        log_prior = np.log(class_counts / class_counts.sum()).astype(np.float32)
+        return cls(log_prob, log_prior, datetime.utcnow())
+
+    def predict_proba(self, feature_lists: list[np.ndarray]) -> np.ndarray:
+        """Class probabilities, shape (n_docs, n_classes)."""
+        lengths = np.array([len(f) for f in feature_lists])
+        if not len(lengths) or not lengths.sum():
+            return np.tile(np.exp(self.log_prior), (len(feature_lists), 1))
+
+        # One gather + segment sum for the whole batch
+        indices = np.concatenate(feature_lists)
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        gathered = self.log_prob[:, indices]
+        scores = np.zeros((len(CLASSES), len(feature_lists)), dtype=np.float32)
+        nonempty = lengths > 0
+        scores[:, nonempty] = np.add.reduceat(gathered, offsets[nonempty], axis=1)
+        scores = scores.T + self.log_prior
+        scores -= scores.max(axis=1, keepdims=True)
+        probs = np.exp(scores)
+        return probs / probs.sum(axis=1, keepdims=True)
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(
+            path,
+            log_prob=self.log_prob,
+            log_prior=self.log_prior,
+            trained_at=np.array(self.trained_at.isoformat()),
+        )
+
+    @classmethod
+    def load(cls, path: Path):
+        data = np.load(path)
+        return cls(data["log_prob"], data["log_prior"], datetime.fromisoformat(str(data["trained_at"])))
+
+
+_model: NaiveBayesClassifier | None = None
+_model_lock = threading.Lock()
+_last_training_attempt: datetime | None = None
+
+
+def _get_model() -> NaiveBayesClassifier | None:
+    global _model
+    with _model_lock:
+        if _model is None and MODEL_PATH.exists():
+            try:
+                _model = NaiveBayesClassifier.load(MODEL_PATH)
+            except Exception as e:
+                logger.error(f"Failed to load classifier from {MODEL_PATH}: {e}")
+        return _model
+
+
+def train_classifier(db: Session) -> NaiveBayesClassifier | None:
+    """Train on past reviewer decisions: sent/approved -> needs_reply, only rejected -> no_reply_needed."""
+    global _model
+    rows = (
+        db.query(EmailEvent, EmailDraft.status)
+        .join(EmailDraft, EmailDraft.email_event_id == EmailEvent.id)
+        .filter(EmailDraft.status.in_(["approved", "sent", "rejected"]))
+        .options(selectinload(EmailEvent.body))
+        .order_by(EmailEvent.received_at.desc())
+        .limit(settings.CLASSIFIER_MAX_TRAINING_SAMPLES)
+        .all()
+    )
+    outcomes: dict = {}
+    events: dict = {}
+    for event, status in rows:
+        events[event.id] = event
+        # Any approved draft means the mail needed a reply
+        outcomes[event.id] = outcomes.get(event.id, False) or status in ("approved", "sent")
+    labels = np.array([0 if needs_reply else 1 for needs_reply in outcomes.values()], dtype=np.int64)
+
+    class_counts = np.bincount(labels, minlength=len(CLASSES))
+    if class_counts.min() < settings.CLASSIFIER_MIN_SAMPLES:
+        logger.info(f"Not enough reviewed drafts to train classifier yet: {class_counts.tolist()}")
+        return None
+
+    model = NaiveBayesClassifier.fit([_features(events[eid]) for eid in outcomes], labels)
+    model.save(MODEL_PATH)
+    with _model_lock:
+        _model = model
+    logger.info(f"Trained email classifier on {len(labels)} events {class_counts.tolist()}")
+    return model
+
+
+def maybe_retrain(db: Session) -> None:
+    """Retrain once the model is older than CLASSIFIER_RETRAIN_HOURS (at most hourly if untrained)."""
+    global _last_training_attempt
+    now = datetime.utcnow()
+    model = _get_model()
+    trained_at = model.trained_at if model else datetime.min
+    if now - trained_at < timedelta(hours=settings.CLASSIFIER_RETRAIN_HOURS):
+        return
+    if _last_training_attempt and now - _last_training_attempt < timedelta(hours=1):
+        return
+
+    _last_training_attempt = now
+    try:
+        train_classifier(db)
+    except Exception as e:
+        logger.error(f"Classifier training failed: {e}")
+
+
+def classify_events(events: list[EmailEvent]) -> list[str]:
+    """Label events: header/rule categories first, then the learned model."""
+    categories = [e.category or classify_rules(e.sender, e.subject) for e in events]
+
+    model = _get_model()
+    pending = [i for i, c in enumerate(categories) if c is None]
+    if model is None or not pending:
+        return [c or "needs_reply" for c in categories]
+
+    probs = model.predict_proba([_features(events[i]) for i in pending])
+    skip = CLASSES.index("no_reply_needed")
+    for i, p in zip(pending, probs):
+        categories[i] = "no_reply_needed" if p[skip] >= settings.CLASSIFIER_SKIP_THRESHOLD else "needs_reply"
+    return categories
@@ -0,0 +1,212 @@
+import logging
+import time
+import uuid
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import EmailDraft, EmailEvent, ThreadDigest
+from app.services.analysis import KnowledgeBase, get_event_analysis
+from app.services.breaker import openai_breaker
+from app.services.llm import completions
+from app.services.prompt import count_tokens, truncate_to_budget
+from app.services.usage import record_usage, usage_from_response
+
+logger = logging.getLogger(__name__)
+
+# Summaries redone when other workers keep updating the same thread's digest
+MAX_DIGEST_ATTEMPTS = 3
+
+
+def get_thread_context(db: Session, event: EmailEvent) -> str:
+    """Return the digest of the messages before this event in its thread ("" if none).
+
+    Earlier messages marked by mark_digest_pending are folded in first. Does not commit.
+    """
+    if not settings.THREAD_DIGEST_ENABLED or not event.thread_id:
+        return ""
+
+    _fold_pending(db, event)
+    digest = db.query(ThreadDigest).filter_by(thread_id=event.thread_id).first()
+    if not digest:
+        return ""
+    # The event itself may already be folded in (e.g. on regeneration)
+    if digest.last_event_id == event.id:
+        return digest.previous_summary
+    return digest.summary
+
+
+def mark_digest_pending(event: EmailEvent) -> None:
+    """Leave folding this message into its thread digest to the next generation in the thread.
+
+    Used for batch results: summarizing them as they are collected would cost one
+    interactive LLM call per result. Most threads never get another message, and
+    those that do fold the message in via get_thread_context.
+    """
+    if settings.THREAD_DIGEST_ENABLED and event.thread_id:
+        event.digest_pending = True
+
+
+def _fold_pending(db: Session, event: EmailEvent) -> None:
+    """Fold the thread's pending messages received up to event into the digest."""
+    pending = (
+        db.query(EmailEvent)
+        .filter(
+            EmailEvent.thread_id == event.thread_id,
+            EmailEvent.digest_pending.is_(True),
+            EmailEvent.id != event.id,
+            EmailEvent.received_at <= event.received_at,
+        )
+        .order_by(EmailEvent.received_at)
+        # Another worker folding the same messages skips them
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not pending:
+        return
+    kb = KnowledgeBase.load(db)
+    for message in pending:
+        draft = (
+            db.query(EmailDraft)
+            .filter_by(email_event_id=message.id)
+            .order_by(EmailDraft.created_at)
+            .first()
+        )
+        if update_thread_digest(db, message, get_event_analysis(db, message, kb).prompt_body, draft):
+            message.digest_pending = False
+
+
+def update_thread_digest(
+    db: Session,
+    event: EmailEvent,
+    prompt_body: str,
+    draft: EmailDraft | None = None,
+) -> bool:
+    """Fold a new message into its thread's rolling digest. Does not commit.
+
+    Only the previous summary and the new message (already cleaned of quoted
+    history) are summarized, so the cost per message stays constant no matter
+    how long the thread gets.
+
+    The summary is generated without holding a lock on the digest row and then
+    written with a compare-and-set on message_count; if another worker folded
+    in a message meanwhile, the summary is redone on top of its result. Returns
+    whether the message was folded in.
+
+    The usage of every summarization is recorded as purpose "digest" on draft
+    (the reply to this message); llm_usage rows need a draft, so without one
+    it is only logged.
+    """
+    if not settings.THREAD_DIGEST_ENABLED or not event.thread_id:
+        return False
+
+    for _ in range(MAX_DIGEST_ATTEMPTS):
+        current = db.execute(
+            select(ThreadDigest.summary, ThreadDigest.message_count, ThreadDigest.last_event_id)
+            .where(ThreadDigest.thread_id == event.thread_id)
+        ).first()
+        if current and current.last_event_id == event.id:
+            return True
+
+        previous = current.summary if current else ""
+        summary, usage = _summarize(previous, event, prompt_body)
+        if usage and draft is not None:
+            record_usage(db, draft, event, usage, "digest")
+        elif usage:
+            logger.info(f"Digest summary of event {event.id} used {usage}, no draft to record it on")
+        values = {
+            "summary": summary,
+            "previous_summary": previous,
+            "last_event_id": event.id,
+        }
+        if current is None:
+            # Concurrent workers may see the first message of a thread at the same time
+            written = db.execute(
+                insert(ThreadDigest)
+                .values(
+                    id=uuid.uuid4(),
+                    thread_id=event.thread_id,
+                    mailbox_id=event.mailbox_id,
+                    message_count=1,
+                    last_received_at=event.received_at,
+                    **values,
+                )
+                .on_conflict_do_nothing(index_elements=["thread_id"])
+            ).rowcount
+        else:
+            written = db.execute(
+                update(ThreadDigest)
+                .where(
+                    ThreadDigest.thread_id == event.thread_id,
+                    ThreadDigest.message_count.is_not_distinct_from(current.message_count),
+                )
+                .values(
+                    message_count=(current.message_count or 0) + 1,
+                    # greatest() skips NULL
+                    last_received_at=func.greatest(ThreadDigest.last_received_at, event.received_at),
+                    **values,
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        if written:
+            return True
+        logger.info(f"Thread digest of {event.thread_id} changed concurrently, summarizing again")
+
+    logger.warning(f"Gave up folding event {event.id} into the digest of thread {event.thread_id}")
+    return False
+
+
+def _summarize(summary: str, event: EmailEvent, prompt_body: str) -> tuple[str, dict | None]:
+    """Update the summary with one new message, via the LLM if available.
+
+    Returns the summary and the usage of the LLM call (None for the extractive digest).
+    """
+    if settings.OPENAI_API_KEY:
+        try:
+            started = time.monotonic()
+            with openai_breaker:
+                response = completions.create(
+                    model=settings.OPENAI_MODEL,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": (
+                                "Du pflegst eine kompakte Zusammenfassung eines E-Mail-Verlaufs. "
+                                "Ergaenze die bisherige Zusammenfassung um die neue Nachricht. "
+                                "Behalte Fakten, offene Fragen, Zusagen und Fristen; "
+                                "lass Begruessungen und Wiederholungen weg."
+                            ),
+                        },
+                        {
+                            "role": "user",
+                            "content": (
+                                f"Bisherige Zusammenfassung:\n{summary or '(keine)'}\n\n"
+                                f"Neue Nachricht von {event.sender} ({event.received_at:%d.%m.%Y}):\n"
+                                f"{prompt_body}\n\n---\nAktualisierte Zusammenfassung:"
+                            ),
+                        },
+                    ],
+                    max_tokens=settings.THREAD_DIGEST_MAX_TOKENS,
+                    temperature=0.2,
+                )
+            return (
+                response.choices[0].message.content.strip(),
+                usage_from_response(response, settings.OPENAI_MODEL, time.monotonic() - started),
+            )
+        except Exception as e:
+            logger.error(f"Thread digest summarization failed, using extractive digest: {e}")
+
+    return _extractive_summary(summary, event, prompt_body), None
+
+
+def _extractive_summary(summary: str, event: EmailEvent, prompt_body: str) -> str:
+    """Append one line per message and drop the oldest lines to stay within budget."""
+    excerpt = truncate_to_budget(" ".join(prompt_body.split()), 60)
+    lines = [l for l in summary.splitlines() if l.strip()]
+    lines.append(f"- {event.received_at:%d.%m.%Y} {event.sender}: {excerpt}")
+
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > settings.THREAD_DIGEST_MAX_TOKENS:
+        lines.pop(0)
+    return "\n".join(lines)
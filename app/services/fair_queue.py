@@ -0,0 +1,105 @@
+import threading
+from collections import defaultdict, deque
+from datetime import datetime
+
+from sqlalchemy import case
+
+from app.core.config import settings
+from app.db.models import EmailEvent
+
+# Lower rank is served first; unknown priorities count as "normal"
+PRIORITY_RANKS = {"urgent": 0, "vip": 0, "high": 1, "normal": 2, "low": 3}
+PRIORITY_CLASSES = ["urgent", "high", "normal", "low"]
+
+
+def priority_class(priority: str | None) -> str:
+    rank = PRIORITY_RANKS.get(priority or "normal", PRIORITY_RANKS["normal"])
+    return PRIORITY_CLASSES[rank]
+
+
+def priority_rank_expr():
+    """SQL expression ranking EmailEvent.priority like PRIORITY_RANKS."""
+    return case(
+        *[(EmailEvent.priority == name, rank) for name, rank in PRIORITY_RANKS.items()],
+        else_=PRIORITY_RANKS["normal"],
+    )
+
+
+class FairScheduler:
+    """Priority-aware weighted fair queuing of email events across mailboxes.
+
+    Classes are served strictly in priority order. Within a class, mailboxes share
+    the batch by weighted fair queuing (start-time fair queuing on virtual finish
+    tags, weights from MAILBOX_WEIGHTS), each mailbox serving its oldest events
+    first and never exceeding MAILBOX_MAX_IN_FLIGHT leased events across replicas.
+    """
+
+    def __init__(self, wait_samples: int = 1000):
+        self._lock = threading.Lock()
+        self._virtual_time = 0.0
+        self._finish: dict[str, float] = {}
+        self._dispatched: dict[str, int] = defaultdict(int)
+        self._waits: dict[str, deque] = defaultdict(lambda: deque(maxlen=wait_samples))
+
+    def select(
+        self,
+        candidates: list[EmailEvent],
+        in_flight: dict[str, int],
+        limit: int,
+    ) -> list[EmailEvent]:
+        """Pick up to limit events from candidates in service order."""
+        by_class: dict[str, dict[str, deque]] = defaultdict(lambda: defaultdict(deque))
+        for event in sorted(candidates, key=lambda e: e.received_at):
+            by_class[priority_class(event.priority)][str(event.mailbox_id)].append(event)
+
+        in_flight = dict(in_flight)
+        selected = []
+        now = datetime.utcnow()
+
+        with self._lock:
+            for cls in PRIORITY_CLASSES:
+                queues = by_class.get(cls, {})
+                while len(selected) < limit:
+                    best = None
+                    for mailbox_id, queue in queues.items():
+                        if not queue or in_flight.get(mailbox_id, 0) >= settings.MAILBOX_MAX_IN_FLIGHT:
+                            continue
+                        start = max(self._virtual_time, self._finish.get(mailbox_id, 0.0))
+                        finish = start + 1.0 / self._weight(mailbox_id)
+                        if best is None or finish < best[2]:
+                            best = (mailbox_id, start, finish)
+                    if best is None:
+                        break
+
+                    mailbox_id, start, finish = best
+                    self._virtual_time = start
+                    self._finish[mailbox_id] = finish
+                    in_flight[mailbox_id] = in_flight.get(mailbox_id, 0) + 1
+
+                    event = queues[mailbox_id].popleft()
+                    selected.append(event)
+                    self._dispatched[cls] += 1
+                    self._waits[cls].append((now - (event.created_at or event.received_at)).total_seconds())
+
+        return selected
+
+    def stats(self) -> dict[str, dict]:
+        """Dispatch counts and queue wait times (seconds) per priority class."""
+        with self._lock:
+            result = {}
+            for cls in PRIORITY_CLASSES:
+                waits = sorted(self._waits[cls])
+                result[cls] = {
+                    "dispatched": self._dispatched[cls],
+                    "wait_avg": round(sum(waits) / len(waits), 3) if waits else None,
+                    "wait_p95": round(waits[int(len(waits) * 0.95)], 3) if waits else None,
+                    "wait_max": round(waits[-1], 3) if waits else None,
+                }
+            return result
+
+    @staticmethod
+    def _weight(mailbox_id: str) -> float:
+        return max(settings.MAILBOX_WEIGHTS.get(mailbox_id, 1.0), 0.01)
+
+
+fair_scheduler = FairScheduler()
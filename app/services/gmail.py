@@ -13,6 +13,9 @@ from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.db.models import EmailEvent, Mailbox
+from app.services.breaker import gmail_breaker
+from app.services.classifier import classify_headers
+from app.services.search import search_vector
 
 # Module-level cache for label IDs: {(mailbox_id, label_name): label_id}
 _label_cache: dict[tuple[str, str], str] = {}
@@ -78,6 +81,12 @@ def _get_gmail_service(mailbox_id: str):
     return build("gmail", "v1", credentials=creds)
 
 
+def _execute(request):
+    """Run a Gmail API request through the circuit breaker (CircuitOpenError if open)."""
+    with gmail_breaker:
+        return request.execute()
+
+
 def fetch_new_emails(db: Session, mailbox: Mailbox, max_results: int = 10) -> list[EmailEvent]:
     service = _get_gmail_service(str(mailbox.id))
     query = "is:inbox is:unread"
@@ -85,9 +94,9 @@ def fetch_new_emails(db: Session, mailbox: Mailbox, max_results: int = 10) -> li
         epoch = int(mailbox.last_sync_at.timestamp())
         query += f" after:{epoch}"
 
-    results = service.users().messages().list(
+    results = _execute(service.users().messages().list(
         userId="me", q=query, maxResults=max_results
-    ).execute()
+    ))
 
     messages = results.get("messages", [])
     new_events = []
@@ -98,23 +107,27 @@ def fetch_new_emails(db: Session, mailbox: Mailbox, max_results: int = 10) -> li
         if existing:
             continue
 
-        msg = service.users().messages().get(
+        msg = _execute(service.users().messages().get(
             userId="me", id=msg_id, format="full"
-        ).execute()
+        ))
 
         headers = {h["name"].lower(): h["value"] for h in msg["payload"]["headers"]}
         body_text = _extract_body(msg["payload"])
+        subject = headers.get("subject", "")
+        sender = headers.get("from", "")
 
         event = EmailEvent(
             mailbox_id=mailbox.id,
             gmail_message_id=msg_id,
             thread_id=msg.get("threadId"),
-            sender=headers.get("from", ""),
+            sender=sender,
             recipient=headers.get("to", ""),
-            subject=headers.get("subject", ""),
+            subject=subject,
             body_text=body_text,
+            search_vector=search_vector(subject, sender, body_text),
             cc=headers.get("cc", ""),
             bcc=headers.get("bcc", ""),
+            category=classify_headers(headers) if settings.CLASSIFIER_ENABLED else None,
             received_at=datetime.fromtimestamp(int(msg["internalDate"]) / 1000),
             is_processed=False,
         )
@@ -147,9 +160,9 @@ def send_reply(mailbox_id: str, thread_id: str, to: str, subject: str, body: str
     message["to"] = to
     message["subject"] = f"Re: {subject}" if not subject.startswith("Re:") else subject
     raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
-    sent = service.users().messages().send(
+    sent = _execute(service.users().messages().send(
         userId="me", body={"raw": raw, "threadId": thread_id}
-    ).execute()
+    ))
     return sent["id"]
 
 
@@ -160,10 +173,10 @@ def create_gmail_draft(mailbox_id: str, thread_id: str, to: str, subject: str, b
     message["to"] = to
     message["subject"] = f"Re: {subject}" if not subject.startswith("Re:") else subject
     raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
-    draft = service.users().drafts().create(
+    draft = _execute(service.users().drafts().create(
         userId="me",
         body={"message": {"raw": raw, "threadId": thread_id}},
-    ).execute()
+    ))
     return draft["id"]
 
 
@@ -174,21 +187,21 @@ def get_or_create_label(mailbox_id: str, label_name: str) -> str:
         return _label_cache[cache_key]
 
     service = _get_gmail_service(mailbox_id)
-    results = service.users().labels().list(userId="me").execute()
+    results = _execute(service.users().labels().list(userId="me"))
     for label in results.get("labels", []):
         if label["name"] == label_name:
             _label_cache[cache_key] = label["id"]
             return label["id"]
 
     # Label doesn't exist, create it
-    created = service.users().labels().create(
+    created = _execute(service.users().labels().create(
         userId="me",
         body={
             "name": label_name,
             "labelListVisibility": "labelShow",
             "messageListVisibility": "show",
         },
-    ).execute()
+    ))
     _label_cache[cache_key] = created["id"]
     return created["id"]
 
@@ -196,25 +209,44 @@ def get_or_create_label(mailbox_id: str, label_name: str) -> str:
 def set_label(mailbox_id: str, message_id: str, label_id: str) -> None:
     """Add a label to a Gmail message."""
     service = _get_gmail_service(mailbox_id)
-    service.users().messages().modify(
+    _execute(service.users().messages().modify(
         userId="me", id=message_id, body={"addLabelIds": [label_id]}
-    ).execute()
+    ))
 
 
 def remove_label(mailbox_id: str, message_id: str, label_id: str) -> None:
     """Remove a label from a Gmail message."""
     service = _get_gmail_service(mailbox_id)
-    service.users().messages().modify(
+    _execute(service.users().messages().modify(
         userId="me", id=message_id, body={"removeLabelIds": [label_id]}
-    ).execute()
+    ))
+
+
+def modify_labels(
+    mailbox_id: str,
+    message_ids: list[str],
+    add: list[str] | None = None,
+    remove: list[str] | None = None,
+) -> None:
+    """Add/remove labels on many messages with batchModify (1000 ids per call)."""
+    service = _get_gmail_service(mailbox_id)
+    for i in range(0, len(message_ids), 1000):
+        _execute(service.users().messages().batchModify(
+            userId="me",
+            body={
+                "ids": message_ids[i:i + 1000],
+                "addLabelIds": add or [],
+                "removeLabelIds": remove or [],
+            },
+        ))
 
 
 def check_thread_has_label(mailbox_id: str, thread_id: str, label_id: str) -> bool:
     """Check if any message in a thread has a specific label."""
     service = _get_gmail_service(mailbox_id)
-    thread = service.users().threads().get(
+    thread = _execute(service.users().threads().get(
         userId="me", id=thread_id, format="minimal"
-    ).execute()
+    ))
     for msg in thread.get("messages", []):
         if label_id in msg.get("labelIds", []):
             return True
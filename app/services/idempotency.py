@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import SlackInteraction
+
+logger = logging.getLogger(__name__)
+
+# Marker for a fingerprint whose first delivery is still being processed
+IN_PROGRESS = {"ok": True, "status": "processing"}
+
+
+class _TTLCache:
+    """fingerprint -> result for recently seen interactions, answered without the DB."""
+
+    def __init__(self, max_entries: int = 10000):
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[float, dict]] = {}
+        self._max_entries = max_entries
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def set(self, key: str, value: dict, ttl: float | None = None) -> None:
+        with self._lock:
+            if len(self._entries) >= self._max_entries:
+                now = time.monotonic()
+                self._entries = {k: e for k, e in self._entries.items() if e[0] >= now}
+            self._entries[key] = (time.monotonic() + (ttl or settings.SLACK_DEDUP_TTL_SECONDS), value)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+_recent = _TTLCache()
+
+
+def _mark_in_progress(fingerprint: str) -> None:
+    # Not cached past the timeout, so a stuck interaction can be taken over here too
+    ttl = min(settings.SLACK_DEDUP_TTL_SECONDS, settings.SLACK_INTERACTION_TIMEOUT_SECONDS)
+    _recent.set(fingerprint, IN_PROGRESS, ttl)
+
+
+def interaction_fingerprint(action_id: str, draft_id, version: int, message_ts: str | None) -> str:
+    """Identity of one user action on one version of a draft in one Slack message."""
+    key = f"{action_id}|{draft_id}|{version}|{message_ts or ''}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def begin_interaction(
+    db: Session,
+    fingerprint: str,
+    action_id: str,
+    draft_id,
+    version: int,
+    message_ts: str | None,
+) -> dict | None:
+    """Register the first delivery of an interaction.
+
+    Returns None if the caller should process it. For a repeated delivery (Slack
+    retry, double click, other replica) returns the stored result, or IN_PROGRESS
+    while the first delivery is still running. A delivery still marked processing
+    after SLACK_INTERACTION_TIMEOUT_SECONDS (the replica died mid-job) is taken
+    over by the next one.
+    """
+    cached = _recent.get(fingerprint)
+    if cached is not None:
+        return cached
+
+    result = db.execute(
+        insert(SlackInteraction)
+        .values(
+            id=uuid.uuid4(),
+            fingerprint=fingerprint,
+            action_id=action_id,
+            draft_id=draft_id,
+            draft_version=version,
+            message_ts=message_ts,
+            status="processing",
+            created_at=datetime.utcnow(),
+        )
+        .on_conflict_do_nothing(index_elements=["fingerprint"])
+    )
+    db.commit()
+    if result.rowcount == 1:
+        _mark_in_progress(fingerprint)
+        return None
+
+    # Conditional, so of several deliveries racing for a stuck row only one wins
+    now = datetime.utcnow()
+    reclaimed = db.execute(
+        update(SlackInteraction)
+        .where(
+            SlackInteraction.fingerprint == fingerprint,
+            SlackInteraction.status == "processing",
+            SlackInteraction.created_at < now - timedelta(seconds=settings.SLACK_INTERACTION_TIMEOUT_SECONDS),
+        )
+        .values(created_at=now)
+    )
+    db.commit()
+    if reclaimed.rowcount == 1:
+        logger.warning(f"Interaction {action_id} on draft {draft_id} was stuck in processing, taking it over")
+        _mark_in_progress(fingerprint)
+        return None
+
+    existing = db.query(SlackInteraction).filter_by(fingerprint=fingerprint).first()
+    stored = existing.result if existing and existing.status == "done" else IN_PROGRESS
+    _recent.set(fingerprint, stored)
+    return stored
+
+
+def finish_interaction(db: Session, fingerprint: str, result: dict) -> None:
+    """Store the outcome of a processed interaction.
+
+    A failure marked retryable (the action stopped before anything left the
+    system, e.g. send_reply raised) is forgotten so the user can click again.
+    Any other failure is stored like a success: the mail may already have gone
+    out before it (a commit failing after send_reply), so a repeat must not
+    send it again.
+    """
+    row = db.query(SlackInteraction).filter_by(fingerprint=fingerprint).first()
+    if result.get("ok") or not result.get("retryable"):
+        if row:
+            row.status = "done"
+            row.result = result
+            row.finished_at = datetime.utcnow()
+        _recent.set(fingerprint, result)
+    else:
+        if row:
+            db.delete(row)
+        _recent.discard(fingerprint)
+    db.commit()
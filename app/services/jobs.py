@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept for status lookups
+MAX_FINISHED_JOBS = 1000
+
+
+class Job:
+    def __init__(self, name: str):
+        self.id = str(uuid.uuid4())
+        self.name = name
+        self.status = "queued"
+        self.result: dict | None = None
+        self.error: str | None = None
+        self.created_at = datetime.utcnow()
+        self.started_at: datetime | None = None
+        self.finished_at: datetime | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class JobRunner:
+    """In-process background jobs with bounded concurrency and status tracking.
+
+    Used where a request must be answered quickly (Slack's 3 second limit) but the
+    work behind it takes longer. Jobs are lost on restart; callers keep their own
+    state in the database, a job only carries out one step of it.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._tasks: set[asyncio.Task] = set()
+
+    def submit(self, name: str, func: Callable[..., Awaitable[dict | None]], *args) -> Job:
+        """Schedule func(*args) and return immediately."""
+        job = Job(name)
+        self._jobs[job.id] = job
+        task = asyncio.create_task(self._run(job, func, args))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        counts: dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"max_concurrency": self.max_concurrency, "jobs": counts}
+
+    async def shutdown(self, timeout: float) -> None:
+        """Wait up to timeout seconds for running and queued jobs to finish."""
+        if self._tasks:
+            logger.info(f"Waiting for {len(self._tasks)} background jobs")
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+    async def _run(self, job: Job, func, args) -> None:
+        async with self._semaphore:
+            job.status = "running"
+            job.started_at = datetime.utcnow()
+            try:
+                job.result = await func(*args)
+                job.status = "succeeded"
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                logger.error(f"Job {job.name} ({job.id}) failed: {e}")
+            finally:
+                job.finished_at = datetime.utcnow()
+        self._forget_finished()
+
+    def _forget_finished(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at]
+        for job_id in finished[: max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self._jobs[job_id]
+
+
+job_runner = JobRunner(settings.JOB_RUNNER_CONCURRENCY)
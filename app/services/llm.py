@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from openai import OpenAI
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class HedgedCompletions:
+    """Chat completions with optional request hedging against slow tail latencies.
+
+    If a request has not answered within the LLM_HEDGE_PERCENTILE latency of recent
+    requests to the same model, a duplicate is started and whichever finishes first
+    wins; the other one is cancelled by closing its HTTP client. Hedges are capped at
+    LLM_HEDGE_BUDGET of the recent requests so an overall slowdown cannot double load.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+        self._latencies: dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+        self._recent_hedges: deque = deque(maxlen=window)
+        self._requests = 0
+        self._hedged = 0
+        self._hedge_wins = 0
+
+    def create(self, **kwargs):
+        """Same arguments and result as client.chat.completions.create."""
+        model = kwargs["model"]
+        delay = self._hedge_delay(model) if settings.LLM_HEDGING_ENABLED else None
+        if delay is None:
+            response, latency = self._attempt(None, kwargs)
+            self._record(model, latency, hedged=False)
+            return response
+
+        primary_client = self._client()
+        started = time.monotonic()
+        primary = self._executor.submit(self._attempt, primary_client, kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._take_budget():
+            response, latency = primary.result()
+            self._record(model, latency, hedged=False)
+            return response
+
+        hedge_client = self._client()
+        hedge = self._executor.submit(self._attempt, hedge_client, kwargs)
+        clients = {primary: primary_client, hedge: hedge_client}
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                for other in pending:
+                    # Closing the client aborts the in-flight request
+                    clients[other].close()
+                # The latency the caller saw, also when the later-started hedge wins:
+                # the hedge's own latency would pull the percentile (and the delay) down
+                response, _ = future.result()
+                self._record(model, time.monotonic() - started, hedged=True, hedge_won=future is hedge)
+                return response
+        raise error
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": settings.LLM_HEDGING_ENABLED,
+                "requests": self._requests,
+                "hedged": self._hedged,
+                "hedge_wins": self._hedge_wins,
+                "hedge_rate": round(self._hedged / self._requests, 4) if self._requests else None,
+                "win_rate": round(self._hedge_wins / self._hedged, 4) if self._hedged else None,
+                "hedge_delay_seconds": {
+                    model: round(self._percentile(latencies), 3)
+                    for model, latencies in self._latencies.items()
+                    if len(latencies) >= settings.LLM_HEDGE_MIN_SAMPLES
+                },
+            }
+
+    @staticmethod
+    def _client() -> OpenAI:
+        return OpenAI(api_key=settings.OPENAI_API_KEY, timeout=settings.OPENAI_TIMEOUT_SECONDS)
+
+    def _attempt(self, client: OpenAI | None, kwargs: dict):
+        started = time.monotonic()
+        response = (client or self._client()).chat.completions.create(**kwargs)
+        return response, time.monotonic() - started
+
+    def _hedge_delay(self, model: str) -> float | None:
+        with self._lock:
+            latencies = self._latencies[model]
+            if len(latencies) < settings.LLM_HEDGE_MIN_SAMPLES:
+                return None
+            return self._percentile(latencies)
+
+    @staticmethod
+    def _percentile(latencies: deque) -> float:
+        ordered = sorted(latencies)
+        return ordered[min(int(len(ordered) * settings.LLM_HEDGE_PERCENTILE), len(ordered) - 1)]
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            window = len(self._recent_hedges) + 1
+            if sum(self._recent_hedges) + 1 > settings.LLM_HEDGE_BUDGET * window:
+                return False
+            return True
+
+    def _record(self, model: str, latency: float, hedged: bool, hedge_won: bool = False) -> None:
+        with self._lock:
+            self._latencies[model].append(latency)
+            self._recent_hedges.append(hedged)
+            self._requests += 1
+            self._hedged += hedged
+            self._hedge_wins += hedge_won
+
+
+completions = HedgedCompletions()
@@ -0,0 +1,119 @@
+import threading
+from collections import defaultdict, deque
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import ApprovalAction, EmailDraft, EmailEvent
+from app.services.fair_queue import PRIORITY_RANKS
+
+TIERS = ("fast", "strong")
+
+# Feature weights of the complexity score (0..1 per feature)
+_WEIGHTS = {
+    "length": 0.3,
+    "questions": 0.2,
+    "compliance": 0.5,
+    "vip": 0.3,
+    "thread_depth": 0.2,
+}
+
+_latencies: dict[str, deque] = defaultdict(lambda: deque(maxlen=1000))
+_latency_lock = threading.Lock()
+
+
+def complexity_score(
+    event: EmailEvent,
+    prompt_body: str,
+    compliance_flags: list[str],
+    thread_depth: int,
+) -> float:
+    """Score how demanding a reply is, from cheap local features only."""
+    words = len(prompt_body.split())
+    questions = prompt_body.count("?")
+    is_vip = PRIORITY_RANKS.get(event.priority or "normal", PRIORITY_RANKS["normal"]) < PRIORITY_RANKS["normal"]
+
+    return (
+        _WEIGHTS["length"] * min(words / 300, 1.0)
+        + _WEIGHTS["questions"] * min(questions / 3, 1.0)
+        + _WEIGHTS["compliance"] * (1.0 if compliance_flags else 0.0)
+        + _WEIGHTS["vip"] * (1.0 if is_vip else 0.0)
+        + _WEIGHTS["thread_depth"] * min(max(thread_depth - 1, 0) / 4, 1.0)
+    )
+
+
+def model_for_tier(tier: str) -> str:
+    if tier == "strong":
+        return settings.OPENAI_STRONG_MODEL or settings.OPENAI_MODEL
+    return settings.OPENAI_FAST_MODEL or settings.OPENAI_MODEL
+
+
+def route_event(
+    db: Session,
+    event: EmailEvent,
+    prompt_body: str,
+    compliance_flags: list[str],
+    escalate: bool = False,
+) -> tuple[str, str]:
+    """Pick the model tier for a reply. Returns (tier, model).
+
+    escalate forces the strong tier, e.g. after a reviewer requested changes.
+    """
+    if escalate:
+        return "strong", model_for_tier("strong")
+
+    thread_depth = 1
+    if event.thread_id:
+        thread_depth = db.query(func.count(EmailEvent.id)).filter_by(thread_id=event.thread_id).scalar()
+    score = complexity_score(event, prompt_body, compliance_flags, thread_depth)
+    tier = "strong" if score >= settings.ROUTER_STRONG_THRESHOLD else "fast"
+    return tier, model_for_tier(tier)
+
+
+def record_latency(tier: str, seconds: float) -> None:
+    with _latency_lock:
+        _latencies[tier].append(seconds)
+
+
+def tier_stats(db: Session) -> dict[str, dict]:
+    """Latency (this replica, recent generations) and review outcomes per tier.
+
+    Outcomes are counted per decision on the tier of the version decided on
+    (ApprovalAction.model_tier): a change request on a fast-tier draft counts
+    for the fast tier even though the regenerated version is strong.
+    """
+    drafts = dict(
+        db.query(EmailDraft.model_tier, func.count(EmailDraft.id))
+        .group_by(EmailDraft.model_tier)
+        .all()
+    )
+    outcomes = defaultdict(dict)
+    rows = (
+        db.query(ApprovalAction.model_tier, ApprovalAction.action, func.count(ApprovalAction.id))
+        .filter(ApprovalAction.model_tier.isnot(None))
+        .group_by(ApprovalAction.model_tier, ApprovalAction.action)
+        .all()
+    )
+    for tier, action, count in rows:
+        outcomes[tier][action] = count
+
+    result = {}
+    for tier in TIERS:
+        with _latency_lock:
+            latencies = sorted(_latencies[tier])
+        counts = outcomes.get(tier, {})
+        approved = counts.get("approved", 0)
+        decided = approved + counts.get("rejected", 0)
+        result[tier] = {
+            "model": model_for_tier(tier),
+            "generations": len(latencies),
+            "latency_p50": round(latencies[len(latencies) // 2], 3) if latencies else None,
+            "latency_p95": round(latencies[int(len(latencies) * 0.95)], 3) if latencies else None,
+            "drafts": drafts.get(tier, 0),
+            "approved": approved,
+            "rejected": counts.get("rejected", 0),
+            "changes_requested": counts.get("edit_requested", 0),
+            "approval_rate": round(approved / decided, 3) if decided else None,
+        }
+    return result
@@ -0,0 +1,330 @@
+import fcntl
+import logging
+import os
+import re
+import threading
+import uuid
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.config import settings
+from app.db.models import EmailDraft, EmailEvent
+from app.services.prompt import prepare_email_body, truncate_to_budget
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = Path("/app/data/precedents")
+
+DIM = 128
+# Inverted lists: vectors are assigned to the nearest of N_LISTS centroids and a
+# query only scans the N_PROBE closest lists; below BRUTE_FORCE_BELOW rows all are scanned
+N_LISTS = 1024
+N_PROBE = 8
+BRUTE_FORCE_BELOW = 16 * N_LISTS
+KMEANS_SAMPLE = 32 * N_LISTS
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def embed(text: str) -> np.ndarray:
+    """Local embedding: signed feature hashing of word uni- and bigrams, L2-normalised."""
+    tokens = _TOKEN.findall(text.lower())
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    if not grams:
+        return np.zeros(DIM, dtype=np.float32)
+
+    hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint32, count=len(grams))
+    signs = np.where(hashes >> 31, -1.0, 1.0)
+    vec = np.bincount(hashes % DIM, weights=signs, minlength=DIM)
+    vec = np.sign(vec) * np.log1p(np.abs(vec))
+    norm = np.linalg.norm(vec)
+    return (vec / norm if norm else vec).astype(np.float32)
+
+
+class PrecedentIndex:
+    """Append-only embedding index over approved replies, memory-mapped from disk.
+
+    Files in the index directory:
+      vectors.f32    N x DIM float32 embeddings (memory-mapped, written last)
+      ids.bin        N x 16 byte draft UUIDs
+      lists.i32      N inverted-list assignments (-1 before centroids exist)
+      centroids.npy  N_LISTS x DIM list centroids
+
+    Writes (appends, clearing, rebuilding) are serialised across processes with
+    an flock, so replicas sharing the data volume can all add to and read from
+    the same index. Once centroids exist, an in-memory copy of the vectors grouped
+    by list is kept so a query scores a few contiguous slices instead of gathering
+    scattered rows; rows appended later are scored from the map until they make
+    up REGROUP_FRACTION of the index, then the copy is rebuilt.
+    """
+
+    REGROUP_FRACTION = 0.125
+
+    def __init__(self, directory: Path):
+        self.dir = directory
+        self._lock = threading.Lock()
+        self._writer = threading.local()
+        self._size = -1
+        self._centroids_version = None
+        self._vectors = np.zeros((0, DIM), dtype=np.float32)
+        self._ids = np.zeros((0, 16), dtype=np.uint8)
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._centroids: np.ndarray | None = None
+        self._order = np.zeros(0, dtype=np.int64)
+        self._grouped = np.zeros((0, DIM), dtype=np.float32)
+        self._bounds = np.zeros(0, dtype=np.int64)
+        # Rows [0, _grouped_rows) are in _grouped; later ones only in the map
+        self._grouped_rows = 0
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            self._refresh()
+            return max(self._size, 0)
+
+    @contextmanager
+    def writing(self):
+        """Hold the index's write lock (flock) across processes; reentrant within a thread."""
+        depth = getattr(self._writer, "depth", 0)
+        if depth:
+            self._writer.depth += 1
+            try:
+                yield
+            finally:
+                self._writer.depth -= 1
+            return
+
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with open(self.dir / ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._writer.depth = 1
+            try:
+                yield
+            finally:
+                self._writer.depth = 0
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def search(self, query: np.ndarray, k: int) -> list[tuple[uuid.UUID, float]]:
+        """Top-k (draft_id, cosine similarity), best first."""
+        with self._lock:
+            self._refresh()
+            vectors, ids, assign, centroids = self._vectors, self._ids, self._assign, self._centroids
+            order, grouped, bounds, grouped_rows = self._order, self._grouped, self._bounds, self._grouped_rows
+        if not len(vectors) or k <= 0:
+            return []
+
+        if centroids is None or len(vectors) < BRUTE_FORCE_BELOW:
+            rows = np.arange(len(vectors))
+            scores = vectors @ query
+        else:
+            probe = np.argpartition(-(centroids @ query), N_PROBE)[:N_PROBE]
+            tail = np.flatnonzero(np.isin(assign[grouped_rows:], probe)) + grouped_rows
+            rows = np.concatenate([order[bounds[i]:bounds[i + 1]] for i in probe] + [tail])
+            if not len(rows):
+                return []
+            scores = np.concatenate(
+                [grouped[bounds[i]:bounds[i + 1]] @ query for i in probe] + [np.asarray(vectors[tail]) @ query]
+            )
+
+        k = min(k, len(rows))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(uuid.UUID(bytes=ids[rows[i]].tobytes()), float(scores[i])) for i in best]
+
+    def add(self, entries: list[tuple[uuid.UUID, np.ndarray]]) -> None:
+        """Append (draft_id, vector) entries."""
+        if not entries:
+            return
+
+        with self.writing(), self._lock:
+            self._refresh()
+            vectors = np.stack([v for _, v in entries]).astype(np.float32)
+            if self._centroids is not None:
+                assign = np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+            else:
+                assign = np.full(len(entries), -1, dtype=np.int32)
+
+            # Vectors last: their file size defines how many rows are complete
+            with open(self.dir / "ids.bin", "ab") as f:
+                f.write(b"".join(draft_id.bytes for draft_id, _ in entries))
+            with open(self.dir / "lists.i32", "ab") as f:
+                f.write(assign.tobytes())
+            with open(self.dir / "vectors.f32", "ab") as f:
+                f.write(vectors.tobytes())
+
+            self._refresh()
+            if self._centroids is None and self._size >= BRUTE_FORCE_BELOW:
+                self._train_centroids()
+
+    def clear(self) -> None:
+        with self.writing(), self._lock:
+            for name in ("vectors.f32", "ids.bin", "lists.i32", "centroids.npy"):
+                (self.dir / name).unlink(missing_ok=True)
+            self._size = -1
+            self._refresh()
+
+    def _refresh(self) -> None:
+        """Re-map the files if rows were appended (by this or another process)."""
+        vector_path = self.dir / "vectors.f32"
+        n = vector_path.stat().st_size // (DIM * 4) if vector_path.exists() else 0
+        centroids_path = self.dir / "centroids.npy"
+        centroids_version = centroids_path.stat().st_mtime_ns if centroids_path.exists() else None
+        if n == self._size and centroids_version == self._centroids_version:
+            return
+
+        if n:
+            self._vectors = np.memmap(vector_path, dtype=np.float32, mode="r", shape=(n, DIM))
+            self._ids = np.memmap(self.dir / "ids.bin", dtype=np.uint8, mode="r", shape=(n, 16))
+            self._assign = np.memmap(self.dir / "lists.i32", dtype=np.int32, mode="r", shape=(n,))
+        else:
+            self._vectors = np.zeros((0, DIM), dtype=np.float32)
+            self._ids = np.zeros((0, 16), dtype=np.uint8)
+            self._assign = np.zeros(0, dtype=np.int32)
+        regroup = (
+            centroids_version != self._centroids_version
+            # Cleared (and possibly rebuilt) by another process
+            or n < self._grouped_rows
+            or n - self._grouped_rows > self.REGROUP_FRACTION * n
+        )
+        if centroids_version != self._centroids_version:
+            self._centroids = np.load(centroids_path) if centroids_version is not None else None
+            self._centroids_version = centroids_version
+
+        if self._centroids is None or n < BRUTE_FORCE_BELOW:
+            self._order = np.zeros(0, dtype=np.int64)
+            self._grouped = np.zeros((0, DIM), dtype=np.float32)
+            self._bounds = np.zeros(N_LISTS + 1, dtype=np.int64)
+            self._grouped_rows = 0
+        elif regroup or not self._grouped_rows:
+            assign = np.asarray(self._assign)
+            self._order = np.argsort(assign, kind="stable")
+            self._grouped = np.asarray(self._vectors)[self._order]
+            self._bounds = np.searchsorted(assign[self._order], np.arange(N_LISTS + 1))
+            self._grouped_rows = n
+        self._size = n
+
+    def _train_centroids(self, iterations: int = 10) -> None:
+        """Spherical k-means on a sample, then assign every row. Caller holds the write lock."""
+        rng = np.random.default_rng(0)
+        sample_rows = rng.choice(self._size, min(self._size, KMEANS_SAMPLE), replace=False)
+        sample = np.asarray(self._vectors[np.sort(sample_rows)])
+        centroids = sample[rng.choice(len(sample), N_LISTS, replace=False)]
+        for _ in range(iterations):
+            nearest = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, nearest, sample)
+            norms = np.linalg.norm(sums, axis=1)
+            # Empty lists keep their previous centroid
+            centroids[norms > 0] = sums[norms > 0] / norms[norms > 0, None]
+
+        assign = np.argmax(np.asarray(self._vectors) @ centroids.T, axis=1).astype(np.int32)
+        tmp = self.dir / "lists.i32.tmp"
+        assign.tofile(tmp)
+        os.replace(tmp, self.dir / "lists.i32")
+        np.save(self.dir / "centroids.npy", centroids.astype(np.float32))
+        self._size = -1
+        self._refresh()
+        logger.info(f"Trained {N_LISTS} precedent index lists over {len(assign)} entries")
+
+
+precedent_index = PrecedentIndex(INDEX_DIR)
+
+
+def _inbound_text(event: EmailEvent, prompt_body: str) -> str:
+    return f"{event.subject or ''}\n{prompt_body}"
+
+
+def _is_clean_approval(draft: EmailDraft) -> bool:
+    """Sent as first generated, i.e. without requested changes."""
+    return draft.status == "sent" and draft.version == 1
+
+
+def add_precedent(draft: EmailDraft, event: EmailEvent) -> None:
+    """Index a sent draft if the reviewer approved it without changes."""
+    if not settings.PRECEDENTS_ENABLED or not _is_clean_approval(draft):
+        return
+    if event.analysis is not None:
+        prompt_body = event.analysis.prompt_body
+    else:
+        prompt_body, _ = prepare_email_body(event.body_text or "")
+    precedent_index.add([(draft.id, embed(_inbound_text(event, prompt_body)))])
+
+
+def rebuild_precedent_index(db: Session, batch_size: int = 1000, only_if_empty: bool = False) -> int:
+    """Re-index all drafts approved without changes. Returns the number of entries.
+
+    Holds the index's write lock throughout, so replicas sharing the data volume
+    never rebuild at the same time. With only_if_empty, an index another replica
+    has built meanwhile is kept as is.
+    """
+    with precedent_index.writing():
+        if only_if_empty and precedent_index.size:
+            return precedent_index.size
+        precedent_index.clear()
+        query = (
+            db.query(EmailDraft, EmailEvent)
+            .join(EmailEvent, EmailDraft.email_event_id == EmailEvent.id)
+            .filter(EmailDraft.status == "sent", EmailDraft.version == 1)
+            .options(selectinload(EmailEvent.body))
+            .order_by(EmailDraft.created_at)
+        )
+        total = 0
+        entries = []
+        for draft, event in query.yield_per(batch_size):
+            prompt_body, _ = prepare_email_body(event.body_text or "")
+            entries.append((draft.id, embed(_inbound_text(event, prompt_body))))
+            if len(entries) >= batch_size:
+                precedent_index.add(entries)
+                total += len(entries)
+                entries = []
+        precedent_index.add(entries)
+        total += len(entries)
+    logger.info(f"Rebuilt precedent index with {total} entries")
+    return total
+
+
+def ensure_precedent_index(db: Session) -> None:
+    """Build the index on first start (e.g. fresh data volume)."""
+    if settings.PRECEDENTS_ENABLED and precedent_index.size == 0:
+        try:
+            rebuild_precedent_index(db, only_if_empty=True)
+        except Exception as e:
+            logger.error(f"Building precedent index failed: {e}")
+
+
+def precedent_context(db: Session, event: EmailEvent, prompt_body: str, signature: str = "") -> str:
+    """Format the most similar approved replies as few-shot examples ("" if none)."""
+    if not settings.PRECEDENTS_ENABLED:
+        return ""
+
+    hits = precedent_index.search(embed(_inbound_text(event, prompt_body)), settings.PRECEDENTS_TOP_K + 1)
+    hits = [(draft_id, score) for draft_id, score in hits if score >= settings.PRECEDENTS_MIN_SIMILARITY]
+    if not hits:
+        return ""
+
+    rows = (
+        db.query(EmailDraft, EmailEvent)
+        .join(EmailEvent, EmailDraft.email_event_id == EmailEvent.id)
+        .filter(EmailDraft.id.in_([draft_id for draft_id, _ in hits]), EmailEvent.id != event.id)
+        .all()
+    )
+    by_id = {draft.id: (draft, source) for draft, source in rows}
+
+    examples = []
+    for draft_id, _ in hits:
+        if draft_id not in by_id or len(examples) >= settings.PRECEDENTS_TOP_K:
+            continue
+        draft, source = by_id[draft_id]
+        reply = draft.body_text
+        if signature and reply.endswith(signature):
+            reply = reply[: -len(signature)].rstrip()
+        inbound, _ = prepare_email_body(source.body_text or "")
+        examples.append(
+            f"Anfrage ({source.subject}):\n{truncate_to_budget(inbound, 150)}\n"
+            f"Freigegebene Antwort:\n{truncate_to_budget(reply, 200)}"
+        )
+    return "\n\n".join(examples)
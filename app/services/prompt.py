@@ -0,0 +1,126 @@
+import logging
+import re
+import time
+from functools import lru_cache
+
+import tiktoken
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# A line that starts a quoted reply or a forwarded message; everything from here on is history
+_HISTORY_MARKERS = [
+    re.compile(r"^\s*-{2,}\s*(Original Message|Urspr(ü|ue)ngliche Nachricht)\s*-{2,}", re.IGNORECASE),
+    re.compile(r"^\s*-{2,}\s*(Forwarded message|Weitergeleitete Nachricht)\s*-{2,}", re.IGNORECASE),
+    re.compile(r"^\s*(Begin forwarded message|Anfang der weitergeleiteten Nachricht)\s*:", re.IGNORECASE),
+    re.compile(r"^\s*_{10,}\s*$"),
+]
+
+# "Am 01.02.2026 um 10:00 schrieb Max <max@example.com>:" / "On Mon, ... wrote:" (may wrap once)
+_REPLY_HEADER = re.compile(r"^\s*(Am|On)\s.{0,300}\s(schrieb|wrote)\b.{0,200}:\s*$", re.IGNORECASE | re.DOTALL)
+
+# Outlook-style header block: "Von: ..." followed by "Gesendet: ..." / "Sent: ..."
+_OUTLOOK_FROM = re.compile(r"^\s*\*?(Von|From)\s*:\*?\s", re.IGNORECASE)
+_OUTLOOK_SENT = re.compile(r"^\s*\*?(Gesendet|Sent|Datum|Date)\s*:\*?\s", re.IGNORECASE)
+
+# Signature delimiter ("-- ") and mobile footers
+_SIGNATURE_MARKERS = [
+    re.compile(r"^--\s*$"),
+    re.compile(r"^\s*(Von meinem \S+ gesendet|Sent from my \S+)", re.IGNORECASE),
+]
+
+
+# Rough tokens per character of mixed German/English text, used when no encoding is available
+_CHARS_PER_TOKEN = 4
+# After a failed encoding download, estimate this long before trying again
+_ENCODING_RETRY_SECONDS = 600
+_encoding_failed_at: float | None = None
+
+
+@lru_cache(maxsize=8)
+def _load_encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def _encoding_for(model: str):
+    """tiktoken encoding for model, or None if it cannot be loaded.
+
+    tiktoken downloads the BPE files on first use unless they are cached
+    (TIKTOKEN_CACHE_DIR, baked into the Docker image). Without network access
+    the token counts fall back to an estimate instead of failing every generation.
+    """
+    global _encoding_failed_at
+    if _encoding_failed_at is not None and time.monotonic() - _encoding_failed_at < _ENCODING_RETRY_SECONDS:
+        return None
+    try:
+        encoding = _load_encoding(model)
+    except Exception as e:
+        _encoding_failed_at = time.monotonic()
+        logger.warning(f"Loading tiktoken encoding for {model} failed, estimating token counts: {e}")
+        return None
+    _encoding_failed_at = None
+    return encoding
+
+
+def count_tokens(text: str, model: str | None = None) -> int:
+    """Count tokens of text for the given (default: configured) OpenAI model."""
+    encoding = _encoding_for(model or settings.OPENAI_MODEL)
+    if encoding is None:
+        return len(text) // _CHARS_PER_TOKEN
+    return len(encoding.encode(text))
+
+
+def strip_quoted_content(text: str) -> str:
+    """Remove quoted history, forwarded chains and signatures from an email body."""
+    lines = text.splitlines()
+    kept = []
+
+    for i, line in enumerate(lines):
+        if any(p.match(line) for p in _HISTORY_MARKERS):
+            break
+        next_line = lines[i + 1] if i + 1 < len(lines) else ""
+        if _REPLY_HEADER.match(line) or _REPLY_HEADER.match(f"{line} {next_line}"):
+            break
+        if _OUTLOOK_FROM.match(line) and any(_OUTLOOK_SENT.match(l) for l in lines[i + 1:i + 4]):
+            break
+        if any(p.match(line) for p in _SIGNATURE_MARKERS):
+            break
+        if line.lstrip().startswith(">"):
+            continue
+        kept.append(line)
+
+    stripped = re.sub(r"\n{3,}", "\n\n", "\n".join(kept)).strip()
+    # A pure forward has no own content left; fall back to the original
+    return stripped or text.strip()
+
+
+def truncate_to_budget(text: str, max_tokens: int, model: str | None = None) -> str:
+    """Cut text to max_tokens, keeping the beginning.
+
+    After quoted history is stripped, the top of a message is its newest content.
+    """
+    encoding = _encoding_for(model or settings.OPENAI_MODEL)
+    if encoding is None:
+        if len(text) <= max_tokens * _CHARS_PER_TOKEN:
+            return text
+        return text[:max_tokens * _CHARS_PER_TOKEN].rstrip() + "\n[...]"
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens]).rstrip() + "\n[...]"
+
+
+def prepare_email_body(body_text: str, model: str | None = None) -> tuple[str, int]:
+    """Clean and budget an email body for the prompt. Returns (text, input tokens saved)."""
+    original_tokens = count_tokens(body_text, model)
+    text = truncate_to_budget(
+        strip_quoted_content(body_text), settings.PROMPT_INPUT_TOKEN_BUDGET, model
+    )
+    saved = original_tokens - count_tokens(text, model)
+    if saved > 0:
+        logger.debug(f"Prompt body trimmed from {original_tokens} by {saved} tokens")
+    return text, max(saved, 0)
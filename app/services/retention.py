@@ -0,0 +1,315 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import zstandard
+from sqlalchemy import MetaData, delete, select, text, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.base import SessionLocal, engine
+from app.db.compression import decompress_text
+from app.db.models import (
+    ApprovalAction,
+    DraftVersion,
+    EmailDraft,
+    EmailDraftBody,
+    EmailEvent,
+    EmailEventBody,
+    EventAnalysis,
+    LLMUsage,
+    Mailbox,
+    SlackInteraction,
+    SlackOutbox,
+    ThreadDigest,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARTITION = "email_events_default"
+_PARTITION_NAME = re.compile(r"^email_events_p(\d{4})_(\d{2})$")
+
+# Only one replica runs the job at a time (session-level advisory lock)
+RETENTION_LOCK_KEY = 0x6D61696C  # "mail"
+
+# DDL on email_events waits at most this long for its lock, so readers and writers
+# never queue behind it for longer; a timed-out partition creation is retried
+DDL_LOCK_TIMEOUT = "5s"
+PARTITION_CREATE_ATTEMPTS = 3
+PARTITION_RETRY_SECONDS = 10
+# SQLSTATE lock_not_available
+_LOCK_NOT_AVAILABLE = "55P03"
+
+# Rows hanging off a draft, exported and deleted together with it
+DRAFT_CHILDREN = [DraftVersion, ApprovalAction, LLMUsage, SlackOutbox, SlackInteraction]
+
+
+def _month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"email_events_p{month:%Y_%m}"
+
+
+def _partitions(db: Session) -> dict[str, tuple[datetime, bool]]:
+    """Monthly partition tables -> (month, still attached). Detached ones are leftovers
+    of an interrupted archival run."""
+    rows = db.execute(
+        text("SELECT relname, relispartition FROM pg_class WHERE relkind = 'r' AND relname LIKE 'email\\_events\\_p%'")
+    ).all()
+    partitions = {}
+    for name, attached in rows:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions[name] = (datetime(int(match.group(1)), int(match.group(2)), 1), attached)
+    return partitions
+
+
+def _create_partition(db: Session, name: str, statement: str) -> bool:
+    """Run a CREATE TABLE ... PARTITION OF email_events under DDL_LOCK_TIMEOUT.
+
+    Behind a long claim or search the statement would otherwise queue for the lock
+    on email_events, and every query on the table behind it. Lock timeouts are
+    retried PARTITION_CREATE_ATTEMPTS times; returns False if all of them time out.
+    """
+    for attempt in range(1, PARTITION_CREATE_ATTEMPTS + 1):
+        try:
+            db.execute(text(f"SET LOCAL lock_timeout = '{DDL_LOCK_TIMEOUT}'"))
+            db.execute(text(statement))
+            db.commit()
+            return True
+        except OperationalError as e:
+            db.rollback()
+            if getattr(e.orig, "pgcode", None) != _LOCK_NOT_AVAILABLE:
+                raise
+            logger.warning(f"Creating partition {name} timed out waiting for its lock (attempt {attempt})")
+            if attempt < PARTITION_CREATE_ATTEMPTS:
+                time.sleep(PARTITION_RETRY_SECONDS)
+    logger.error(f"Creating partition {name} gave up after {PARTITION_CREATE_ATTEMPTS} lock timeouts")
+    return False
+
+
+def ensure_partitions(db: Session, months_ahead: int | None = None, months_back: int = 0) -> list[str]:
+    """Create the default partition and the monthly partitions from months_back
+    months ago to PARTITION_MONTHS_AHEAD months ahead. Partitions that could not
+    get their lock are left to the next run."""
+    months_ahead = settings.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    _create_partition(
+        db, DEFAULT_PARTITION, f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF email_events DEFAULT"
+    )
+    existing = _partitions(db)
+    created = []
+    month = _add_months(_month_start(datetime.utcnow()), -months_back)
+    for _ in range(months_back + months_ahead + 1):
+        name = partition_name(month)
+        if name not in existing:
+            upper = _add_months(month, 1)
+            try:
+                if _create_partition(
+                    db, name,
+                    f"CREATE TABLE {name} PARTITION OF email_events "
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')",
+                ):
+                    created.append(name)
+            except Exception as e:
+                # e.g. rows for that month already sitting in the default partition
+                db.rollback()
+                logger.error(f"Creating partition {name} failed: {e}")
+        month = _add_months(month, 1)
+    return created
+
+
+def _retention_by_mailbox(db: Session) -> dict:
+    """mailbox id -> retention in days (0 = keep forever)."""
+    return {
+        mailbox_id: settings.EVENT_RETENTION_DAYS if days is None else days
+        for mailbox_id, days in db.query(Mailbox.id, Mailbox.retention_days).all()
+    }
+
+
+class _Archive:
+    """Append-only zstd JSON-lines file, one frame per batch.
+
+    Every batch is fsynced before the caller deletes its rows, so an interrupted
+    run loses nothing (at worst a batch appears twice). Concatenated frames read
+    back as one stream, e.g. `zstd -dc file | jq`.
+    """
+
+    def __init__(self, name: str):
+        directory = Path(settings.RETENTION_ARCHIVE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / f"{name}.jsonl.zst"
+        self._compressor = zstandard.ZstdCompressor(level=settings.BODY_ZSTD_LEVEL)
+
+    def write(self, records: list[tuple[str, dict]]) -> None:
+        lines = "".join(
+            json.dumps({"table": table, "row": row}, default=str, ensure_ascii=False) + "\n"
+            for table, row in records
+        )
+        with open(self.path, "ab") as f:
+            f.write(self._compressor.compress(lines.encode("utf-8")))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _row(mapping) -> dict:
+    # bytea columns are the compressed bodies; archive them readable
+    return {key: decompress_text(value) if isinstance(value, bytes) else value for key, value in mapping.items()}
+
+
+def _archive_events(db: Session, archive: _Archive, events: list) -> None:
+    """Write events and everything hanging off them to the archive, then delete the
+    dependent rows. The events themselves are deleted (or dropped) by the caller."""
+    event_ids = [event.id for event in events]
+    records = [(EmailEvent.__tablename__, _row(event._mapping)) for event in events]
+
+    def fetch(model, column, ids):
+        rows = db.execute(select(model.__table__).where(column.in_(ids))).all() if ids else []
+        records.extend((model.__tablename__, _row(row._mapping)) for row in rows)
+        return rows
+
+    fetch(EmailEventBody, EmailEventBody.email_event_id, event_ids)
+    fetch(EventAnalysis, EventAnalysis.email_event_id, event_ids)
+    draft_ids = [row.id for row in fetch(EmailDraft, EmailDraft.email_event_id, event_ids)]
+    fetch(EmailDraftBody, EmailDraftBody.email_draft_id, draft_ids)
+    for model in DRAFT_CHILDREN:
+        fetch(model, model.draft_id, draft_ids)
+    archive.write(records)
+
+    if draft_ids:
+        for model in DRAFT_CHILDREN:
+            db.execute(delete(model.__table__).where(model.draft_id.in_(draft_ids)))
+        db.execute(delete(EmailDraftBody.__table__).where(EmailDraftBody.email_draft_id.in_(draft_ids)))
+        db.execute(delete(EmailDraft.__table__).where(EmailDraft.id.in_(draft_ids)))
+    db.execute(delete(EventAnalysis.__table__).where(EventAnalysis.email_event_id.in_(event_ids)))
+    db.execute(delete(EmailEventBody.__table__).where(EmailEventBody.email_event_id.in_(event_ids)))
+    db.execute(
+        update(ThreadDigest.__table__).where(ThreadDigest.last_event_id.in_(event_ids)).values(last_event_id=None)
+    )
+
+
+def purge_events(db: Session, table_name: str, cutoff: datetime, mailbox_id=None, archive_name: str = "") -> int:
+    """Archive and delete the events in table_name received before cutoff, in batches
+    of RETENTION_BATCH_SIZE (one transaction each). Returns the number of events."""
+    table = EmailEvent.__table__
+    if table_name != table.name:
+        table = table.to_metadata(MetaData(), name=table_name)
+    archive = _Archive(archive_name or f"{table_name}_{datetime.utcnow():%Y%m%d}")
+    total = 0
+    while True:
+        query = select(table).where(table.c.received_at < cutoff)
+        if mailbox_id is not None:
+            query = query.where(table.c.mailbox_id == mailbox_id)
+        events = db.execute(
+            query.order_by(table.c.received_at).limit(settings.RETENTION_BATCH_SIZE).with_for_update(skip_locked=True)
+        ).all()
+        if not events:
+            db.commit()
+            return total
+        _archive_events(db, archive, events)
+        db.execute(delete(table).where(table.c.id.in_([event.id for event in events]), table.c.received_at < cutoff))
+        db.commit()
+        total += len(events)
+
+
+def archive_partition(db: Session, name: str, attached: bool = True) -> int:
+    """Detach a monthly partition, archive its events with their drafts, drop it."""
+    if attached:
+        # Detaching locks email_events briefly; rather skip a round than queue behind long queries
+        db.execute(text(f"SET LOCAL lock_timeout = '{DDL_LOCK_TIMEOUT}'"))
+        db.execute(text(f"ALTER TABLE email_events DETACH PARTITION {name}"))
+        db.commit()
+    table = EmailEvent.__table__.to_metadata(MetaData(), name=name)
+    archive = _Archive(name)
+    total = 0
+    last_id = None
+    while True:
+        query = select(table).order_by(table.c.id).limit(settings.RETENTION_BATCH_SIZE)
+        if last_id is not None:
+            query = query.where(table.c.id > last_id)
+        events = db.execute(query).all()
+        if not events:
+            break
+        _archive_events(db, archive, events)
+        db.commit()
+        total += len(events)
+        last_id = events[-1].id
+    db.execute(text(f"DROP TABLE {name}"))
+    db.commit()
+    logger.info(f"Archived {total} events of partition {name} to {archive.path}")
+    return total
+
+
+def run_retention(db: Session) -> dict:
+    """Create upcoming partitions and archive mail past its mailbox's retention.
+
+    Whole months past the longest retention of all mailboxes are detached and
+    dropped as partitions; mailboxes with a shorter retention have their older
+    mail archived and deleted row by row. Mail in the default partition (dated
+    outside every monthly partition) is handled row by row as well.
+    """
+    report = {"partitions_created": ensure_partitions(db), "partitions_archived": [], "events_archived": 0}
+    now = datetime.utcnow()
+    retention = _retention_by_mailbox(db) or {None: settings.EVENT_RETENTION_DAYS}
+    longest = 0 if 0 in retention.values() else max(retention.values())
+
+    if longest:
+        horizon = now - timedelta(days=longest)
+        for name, (month, attached) in sorted(_partitions(db).items()):
+            if _add_months(month, 1) > horizon and attached:
+                continue
+            try:
+                report["events_archived"] += archive_partition(db, name, attached)
+                report["partitions_archived"].append(name)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Archiving partition {name} failed: {e}")
+        report["events_archived"] += purge_events(db, DEFAULT_PARTITION, horizon)
+
+    for mailbox_id, days in retention.items():
+        if mailbox_id is None or not days or days == longest:
+            continue
+        report["events_archived"] += purge_events(
+            db, EmailEvent.__tablename__, now - timedelta(days=days), mailbox_id,
+            archive_name=f"email_events_{mailbox_id}_{now:%Y%m%d}",
+        )
+    return report
+
+
+def _run_locked() -> dict | None:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock:
+        if not lock.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": RETENTION_LOCK_KEY}).scalar():
+            return None
+        try:
+            db = SessionLocal()
+            try:
+                return run_retention(db)
+            finally:
+                db.close()
+        finally:
+            lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": RETENTION_LOCK_KEY})
+
+
+async def retention_loop():
+    """Background loop: partition maintenance and retention, every RETENTION_CHECK_HOURS."""
+    logger.info("Retention job started")
+    while True:
+        try:
+            report = await asyncio.to_thread(_run_locked)
+            if report and (report["partitions_created"] or report["events_archived"]):
+                logger.info(f"Retention: {report}")
+        except Exception as e:
+            logger.error(f"Retention job error: {e}")
+        await asyncio.sleep(settings.RETENTION_CHECK_HOURS * 3600)
@@ -1,17 +1,27 @@
 import asyncio
 import logging
 
+from sqlalchemy.orm import Session
+
 from app.core.config import settings
 from app.db.base import SessionLocal
-from app.db.models import EmailEvent, Mailbox
-from app.services.agent import process_new_emails
+from app.db.models import EmailDraft, EmailEvent, Mailbox
+from app.services.agent import (
+    process_new_emails,
+    process_new_emails_streaming,
+    triage_new_events,
+)
+from app.services.batch import collect_batch_results, submit_batch_job
+from app.services.breaker import gmail_breaker
+from app.services.classifier import maybe_retrain
 from app.services.gmail import (
     create_gmail_draft,
     fetch_new_emails,
     get_or_create_label,
     set_label,
 )
-from app.services.slack import post_draft_for_approval
+from app.services.precedents import ensure_precedent_index
+from app.services.slack_outbox import enqueue_approval
 
 logger = logging.getLogger(__name__)
 
@@ -21,54 +31,39 @@ async def poll_emails_loop():
     interval = settings.POLL_INTERVAL_MINUTES * 60
     logger.info(f"Email polling started, interval: {settings.POLL_INTERVAL_MINUTES} min")
 
+    db = SessionLocal()
+    try:
+        await asyncio.to_thread(ensure_precedent_index, db)
+    finally:
+        db.close()
+
     while True:
         try:
             db = SessionLocal()
             mailboxes = db.query(Mailbox).filter_by(is_active=True).all()
 
+            if settings.CLASSIFIER_ENABLED:
+                maybe_retrain(db)
+
             total_new = 0
+            if not gmail_breaker.available:
+                logger.warning("Gmail circuit open, skipping fetch this round")
+                mailboxes = []
             for mailbox in mailboxes:
                 if not mailbox.credentials_ref:
                     continue
                 try:
                     new_events = fetch_new_emails(db, mailbox)
+                    triage_new_events(db, new_events)
                     total_new += len(new_events)
                 except Exception as e:
                     logger.error(f"Error fetching emails for {mailbox.email_address}: {e}")
 
             if total_new > 0:
                 logger.info(f"Fetched {total_new} new emails, processing...")
-                drafts = process_new_emails(db)
-                for draft in drafts:
-                    event = db.query(EmailEvent).filter_by(id=draft.email_event_id).first()
-                    if event:
-                        mailbox_id = str(event.mailbox_id)
-
-                        # Create Gmail draft and set label
-                        try:
-                            gmail_draft_id = create_gmail_draft(
-                                mailbox_id=mailbox_id,
-                                thread_id=event.thread_id,
-                                to=event.sender,
-                                subject=event.subject,
-                                body=draft.body_text,
-                            )
-                            draft.gmail_draft_id = gmail_draft_id
-                            db.commit()
-                        except Exception as e:
-                            logger.error(f"Gmail draft creation failed for draft {draft.id}: {e}")
-
-                        try:
-                            label_id = get_or_create_label(mailbox_id, "needs_approval")
-                            set_label(mailbox_id, event.gmail_message_id, label_id)
-                        except Exception as e:
-                            logger.error(f"Label setting failed for event {event.id}: {e}")
-
-                        # Send Slack DM
-                        try:
-                            await post_draft_for_approval(draft, event)
-                        except Exception as e:
-                            logger.error(f"Error notifying Slack for draft {draft.id}: {e}")
+
+            # Always claim: picks up mail fetched by other replicas and expired leases
+            await process_and_publish(db)
 
             db.close()
 
@@ -76,3 +71,63 @@ async def poll_emails_loop():
             logger.error(f"Polling loop error: {e}")
 
         await asyncio.sleep(interval)
+
+
+async def process_and_publish(db: Session) -> list[EmailDraft]:
+    """Generate drafts for claimed events, create Gmail drafts/labels and notify Slack."""
+    if settings.SLACK_STREAM_DRAFTS:
+        # Streamed drafts are posted to Slack while they are generated
+        drafts = await process_new_emails_streaming(db)
+    else:
+        drafts = process_new_emails(db)
+
+    for draft in drafts:
+        event = db.query(EmailEvent).filter_by(id=draft.email_event_id).first()
+        if event:
+            await _publish_draft(db, draft, event, notify_slack=not settings.SLACK_STREAM_DRAFTS)
+
+    if settings.BATCH_MODE_ENABLED:
+        # Offline path for normal-priority mail: results arrive on a later tick.
+        # Blocking provider calls, so off the event loop
+        await asyncio.to_thread(submit_batch_job, db)
+        batch_drafts = await asyncio.to_thread(collect_batch_results, db)
+        for draft in batch_drafts:
+            event = db.query(EmailEvent).filter_by(id=draft.email_event_id).first()
+            if event:
+                await _publish_draft(db, draft, event)
+        drafts.extend(batch_drafts)
+
+    return drafts
+
+
+async def _publish_draft(db: Session, draft: EmailDraft, event: EmailEvent, notify_slack: bool = True):
+    mailbox_id = str(event.mailbox_id)
+
+    # Create Gmail draft and set label
+    try:
+        gmail_draft_id = create_gmail_draft(
+            mailbox_id=mailbox_id,
+            thread_id=event.thread_id,
+            to=event.sender,
+            subject=event.subject,
+            body=draft.body_text,
+        )
+        draft.gmail_draft_id = gmail_draft_id
+        db.commit()
+    except Exception as e:
+        logger.error(f"Gmail draft creation failed for draft {draft.id}: {e}")
+
+    try:
+        label_id = get_or_create_label(mailbox_id, "needs_approval")
+        set_label(mailbox_id, event.gmail_message_id, label_id)
+    except Exception as e:
+        logger.error(f"Label setting failed for event {event.id}: {e}")
+
+    if not notify_slack:
+        return
+
+    # Queue the Slack DM; the outbox paces and batches the messages
+    try:
+        enqueue_approval(db, draft)
+    except Exception as e:
+        logger.error(f"Error queueing Slack notification for draft {draft.id}: {e}")
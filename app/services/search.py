@@ -0,0 +1,223 @@
+import html
+import logging
+import time
+from datetime import datetime
+
+from sqlalchemy import bindparam, func, literal, literal_column, select, text, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.types import Text
+
+from app.core.config import settings
+from app.db.models import EmailEvent
+
+logger = logging.getLogger(__name__)
+
+# Most mail is German: stemmed German lexemes match inflected forms, unstemmed
+# "simple" lexemes match names, codes and non-German words exactly
+CONFIGS = ("german", "simple")
+
+# to_tsvector refuses documents over 1 MB; the start of a mail is what people search for
+MAX_INDEXED_CHARS = 100_000
+# ts_headline parses the whole document, so only the start of long bodies is highlighted
+MAX_HEADLINE_CHARS = 20_000
+
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=8"
+
+
+def _config(name: str):
+    # Rendered inline: keeps the statements printable with literal binds (scripts/check_query_plans.py)
+    return literal_column(f"'{name}'::regconfig")
+
+
+def _weighted(value, weight: str, configs=CONFIGS):
+    vectors = [
+        func.setweight(func.to_tsvector(_config(config), value), literal_column(f"'{weight}'"))
+        for config in configs
+    ]
+    vector = vectors[0]
+    for other in vectors[1:]:
+        vector = vector.op("||")(other)
+    return vector
+
+
+def search_vector(subject: str | None, sender: str | None, body: str | None):
+    """SQL expression for email_events.search_vector.
+
+    Subject ranks above sender above body. Sender addresses are only indexed
+    unstemmed. Maintained by the app rather than as a generated column because
+    the bodies are stored compressed (email_event_bodies).
+    """
+    return (
+        _weighted(literal(subject or "", Text), "A")
+        .op("||")(_weighted(literal(sender or "", Text), "B", ("simple",)))
+        .op("||")(_weighted(literal((body or "")[:MAX_INDEXED_CHARS], Text), "C"))
+    )
+
+
+def search_query(q: str):
+    """tsquery matching either the German stems or the exact words of q."""
+    return func.websearch_to_tsquery(_config("german"), q).op("||")(func.websearch_to_tsquery(_config("simple"), q))
+
+
+def _candidates(
+    q: str,
+    mailbox_id: str | None = None,
+    received_after: datetime | None = None,
+    received_before: datetime | None = None,
+):
+    """Subquery of the newest SEARCH_MAX_CANDIDATES matches (id, received_at)."""
+    candidates = select(EmailEvent.id, EmailEvent.received_at).where(EmailEvent.search_vector.op("@@")(search_query(q)))
+    if mailbox_id:
+        candidates = candidates.where(EmailEvent.mailbox_id == mailbox_id)
+    # Bounds on received_at also prune partitions
+    if received_after:
+        candidates = candidates.where(EmailEvent.received_at >= received_after)
+    if received_before:
+        candidates = candidates.where(EmailEvent.received_at < received_before)
+    return candidates.order_by(EmailEvent.received_at.desc()).limit(settings.SEARCH_MAX_CANDIDATES).subquery()
+
+
+def candidate_count(
+    q: str,
+    mailbox_id: str | None = None,
+    received_after: datetime | None = None,
+    received_before: datetime | None = None,
+):
+    """Number of matches search_hits ranks; SEARCH_MAX_CANDIDATES means older ones were cut."""
+    return select(func.count()).select_from(_candidates(q, mailbox_id, received_after, received_before))
+
+
+def search_hits(
+    q: str,
+    offset: int = 0,
+    limit: int = 20,
+    mailbox_id: str | None = None,
+    received_after: datetime | None = None,
+    received_before: datetime | None = None,
+):
+    """(id, received_at, rank, candidates) of one page of matches, best first.
+
+    Ranks the newest SEARCH_MAX_CANDIDATES matches only: for rare terms Postgres
+    collects them from the GIN index, for common ones it walks received_at
+    backwards and stops early, so the cost stays bounded either way. Older
+    matches are never returned; candidates (the number ranked, as
+    candidate_count) reaching the cap tells the caller so.
+    """
+    query = search_query(q)
+    candidates = _candidates(q, mailbox_id, received_after, received_before)
+    # Ranked after the cut, so ts_rank_cd runs on the candidates only
+    rank = func.ts_rank_cd(EmailEvent.search_vector, query).label("rank")
+    return (
+        select(EmailEvent.id, EmailEvent.received_at, rank, func.count().over().label("candidates"))
+        .join(candidates, (EmailEvent.id == candidates.c.id) & (EmailEvent.received_at == candidates.c.received_at))
+        .order_by(rank.desc(), EmailEvent.received_at.desc(), EmailEvent.id)
+        .offset(offset)
+        .limit(limit)
+    )
+
+
+def search_events(
+    db: Session,
+    q: str,
+    offset: int = 0,
+    limit: int = 20,
+    mailbox_id: str | None = None,
+    received_after: datetime | None = None,
+    received_before: datetime | None = None,
+) -> tuple[list[dict], bool]:
+    """Ranked full-text search over subject, sender and body, with highlights.
+
+    Returns limit + 1 results at most, so the caller can tell whether a next
+    page exists, and whether the matches were cut to the newest
+    SEARCH_MAX_CANDIDATES (see search_hits) before ranking.
+    """
+    hits = db.execute(search_hits(q, offset, limit + 1, mailbox_id, received_after, received_before)).all()
+    # Every hit carries the candidate count; a page past the last hit has to count them
+    if hits:
+        candidates = hits[0].candidates
+    else:
+        candidates = db.scalar(candidate_count(q, mailbox_id, received_after, received_before))
+    truncated = candidates >= settings.SEARCH_MAX_CANDIDATES
+    if not hits:
+        return [], truncated
+
+    events = {
+        event.id: event
+        for event in db.query(EmailEvent)
+        .options(selectinload(EmailEvent.body))
+        .filter(tuple_(EmailEvent.id, EmailEvent.received_at).in_([(hit.id, hit.received_at) for hit in hits]))
+    }
+    ordered = [(events[hit.id], hit.rank) for hit in hits if hit.id in events]
+    highlights = _headlines(
+        db, q,
+        [html.escape(event.subject or "") for event, _ in ordered],
+        [html.escape((event.body_text or "")[:MAX_HEADLINE_CHARS]) for event, _ in ordered],
+    )
+    return [
+        {
+            "id": str(event.id),
+            "mailbox_id": str(event.mailbox_id),
+            "sender": event.sender,
+            "subject": event.subject,
+            "received_at": event.received_at.isoformat(),
+            "rank": round(rank, 4),
+            "subject_highlight": subject_highlight,
+            "highlight": body_highlight,
+        }
+        for (event, rank), (subject_highlight, body_highlight) in zip(ordered, highlights)
+    ], truncated
+
+
+def _headlines(db: Session, q: str, subjects: list[str], bodies: list[str]) -> list[tuple[str, str]]:
+    """ts_headline for a page of (HTML-escaped) subjects and bodies in one round trip.
+
+    The texts are escaped first, so the only markup in the result is <mark>.
+    """
+    rows = db.execute(
+        text(
+            "SELECT ts_headline('german', d.subject, q.query, 'HighlightAll=true'),"
+            " ts_headline('german', d.body, q.query, :options)"
+            " FROM unnest(CAST(:subjects AS text[]), CAST(:bodies AS text[])) WITH ORDINALITY AS d(subject, body, n),"
+            " (SELECT websearch_to_tsquery('german', :q) || websearch_to_tsquery('simple', :q) AS query) q"
+            " ORDER BY d.n"
+        ).bindparams(
+            bindparam("subjects", type_=ARRAY(Text)),
+            bindparam("bodies", type_=ARRAY(Text)),
+        ),
+        {"subjects": subjects, "bodies": bodies, "q": q, "options": HEADLINE_OPTIONS},
+    ).all()
+    return [(row[0], row[1]) for row in rows]
+
+
+def backfill_search_vectors(db: Session, batch_size: int = 500, pause_seconds: float = 0.1) -> int:
+    """Fill search_vector for events stored before it existed, in batches by id.
+
+    The bodies are decompressed in Python, so the vectors cannot be computed by a
+    single UPDATE. Returns the number of events indexed; safe to rerun. Run via
+    scripts/backfill_search.py after migration 016.
+    """
+    total = 0
+    after = None
+    started = time.monotonic()
+    while True:
+        query = (
+            db.query(EmailEvent)
+            .options(selectinload(EmailEvent.body))
+            .filter(EmailEvent.search_vector.is_(None))
+            .order_by(EmailEvent.id)
+        )
+        if after is not None:
+            query = query.filter(EmailEvent.id > after)
+        events = query.limit(batch_size).all()
+        if not events:
+            break
+        for event in events:
+            event.search_vector = search_vector(event.subject, event.sender, event.body_text)
+        db.commit()
+        total += len(events)
+        after = events[-1].id
+        db.expunge_all()
+        time.sleep(pause_seconds)
+    logger.info(f"Indexed {total} events for search in {time.monotonic() - started:.0f}s")
+    return total
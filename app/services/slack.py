@@ -1,15 +1,247 @@
 import hashlib
 import hmac
+import logging
 import time
+from typing import AsyncIterator
 
 import httpx
 
 from app.core.config import settings
 from app.db.models import EmailDraft, EmailEvent
+from app.services.breaker import slack_breaker
 
+logger = logging.getLogger(__name__)
 
-async def post_draft_for_approval(draft: EmailDraft, event: EmailEvent) -> dict:
-    """Post a draft via DM to the approver with Approve/Reject/Request Changes buttons."""
+SLACK_API_URL = "https://slack.com/api/"
+
+# App-lifetime client (keep-alive pool), see start_client/close_client
+_client: httpx.AsyncClient | None = None
+
+# DM channel per approver user id; conversations.open returns the same channel every time
+_dm_channels: dict[str, str] = {}
+
+# ok=false errors meaning a cached DM channel is no longer usable
+_STALE_CHANNEL_ERRORS = {"channel_not_found", "is_archived", "not_in_channel"}
+
+# Drafts listed per digest message (Slack allows 50 blocks per message)
+DIGEST_MAX_DRAFTS = 20
+
+
+class SlackRateLimitedError(Exception):
+    """Slack answered 429; retry_after is the Retry-After header in seconds."""
+
+    def __init__(self, method: str, retry_after: float):
+        super().__init__(f"Slack rate limited {method}, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+async def start_client() -> None:
+    """Open the shared Slack client; called from the app lifespan."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=SLACK_API_URL,
+            timeout=httpx.Timeout(10.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def post_draft_for_approval(draft: EmailDraft, event: EmailEvent, user_id: str | None = None) -> dict:
+    """Post a draft via DM to the approver with Approve/Reject/Request Changes buttons.
+
+    Callers normally queue drafts via slack_outbox.enqueue_approval instead, which
+    paces and deduplicates the messages.
+    """
+    blocks = _build_approval_blocks(draft, event, draft.body_text)
+    return await _post_to_approver({
+        "text": f"Neuer Entwurf fuer: {event.subject}",
+        "blocks": blocks,
+    }, user_id)
+
+
+async def post_approval_digest(entries: list[tuple[EmailDraft, EmailEvent]], user_id: str | None = None) -> dict:
+    """Post one message listing several drafts, each with a button to show it in full."""
+    blocks = [
+        {
+            "type": "header",
+            "text": {"type": "plain_text", "text": f"{len(entries)} neue Entwuerfe zur Freigabe"},
+        },
+    ]
+    for draft, event in entries[:DIGEST_MAX_DRAFTS]:
+        blocks.append({
+            "type": "section",
+            "text": {"type": "mrkdwn", "text": f"*{event.subject or '(ohne Betreff)'}*\nVon: {event.sender}"},
+            "accessory": {
+                "type": "button",
+                "text": {"type": "plain_text", "text": "Anzeigen"},
+                "action_id": "show_draft",
+                "value": str(draft.id),
+            },
+        })
+    return await _post_to_approver({
+        "text": f"{len(entries)} neue Entwuerfe zur Freigabe",
+        "blocks": blocks,
+    }, user_id)
+
+
+async def post_approval_placeholder(draft: EmailDraft, event: EmailEvent) -> tuple[str, str]:
+    """Post the approval message before the draft exists. Returns (channel_id, ts).
+
+    The message has no buttons yet; it is filled in via update_approval_message.
+    """
+    blocks = _build_approval_blocks(draft, event, "", streaming=True)
+
+    data = await _post_to_approver({
+        "text": f"Neuer Entwurf fuer: {event.subject}",
+        "blocks": blocks,
+    })
+    if not data.get("ok"):
+        raise ValueError(f"Could not post approval placeholder: {data}")
+    return data["channel"], data["ts"]
+
+
+async def update_approval_message(
+    channel_id: str,
+    ts: str,
+    draft: EmailDraft,
+    event: EmailEvent,
+    body_text: str,
+    final: bool = False,
+) -> dict:
+    """Replace the body of a posted approval message. Buttons are only shown when final."""
+    blocks = _build_approval_blocks(draft, event, body_text, streaming=not final)
+
+    return await _api_call("chat.update", {
+        "channel": channel_id,
+        "ts": ts,
+        "text": f"Neuer Entwurf fuer: {event.subject}",
+        "blocks": blocks,
+    })
+
+
+async def delete_approval_message(channel_id: str, ts: str) -> dict:
+    """Remove an approval message whose draft could not be generated."""
+    return await _api_call("chat.delete", {"channel": channel_id, "ts": ts})
+
+
+async def open_modal(trigger_id: str, view: dict) -> dict:
+    """Open a modal in response to an interaction (trigger ids expire after 3 seconds)."""
+    return await _api_call("views.open", {"trigger_id": trigger_id, "view": view})
+
+
+async def report_interaction_result(payload: dict, text: str, final: bool = False) -> None:
+    """Report the outcome of an interaction that was handled in the background.
+
+    Goes to the interaction's response_url (no token needed, valid for 30 minutes).
+    With final=True the approval message is replaced by its content plus the result,
+    without buttons; otherwise the result is posted as a new message so the buttons
+    stay usable. Modal submissions have no response_url and get a DM instead.
+    """
+    response_url = payload.get("response_url")
+    if not response_url:
+        await _post_to_approver({"text": text}, payload.get("user", {}).get("id"))
+        return
+
+    message = {"text": text, "replace_original": final}
+    if final:
+        blocks = [b for b in payload.get("message", {}).get("blocks", []) if b.get("type") != "actions"]
+        message["blocks"] = blocks + [{"type": "context", "elements": [{"type": "mrkdwn", "text": text}]}]
+    if _client is None:
+        await start_client()
+    with slack_breaker:
+        resp = await _client.post(response_url, json=message)
+        resp.raise_for_status()
+
+
+async def stream_into_approval_message(
+    channel_id: str,
+    ts: str,
+    draft: EmailDraft,
+    event: EmailEvent,
+    chunks: AsyncIterator[str],
+) -> str:
+    """Consume streamed reply chunks, updating the message at a throttled rate.
+
+    Returns the accumulated text. The caller sends the final update (with buttons)
+    once the draft has been stored. A failed intermediate update (rate limit, open
+    Slack circuit, ...) is only logged, so it never costs the generated text.
+    """
+    text = ""
+    last_update = time.monotonic()
+    async for chunk in chunks:
+        text += chunk
+        if time.monotonic() - last_update >= settings.SLACK_STREAM_UPDATE_SECONDS:
+            try:
+                result = await update_approval_message(channel_id, ts, draft, event, text)
+                if not result.get("ok"):
+                    logger.warning(f"Streaming update for draft {draft.id} failed: {result}")
+            except Exception as e:
+                logger.warning(f"Streaming update for draft {draft.id} failed: {e}")
+            last_update = time.monotonic()
+    return text
+
+
+async def _api_call(method: str, payload: dict) -> dict:
+    """Call a Slack Web API method on the shared client, through the circuit breaker.
+
+    Transport errors and HTTP 5xx count as Slack failures; 429 raises SlackRateLimitedError.
+    An ok=false response is an application error and is returned to the caller as usual.
+    """
+    if _client is None:
+        # Outside the app lifespan (e.g. scripts)
+        await start_client()
+    with slack_breaker:
+        resp = await _client.post(
+            method,
+            headers={"Authorization": f"Bearer {settings.SLACK_BOT_TOKEN}"},
+            json=payload,
+        )
+        if resp.status_code != 429:
+            resp.raise_for_status()
+    if resp.status_code == 429:
+        # Rate limiting is not an outage, so it is raised outside the breaker
+        raise SlackRateLimitedError(method, float(resp.headers.get("Retry-After", "1")))
+    return resp.json()
+
+
+async def _post_to_approver(message: dict, user_id: str | None = None) -> dict:
+    """chat.postMessage into the approver's DM; one request once the channel is cached."""
+    user_id = user_id or settings.SLACK_APPROVER_USER_ID
+    data = await _api_call("chat.postMessage", {"channel": await _open_dm_channel(user_id), **message})
+    if not data.get("ok") and data.get("error") in _STALE_CHANNEL_ERRORS:
+        _dm_channels.pop(user_id, None)
+        data = await _api_call("chat.postMessage", {"channel": await _open_dm_channel(user_id), **message})
+    return data
+
+
+async def _open_dm_channel(user_id: str) -> str:
+    """Open (or look up) the DM channel with a user."""
+    if user_id in _dm_channels:
+        return _dm_channels[user_id]
+
+    dm_data = await _api_call("conversations.open", {"users": user_id})
+    dm_channel_id = dm_data.get("channel", {}).get("id")
+
+    if not dm_channel_id:
+        raise ValueError(f"Could not open DM with approver: {dm_data}")
+    _dm_channels[user_id] = dm_channel_id
+    return dm_channel_id
+
+
+def _build_approval_blocks(
+    draft: EmailDraft,
+    event: EmailEvent,
+    body_text: str,
+    streaming: bool = False,
+) -> list[dict]:
+    """Build the approval message blocks. While streaming, the action buttons are omitted."""
 
     # Build To/CC/BCC display
     recipients_fields = [
@@ -52,9 +284,19 @@ async def post_draft_for_approval(draft: EmailDraft, event: EmailEvent) -> dict:
             "type": "section",
             "text": {
                 "type": "mrkdwn",
-                "text": f"*Entwurf (v{draft.version}):*\n```{draft.body_text}```",
+                "text": f"*Entwurf (v{draft.version}):*\n```{body_text or ' '}```",
             },
         },
+    ]
+
+    if streaming:
+        blocks.append({
+            "type": "context",
+            "elements": [{"type": "mrkdwn", "text": "_Entwurf wird generiert..._"}],
+        })
+        return blocks
+
+    blocks.append(
         {
             "type": "actions",
             "block_id": f"approval_{draft.id}",
@@ -64,49 +306,25 @@ async def post_draft_for_approval(draft: EmailDraft, event: EmailEvent) -> dict:
                     "text": {"type": "plain_text", "text": "Approve"},
                     "style": "primary",
                     "action_id": "approve_draft",
-                    "value": str(draft.id),
+                    "value": f"{draft.id}:{draft.version}",
                 },
                 {
                     "type": "button",
                     "text": {"type": "plain_text", "text": "Reject"},
                     "style": "danger",
                     "action_id": "reject_draft",
-                    "value": str(draft.id),
+                    "value": f"{draft.id}:{draft.version}",
                 },
                 {
                     "type": "button",
                     "text": {"type": "plain_text", "text": "Request Changes"},
                     "action_id": "request_changes_draft",
-                    "value": str(draft.id),
+                    "value": f"{draft.id}:{draft.version}",
                 },
             ],
-        },
-    ]
-
-    async with httpx.AsyncClient() as client:
-        # Open DM channel with approver
-        dm_resp = await client.post(
-            "https://slack.com/api/conversations.open",
-            headers={"Authorization": f"Bearer {settings.SLACK_BOT_TOKEN}"},
-            json={"users": settings.SLACK_APPROVER_USER_ID},
-        )
-        dm_data = dm_resp.json()
-        dm_channel_id = dm_data.get("channel", {}).get("id")
-
-        if not dm_channel_id:
-            raise ValueError(f"Could not open DM with approver: {dm_data}")
-
-        # Send message to DM
-        resp = await client.post(
-            "https://slack.com/api/chat.postMessage",
-            headers={"Authorization": f"Bearer {settings.SLACK_BOT_TOKEN}"},
-            json={
-                "channel": dm_channel_id,
-                "text": f"Neuer Entwurf fuer: {event.subject}",
-                "blocks": blocks,
-            },
-        )
-        return resp.json()
+        }
+    )
+    return blocks
 
 
 def verify_slack_signature(body: bytes, timestamp: str, signature: str) -> bool:
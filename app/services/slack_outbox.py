@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.db.models import EmailDraft, SlackOutbox
+from app.services.breaker import CircuitOpenError
+from app.services.slack import (
+    DIGEST_MAX_DRAFTS,
+    SlackRateLimitedError,
+    post_approval_digest,
+    post_draft_for_approval,
+    update_approval_message,
+)
+
+logger = logging.getLogger(__name__)
+
+# Rows claimed per flush; a flush that dies is retried once the lease expires
+CLAIM_LIMIT = 100
+LEASE_SECONDS = 300
+MAX_BACKOFF_SECONDS = 600
+
+# Earliest monotonic time the next message may go to a recipient (per replica)
+_next_send: dict[str, float] = {}
+
+
+def enqueue_approval(db: Session, draft: EmailDraft, single: bool = False) -> bool:
+    """Queue the current version of a draft for the approver.
+
+    Returns False if this version was already queued or posted, so calling it
+    repeatedly (e.g. from /api/notify) never produces duplicate DMs.
+    """
+    result = db.execute(
+        insert(SlackOutbox)
+        .values(
+            id=uuid.uuid4(),
+            draft_id=draft.id,
+            version=draft.version,
+            recipient=settings.SLACK_APPROVER_USER_ID,
+            status="pending",
+            single=single,
+            attempts=0,
+            next_attempt_at=datetime.utcnow(),
+            created_at=datetime.utcnow(),
+        )
+        .on_conflict_do_nothing(index_elements=["draft_id", "version"])
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def record_posted(db: Session, draft: EmailDraft, channel_id: str, ts: str) -> None:
+    """Record a draft version whose message was posted outside the queue (streamed drafts).
+
+    Called in the transaction that stores the draft, before the final update
+    fills in the message; does not commit. The entry is leased like one being
+    sent, so if the final update is never confirmed (see mark_posted), the outbox
+    completes the existing message instead of anyone posting a second one.
+    """
+    # The draft is usually still pending in the session
+    db.flush()
+    now = datetime.utcnow()
+    db.execute(
+        insert(SlackOutbox)
+        .values(
+            id=uuid.uuid4(),
+            draft_id=draft.id,
+            version=draft.version,
+            recipient=settings.SLACK_APPROVER_USER_ID,
+            status="sending",
+            single=True,
+            attempts=0,
+            next_attempt_at=now + timedelta(seconds=LEASE_SECONDS),
+            channel_id=channel_id,
+            message_ts=ts,
+            created_at=now,
+        )
+        .on_conflict_do_nothing(index_elements=["draft_id", "version"])
+    )
+
+
+def mark_posted(db: Session, draft: EmailDraft, error: Exception | None = None) -> None:
+    """Outcome of the final update of a message recorded with record_posted.
+
+    On error the entry goes back to the queue, which retries the update.
+    """
+    row = db.query(SlackOutbox).filter_by(draft_id=draft.id, version=draft.version).first()
+    if row is None:
+        return
+    if error is not None:
+        _record_failure(row, error)
+    else:
+        row.status = "sent"
+        row.attempts += 1
+        row.sent_at = datetime.utcnow()
+        row.last_error = None
+    db.commit()
+
+
+def request_single_post(db: Session, draft: EmailDraft) -> None:
+    """Post a draft listed in a digest as its own approval message."""
+    row = db.query(SlackOutbox).filter_by(draft_id=draft.id, version=draft.version).first()
+    if row is None:
+        enqueue_approval(db, draft, single=True)
+        return
+    if row.status == "sending":
+        return
+    row.status = "pending"
+    row.single = True
+    row.attempts = 0
+    row.next_attempt_at = datetime.utcnow()
+    db.commit()
+
+
+def outbox_stats(db: Session) -> dict[str, int]:
+    """Number of queue entries per status."""
+    rows = db.query(SlackOutbox.status, func.count(SlackOutbox.id)).group_by(SlackOutbox.status).all()
+    return {status: count for status, count in rows}
+
+
+async def flush_outbox(db: Session) -> int:
+    """Send due queue entries. Returns the number of Slack messages posted.
+
+    Entries are leased with FOR UPDATE SKIP LOCKED so replicas never post the same
+    row. Per recipient, at least SLACK_DIGEST_THRESHOLD waiting drafts are posted as
+    one digest; fewer are posted one by one, paced to SLACK_MESSAGES_PER_SECOND.
+    A 429 postpones the recipient's remaining entries by its Retry-After.
+    """
+    now = datetime.utcnow()
+    rows = (
+        db.query(SlackOutbox)
+        .filter(
+            SlackOutbox.status.in_(("pending", "sending")),
+            SlackOutbox.next_attempt_at <= now,
+        )
+        .order_by(SlackOutbox.created_at)
+        .limit(CLAIM_LIMIT)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not rows:
+        db.commit()
+        return 0
+    for row in rows:
+        row.status = "sending"
+        row.next_attempt_at = now + timedelta(seconds=LEASE_SECONDS)
+    db.commit()
+
+    by_recipient: dict[str, list[SlackOutbox]] = {}
+    for row in rows:
+        draft = row.draft
+        if draft.status != "pending_approval" or draft.version != row.version:
+            # Decided or revised in the meantime; the new version has its own entry
+            row.status = "skipped"
+            continue
+        by_recipient.setdefault(row.recipient, []).append(row)
+    db.commit()
+
+    posted = 0
+    for recipient, entries in by_recipient.items():
+        posted += await _flush_recipient(db, recipient, entries)
+    return posted
+
+
+async def _flush_recipient(db: Session, recipient: str, entries: list[SlackOutbox]) -> int:
+    batched = [row for row in entries if not row.single]
+    if len(batched) >= settings.SLACK_DIGEST_THRESHOLD:
+        messages = [
+            ("digested", batched[i:i + DIGEST_MAX_DRAFTS]) for i in range(0, len(batched), DIGEST_MAX_DRAFTS)
+        ]
+        messages += [("sent", [row]) for row in entries if row.single]
+    else:
+        messages = [("sent", [row]) for row in entries]
+
+    posted = 0
+    for i, (status, group) in enumerate(messages):
+        await _pace(recipient)
+        try:
+            if status == "sent" and group[0].message_ts:
+                # Streamed message whose final update did not go through: complete it in place
+                row = group[0]
+                data = await update_approval_message(
+                    row.channel_id, row.message_ts, row.draft, row.draft.email_event, row.draft.body_text, final=True
+                )
+            elif status == "sent":
+                draft = group[0].draft
+                data = await post_draft_for_approval(draft, draft.email_event, recipient)
+            else:
+                data = await post_approval_digest([(row.draft, row.draft.email_event) for row in group], recipient)
+            if not data.get("ok"):
+                raise ValueError(f"Slack error: {data.get('error')}")
+        except (SlackRateLimitedError, CircuitOpenError) as e:
+            # Not the entry's fault: postpone everything left for this recipient
+            _next_send[recipient] = time.monotonic() + e.retry_after
+            retry_at = datetime.utcnow() + timedelta(seconds=e.retry_after)
+            for _, waiting in messages[i:]:
+                for row in waiting:
+                    row.status = "pending"
+                    row.next_attempt_at = retry_at
+            db.commit()
+            logger.warning(f"Slack outbox for {recipient} postponed by {e.retry_after:.0f}s: {e}")
+            return posted
+        except Exception as e:
+            for row in group:
+                _record_failure(row, e)
+            db.commit()
+            continue
+
+        for row in group:
+            row.status = status
+            row.attempts += 1
+            row.channel_id = data.get("channel")
+            row.message_ts = data.get("ts")
+            row.sent_at = datetime.utcnow()
+            row.last_error = None
+        db.commit()
+        posted += 1
+    return posted
+
+
+async def _pace(recipient: str) -> None:
+    """Wait until the recipient's channel may receive the next message."""
+    wait = _next_send.get(recipient, 0.0) - time.monotonic()
+    if wait > 0:
+        await asyncio.sleep(wait)
+    _next_send[recipient] = time.monotonic() + 1.0 / settings.SLACK_MESSAGES_PER_SECOND
+
+
+def _record_failure(row: SlackOutbox, error: Exception) -> None:
+    row.attempts += 1
+    row.last_error = str(error)[:1000]
+    if row.attempts >= settings.SLACK_OUTBOX_MAX_ATTEMPTS:
+        row.status = "failed"
+        logger.error(f"Giving up on Slack message for draft {row.draft_id} v{row.version}: {error}")
+    else:
+        row.status = "pending"
+        row.next_attempt_at = datetime.utcnow() + timedelta(
+            seconds=min(2 ** row.attempts, MAX_BACKOFF_SECONDS)
+        )
+        logger.warning(f"Slack message for draft {row.draft_id} v{row.version} failed, will retry: {error}")
+
+
+async def outbox_loop():
+    """Background loop: deliver queued Slack approval messages."""
+    logger.info("Slack outbox started")
+    while True:
+        try:
+            db = SessionLocal()
+            try:
+                await flush_outbox(db)
+            finally:
+                db.close()
+        except Exception as e:
+            logger.error(f"Slack outbox error: {e}")
+        await asyncio.sleep(settings.SLACK_OUTBOX_POLL_SECONDS)
@@ -0,0 +1,115 @@
+from datetime import datetime
+
+from sqlalchemy import Date, cast, func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import EmailDraft, EmailEvent, LLMUsage
+
+# USD per 1M tokens (input, output); LLM_PRICES overrides or extends this table
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+
+# The batch API bills half the interactive price
+BATCH_DISCOUNT = 0.5
+
+GROUP_COLUMNS = {
+    "mailbox": LLMUsage.mailbox_id,
+    "model": LLMUsage.model,
+    "tone": LLMUsage.tone,
+    "purpose": LLMUsage.purpose,
+    "day": cast(LLMUsage.created_at, Date),
+}
+
+
+def usage_from_response(response, model: str, latency: float) -> dict:
+    """Usage info of one completion (response.usage may be missing on some providers)."""
+    usage = getattr(response, "usage", None)
+    return {
+        "model": getattr(response, "model", None) or model,
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "latency_ms": int(latency * 1000),
+    }
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, batch: bool = False) -> float | None:
+    """Estimated cost in USD, None for models without a known price."""
+    prices = {**MODEL_PRICES, **{k: tuple(v) for k, v in settings.LLM_PRICES.items()}}
+    # Dated snapshots ("gpt-4o-mini-2024-07-18") are priced like their base model
+    name = max((m for m in prices if model == m or model.startswith(f"{m}-")), key=len, default=None)
+    if name is None:
+        return None
+    input_price, output_price = prices[name]
+    cost = (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+    return round(cost * (BATCH_DISCOUNT if batch else 1.0), 6)
+
+
+def record_usage(
+    db: Session,
+    draft: EmailDraft,
+    event: EmailEvent,
+    usage: dict | None,
+    purpose: str,
+) -> LLMUsage | None:
+    """Store the usage of one generation for a draft (no-op for placeholder replies)."""
+    if not usage:
+        return None
+    record = LLMUsage(
+        draft=draft,
+        mailbox_id=event.mailbox_id,
+        purpose=purpose,
+        model=usage["model"],
+        tone=draft.tone,
+        prompt_tokens=usage["prompt_tokens"],
+        completion_tokens=usage["completion_tokens"],
+        latency_ms=usage.get("latency_ms"),
+        cost_usd=estimate_cost(
+            usage["model"], usage["prompt_tokens"], usage["completion_tokens"], batch=purpose == "batch"
+        ),
+    )
+    db.add(record)
+    return record
+
+
+def usage_report(
+    db: Session,
+    group_by: list[str],
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> list[dict]:
+    """Aggregate tokens, cost and latency by any of GROUP_COLUMNS."""
+    keys = [GROUP_COLUMNS[g].label(g) for g in group_by]
+    query = db.query(
+        *keys,
+        func.count(LLMUsage.id),
+        func.sum(LLMUsage.prompt_tokens),
+        func.sum(LLMUsage.completion_tokens),
+        func.sum(LLMUsage.cost_usd),
+        func.avg(LLMUsage.latency_ms),
+    )
+    if since:
+        query = query.filter(LLMUsage.created_at >= since)
+    if until:
+        query = query.filter(LLMUsage.created_at < until)
+    if keys:
+        query = query.group_by(*keys).order_by(*keys)
+
+    result = []
+    for row in query.all():
+        values = dict(zip(group_by, row[: len(group_by)]))
+        generations, prompt_tokens, completion_tokens, cost, latency = row[len(group_by):]
+        result.append({
+            **{k: str(v) if v is not None else None for k, v in values.items()},
+            "generations": generations,
+            "prompt_tokens": int(prompt_tokens or 0),
+            "completion_tokens": int(completion_tokens or 0),
+            "cost_usd": round(float(cost), 4) if cost is not None else None,
+            "latency_ms_avg": round(float(latency), 1) if latency is not None else None,
+        })
+    return result
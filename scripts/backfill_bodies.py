@@ -0,0 +1,117 @@
+"""Move mail and draft bodies into the compressed side tables, with measurements.
+
+Prints the on-disk size of email_events / email_drafts and their body tables and
+the latency of the listing queries, moves all legacy bodies over in small batches
+while the app keeps running (see body_storage.backfill_bodies), vacuums, and
+measures again. Uses the database from the app settings (DB_* variables); run
+after `alembic upgrade head`.
+
+    python scripts/backfill_bodies.py --batch-size 500 --pause 0.2
+
+Plain VACUUM makes the freed space reusable but rarely returns it to the OS;
+--vacuum-full does, at the price of an exclusive lock on each table while it runs.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.db.base import SessionLocal, engine  # noqa: E402
+from app.db.models import EmailDraft, EmailEvent  # noqa: E402
+from app.services.body_storage import (  # noqa: E402
+    backfill_bodies,
+    legacy_body_counts,
+    storage_report,
+)
+
+# Listing-style reads whose cost grows with the width of the table rows
+LISTING_QUERIES = {
+    # GET /api/events / GET /api/drafts first page, as the ORM loaded it before 014
+    "events page (all columns)": "SELECT * FROM email_events ORDER BY received_at DESC, id DESC LIMIT 50",
+    "drafts page (all columns)": "SELECT * FROM email_drafts ORDER BY created_at DESC, id DESC LIMIT 50",
+    # Anything that has to walk the heap (counts, reports, seq scans)
+    "count unprocessed events": "SELECT count(*) FROM email_events WHERE NOT is_processed",
+    "count drafts per status": "SELECT status, count(*) FROM email_drafts GROUP BY status",
+}
+
+
+def measure_listings(runs: int) -> dict[str, float]:
+    timings = {}
+    with engine.connect() as conn:
+        for name, sql in LISTING_QUERIES.items():
+            samples = []
+            for _ in range(runs):
+                started = time.monotonic()
+                conn.execute(text(sql)).all()
+                samples.append(time.monotonic() - started)
+            timings[name] = statistics.median(samples) * 1000
+        # The ORM entity loads the agent and the Slack paths do (bodies deferred)
+        db = SessionLocal()
+        try:
+            for name, model, order in (
+                ("events page (ORM)", EmailEvent, EmailEvent.received_at.desc()),
+                ("drafts page (ORM)", EmailDraft, EmailDraft.created_at.desc()),
+            ):
+                samples = []
+                for _ in range(runs):
+                    started = time.monotonic()
+                    db.query(model).order_by(order).limit(50).all()
+                    samples.append(time.monotonic() - started)
+                    db.expunge_all()
+                timings[name] = statistics.median(samples) * 1000
+        finally:
+            db.close()
+    return timings
+
+
+def vacuum(full: bool) -> None:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in ("email_events", "email_drafts", "email_event_bodies", "email_draft_bodies"):
+            conn.execute(text(f"VACUUM {'FULL ' if full else ''}ANALYZE {table}"))
+
+
+def print_report(title: str, sizes: dict, timings: dict) -> None:
+    print(f"\n{title}")
+    for table, size in sizes.items():
+        parts = "  ".join(f"{key}={value / 1024 / 1024:.1f}MB" for key, value in size.items())
+        print(f"  {table:20} {parts}")
+    for name, ms in timings.items():
+        print(f"  {name:28} {ms:8.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=None, help="default BODY_BACKFILL_BATCH_SIZE")
+    parser.add_argument("--pause", type=float, default=None, help="default BODY_BACKFILL_PAUSE_SECONDS")
+    parser.add_argument("--runs", type=int, default=20, help="repetitions per latency measurement")
+    parser.add_argument("--vacuum-full", action="store_true", help="VACUUM FULL afterwards (locks the tables)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"Rows with legacy bodies: {legacy_body_counts(db)}")
+        before_sizes = storage_report(db)
+        db.commit()
+        print_report("Before", before_sizes, measure_listings(args.runs))
+
+        started = time.monotonic()
+        moved = backfill_bodies(db, args.batch_size, args.pause)
+        print(f"\nMoved {moved} in {time.monotonic() - started:.0f}s")
+
+        vacuum(args.vacuum_full)
+        after_sizes = storage_report(db)
+        db.commit()
+        print_report("After", after_sizes, measure_listings(args.runs))
+        print(f"\nRows with legacy bodies: {legacy_body_counts(db)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
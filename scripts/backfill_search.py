@@ -0,0 +1,42 @@
+"""Index the events stored before email_events.search_vector existed.
+
+Run once after `alembic upgrade head` (migration 016); until then those events
+are missing from GET /api/events/search. Works through them in small batches
+while the app keeps running (see search.backfill_search_vectors) and is safe to
+rerun. Uses the database from the app settings (DB_* variables).
+
+    python scripts/backfill_search.py --batch-size 500 --pause 0.1
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.db.base import SessionLocal  # noqa: E402
+from app.db.models import EmailEvent  # noqa: E402
+from app.services.search import backfill_search_vectors  # noqa: E402
+
+
+def unindexed(db) -> int:
+    return db.query(EmailEvent.id).filter(EmailEvent.search_vector.is_(None)).count()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.1, help="seconds between batches")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"Events without search_vector: {unindexed(db)}")
+        print(f"Indexed {backfill_search_vectors(db, args.batch_size, args.pause)} events")
+        print(f"Events without search_vector: {unindexed(db)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Throughput of async def routes on the sync vs. the async SQLAlchemy session.
+
+Mounts two copies of the same endpoint in a throwaway FastAPI app, one querying
+through get_db (psycopg2, blocking the event loop) and one through get_async_db
+(asyncpg), and drives each with concurrent requests over an in-process ASGI
+transport. Uses the database from the app settings (DB_* variables).
+
+    python scripts/bench_async_db.py --requests 2000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.db.base import get_async_db, get_db  # noqa: E402
+from app.db.models import EmailDraft  # noqa: E402
+
+# Simulated server-side work per request, so the difference is the blocking, not the query
+QUERY_DELAY = "SELECT pg_sleep(:delay)"
+
+
+def build_app(delay: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/sync")
+    async def sync_session_route(db: Session = Depends(get_db)):
+        db.execute(text(QUERY_DELAY), {"delay": delay})
+        drafts = db.execute(select(EmailDraft.id).filter_by(status="pending_approval").limit(20)).all()
+        return {"drafts": len(drafts)}
+
+    @app.get("/async")
+    async def async_session_route(db: AsyncSession = Depends(get_async_db)):
+        await db.execute(text(QUERY_DELAY), {"delay": delay})
+        drafts = (await db.execute(select(EmailDraft.id).filter_by(status="pending_approval").limit(20))).all()
+        return {"drafts": len(drafts)}
+
+    return app
+
+
+async def run(app: FastAPI, path: str, requests: int, concurrency: int) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                started = time.monotonic()
+                resp = await client.get(path)
+                resp.raise_for_status()
+                latencies.append(time.monotonic() - started)
+
+        # Warm up the connection pools
+        await asyncio.gather(*(one() for _ in range(concurrency)))
+        latencies.clear()
+
+        started = time.monotonic()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        "requests_per_second": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.005, help="seconds of pg_sleep per request")
+    args = parser.parse_args()
+
+    app = build_app(args.delay)
+    for name, path in (("sync session", "/sync"), ("async session", "/async")):
+        result = asyncio.run(run(app, path, args.requests, args.concurrency))
+        print(f"{name:14} {result}")
+
+
+if __name__ == "__main__":
+    main()
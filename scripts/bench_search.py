@@ -0,0 +1,78 @@
+"""Latency of the full-text search (GET /api/events/search) against its 100 ms budget.
+
+Runs a set of searches (common and rare words, phrases, a mailbox filter, a deep
+page) through the same code as the endpoint, highlights included, and prints
+p50/p95 per search. Exits non-zero if any p95 exceeds the budget. Uses the
+database from the app settings (DB_* variables).
+
+    python scripts/bench_search.py --runs 50 Rechnung "Termin verschieben"
+
+Events stored before search_vector existed are only found once
+scripts/backfill_search.py has indexed them.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.db.base import SessionLocal  # noqa: E402
+from app.db.models import EmailEvent  # noqa: E402
+from app.services.search import search_events  # noqa: E402
+
+DEFAULT_TERMS = ["Rechnung", "Angebot", "Kuendigung", '"zum Monatsende"', "Lieferung -Reklamation"]
+
+
+def measure(db, runs: int, q: str, **kwargs) -> tuple[float, float, int]:
+    samples = []
+    found = 0
+    for _ in range(runs):
+        started = time.monotonic()
+        found = len(search_events(db, q, **kwargs)[0])
+        samples.append(time.monotonic() - started)
+        db.expunge_all()
+    samples.sort()
+    return statistics.median(samples) * 1000, samples[int(len(samples) * 0.95)] * 1000, found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("terms", nargs="*", default=DEFAULT_TERMS)
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        total = db.query(EmailEvent.id).count()
+        some_mailbox = db.query(EmailEvent.mailbox_id).limit(1).scalar()
+        print(f"{total} events\n")
+
+        first = args.terms[0]
+        cases = [(term, term, {}) for term in args.terms]
+        if some_mailbox:
+            cases.append((f"{first} (one mailbox)", first, {"mailbox_id": str(some_mailbox)}))
+        cases.append((f"{first} (page 10)", first, {"offset": 180}))
+
+        over_budget = []
+        for name, q, kwargs in cases:
+            p50, p95, found = measure(db, args.runs, q, **kwargs)
+            flag = "" if p95 <= args.budget_ms else "  OVER BUDGET"
+            print(f"{name:36} p50={p50:7.1f} ms  p95={p95:7.1f} ms  results={found}{flag}")
+            if flag:
+                over_budget.append(name)
+    finally:
+        db.close()
+
+    if over_budget:
+        print(f"\n{len(over_budget)} searches over {args.budget_ms:.0f} ms: {', '.join(over_budget)}")
+        return 1
+    print(f"\nAll searches within {args.budget_ms:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
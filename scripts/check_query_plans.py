@@ -0,0 +1,234 @@
+"""Query-plan regression check for the hot queries.
+
+Seeds a throwaway Postgres database with a realistic volume of email events and
+drafts, runs EXPLAIN on the queries the agent, API and Slack webhook issue most
+often, and exits non-zero if any of them scans email_events or email_drafts
+sequentially.
+
+    python scripts/check_query_plans.py --database-url postgresql://user:pw@localhost/plancheck
+
+Never point this at a real database: it creates the schema and inserts rows.
+tests/test_query_plans.py runs the same check under pytest against
+TEST_DATABASE_URL.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+from sqlalchemy import create_engine, func, or_, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.api.pagination import encode_cursor, keyset_page  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db.models import EmailDraft, EmailEvent, KBSignature, KBTone  # noqa: E402
+from app.services.agent import claim_candidates  # noqa: E402
+from app.services.fair_queue import PRIORITY_RANKS, priority_rank_expr  # noqa: E402
+from app.services.retention import ensure_partitions  # noqa: E402
+from app.services.search import search_hits  # noqa: E402
+
+# Tables big enough that a sequential scan is a regression; the KB tables hold a
+# handful of rows, where the planner rightly prefers a seq scan over any index
+LARGE_TABLES = {"email_events", "email_drafts"}
+
+# Enough rows that the planner's choices match production
+DEFAULT_EVENTS = 1_000_000
+
+SEED_SQL = [
+    """
+    INSERT INTO users (id, email, name, role, is_active, created_at)
+    VALUES (gen_random_uuid(), 'plan-check@example.com', 'Plan Check', 'agent', true, now())
+    """,
+    """
+    INSERT INTO mailboxes (id, user_id, email_address, provider, is_active, created_at)
+    SELECT gen_random_uuid(), u.id, 'mailbox' || i || '@example.com', 'gmail', true, now()
+    FROM users u, generate_series(1, 20) i
+    WHERE u.email = 'plan-check@example.com'
+    """,
+    # 0.5% unprocessed, like a healthy queue
+    """
+    INSERT INTO email_events (
+        id, mailbox_id, gmail_message_id, thread_id, sender, recipient, subject, body_text,
+        received_at, priority, is_processed, created_at, search_vector
+    )
+    SELECT gen_random_uuid(), m.ids[1 + i % 20], 'msg-' || i, 'thread-' || (i / 3),
+           'sender' || (i % 5000) || '@example.com', 'inbox@example.com', s.subject, s.body,
+           now() - make_interval(secs => i * 30), (ARRAY['normal', 'normal', 'normal', 'high', 'low'])[1 + i % 5],
+           i % 200 <> 0, now(),
+           setweight(to_tsvector('german', s.subject), 'A') || setweight(to_tsvector('simple', s.subject), 'A')
+           || setweight(to_tsvector('german', s.body), 'C') || setweight(to_tsvector('simple', s.body), 'C')
+    FROM generate_series(1, :events) i, (SELECT array_agg(id) AS ids FROM mailboxes) m,
+         -- One subject word in five mails, one body word in a thousand
+         LATERAL (SELECT (ARRAY['Rechnung', 'Angebot', 'Termin', 'Lieferung', 'Reklamation'])[1 + i % 5]
+                         || ' ' || i AS subject,
+                         'Text ' || i || CASE WHEN i % 1000 = 0 THEN ' Kuendigung zum Monatsende' ELSE '' END AS body) s
+    """,
+    # 1% of the drafts still wait for approval
+    """
+    INSERT INTO email_drafts (id, email_event_id, subject, body_text, status, version, created_at)
+    SELECT gen_random_uuid(), e.id, e.subject, 'Antwort',
+           (CASE WHEN random() < 0.01 THEN 'pending_approval' ELSE 'sent' END)::draft_status, 1, e.received_at
+    FROM email_events e
+    WHERE e.is_processed
+    """,
+    """
+    INSERT INTO kb_tones (id, name, prompt_template, is_default, created_at)
+    VALUES (gen_random_uuid(), 'default', 'Freundlich', true, now())
+    """,
+    """
+    INSERT INTO kb_signatures (id, name, content_html, content_text, language, is_default, created_at)
+    VALUES (gen_random_uuid(), 'default', '<p>Gruesse</p>', 'Gruesse', 'de', true, now())
+    """,
+]
+
+
+def hot_queries(db: Session) -> dict:
+    """The queries to check, built like the code that issues them."""
+    unprocessed = (
+        db.query(EmailEvent)
+        .filter_by(is_processed=False, batch_job_id=None)
+        .filter(or_(EmailEvent.lease_expires_at.is_(None), EmailEvent.lease_expires_at < func.now()))
+    )
+    some_event = db.query(EmailEvent.id, EmailEvent.thread_id, EmailEvent.mailbox_id).order_by(EmailEvent.received_at.desc()).first()
+    some_draft = db.query(EmailDraft.id).order_by(EmailDraft.created_at.desc()).first()
+    # A cursor deep into the lists, as after paging through most of them
+    old_event = db.query(EmailEvent.id, EmailEvent.received_at).order_by(EmailEvent.received_at).first()
+    old_draft = db.query(EmailDraft.id, EmailDraft.created_at).order_by(EmailDraft.created_at).first()
+    event_cursor = encode_cursor(old_event.received_at, old_event.id)
+    draft_cursor = encode_cursor(old_draft.created_at, old_draft.id)
+    return {
+        # agent.claim_unprocessed_events
+        "claim candidates": claim_candidates(db, 20, func.now()),
+        "claim candidates (batch mode)": claim_candidates(db, 20, func.now(), batch_mode=True),
+        # batch.submit_batch_job
+        "batch candidates": unprocessed
+        .filter(priority_rank_expr() >= PRIORITY_RANKS["normal"], EmailEvent.batch_attempts < 3)
+        .order_by(EmailEvent.received_at)
+        .limit(500)
+        .with_for_update(skip_locked=True),
+        # agent.claim_unprocessed_events in-flight counts, agent.queue_depths
+        "in-flight per mailbox": db.query(EmailEvent.mailbox_id, func.count(EmailEvent.id))
+        .filter_by(is_processed=False)
+        .filter(EmailEvent.lease_owner.isnot(None))
+        .group_by(EmailEvent.mailbox_id),
+        "queue depths": db.query(EmailEvent.priority, func.count(EmailEvent.id))
+        .filter_by(is_processed=False)
+        .group_by(EmailEvent.priority),
+        # routes: GET /events, GET /drafts (keyset pages), POST /notify, operator draft
+        "list events": keyset_page(db.query(EmailEvent.id), EmailEvent.received_at, EmailEvent.id, None, 50),
+        "list events, deep page": keyset_page(
+            db.query(EmailEvent.id), EmailEvent.received_at, EmailEvent.id, event_cursor, 50
+        ),
+        "list unprocessed events": keyset_page(
+            db.query(EmailEvent.id).filter(EmailEvent.is_processed == False),  # noqa: E712
+            EmailEvent.received_at, EmailEvent.id, None, 50,
+        ),
+        "list drafts": keyset_page(db.query(EmailDraft.id), EmailDraft.created_at, EmailDraft.id, None, 50),
+        "list drafts, deep page": keyset_page(
+            db.query(EmailDraft.id), EmailDraft.created_at, EmailDraft.id, draft_cursor, 50
+        ),
+        "list pending drafts": keyset_page(
+            db.query(EmailDraft.id).filter(EmailDraft.status == "pending_approval"),
+            EmailDraft.created_at, EmailDraft.id, None, 50,
+        ),
+        "notify pending drafts": db.query(EmailDraft).filter_by(status="pending_approval"),
+        # digest.get_thread_context: batch replies not yet folded into the digest
+        "pending digest messages of thread": db.query(EmailEvent)
+        .filter(EmailEvent.thread_id == some_event.thread_id, EmailEvent.digest_pending.is_(True))
+        .order_by(EmailEvent.received_at)
+        .with_for_update(skip_locked=True),
+        "latest event of thread": db.query(EmailEvent)
+        .filter_by(thread_id=some_event.thread_id)
+        .order_by(EmailEvent.received_at.desc())
+        .limit(1),
+        # slack_webhook / scheduler lookups
+        "draft by id": db.query(EmailDraft).filter_by(id=some_draft.id),
+        "drafts of event": db.query(EmailDraft).filter_by(email_event_id=some_event.id),
+        # GET /api/events/search, common and rare terms
+        "search common term": search_hits("Rechnungen"),
+        "search rare term": search_hits("Kuendigung"),
+        "search phrase in mailbox": search_hits('"zum Monatsende"', mailbox_id=str(some_event.mailbox_id)),
+        # Every generation path
+        "default tone": db.query(KBTone).filter_by(is_default=True).limit(1),
+        "default signature": db.query(KBSignature).filter_by(is_default=True).limit(1),
+    }
+
+
+def seq_scans(plan: dict) -> list[str]:
+    found = []
+    # Scans of email_events show up per monthly partition
+    relation = re.sub(r"^email_events_(p\d{4}_\d{2}|default)$", "email_events", plan.get("Relation Name", ""))
+    if plan.get("Node Type") == "Seq Scan" and relation in LARGE_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def explain(db: Session, query) -> dict:
+    statement = getattr(query, "statement", query)
+    sql = statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    # Driver-level execution: the literal SQL must not be parsed for bind parameters
+    row = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+    plan = row if isinstance(row, list) else json.loads(row)
+    return plan[0]["Plan"]
+
+
+def seed(engine, events: int) -> None:
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        # The seeded mail goes back one event per 30 seconds
+        ensure_partitions(db, months_back=events * 30 // (86400 * 28) + 1)
+    with engine.begin() as conn:
+        existing = conn.execute(text("SELECT count(*) FROM email_events")).scalar()
+        if existing >= events:
+            print(f"Using {existing} existing events")
+            return
+        if existing:
+            sys.exit("Database has fewer events than requested; use an empty database")
+        started = time.monotonic()
+        for statement in SEED_SQL:
+            conn.execute(text(statement), {"events": events} if ":events" in statement else {})
+        print(f"Seeded {events} events in {time.monotonic() - started:.0f}s")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE"))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True, help="throwaway Postgres database")
+    parser.add_argument("--events", type=int, default=DEFAULT_EVENTS)
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    seed(engine, args.events)
+
+    failures = []
+    with Session(engine) as db:
+        for name, query in hot_queries(db).items():
+            plan = explain(db, query)
+            scans = seq_scans(plan)
+            status = "SEQ SCAN on " + ", ".join(scans) if scans else "ok"
+            print(f"{name:32} {plan['Node Type']:20} cost={plan['Total Cost']:<10} {status}")
+            if args.verbose:
+                print(json.dumps(plan, indent=2))
+            if scans:
+                failures.append(name)
+        db.rollback()
+
+    if failures:
+        print(f"\n{len(failures)} hot queries fall back to a sequential scan: {', '.join(failures)}")
+        return 1
+    print("\nAll hot queries use indexes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""Local stand-in for the OpenAI Batch API (files and batches endpoints only).
+
+Answers every chat completion request of a batch with a fixed German reply and
+completes a batch on its first poll, so submit_batch_job / collect_batch_results
+can be exercised without an OpenAI account or a 24h wait. Requests whose
+custom_id is in FakeBatchState.failing come back with an error instead.
+
+    python scripts/fake_batch_server.py --port 8900
+    OPENAI_BATCH_BASE_URL=http://localhost:8900/v1 OPENAI_API_KEY=fake BATCH_MODE_ENABLED=true ...
+
+State is kept in memory and lost on restart.
+"""
+
+import argparse
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.responses import PlainTextResponse
+
+REPLY = "Vielen Dank fuer Ihre Nachricht. Wir melden uns in Kuerze bei Ihnen."
+
+
+@dataclass
+class FakeBatchState:
+    files: dict[str, dict] = field(default_factory=dict)
+    contents: dict[str, str] = field(default_factory=dict)
+    batches: dict[str, dict] = field(default_factory=dict)
+    # custom_ids answered with an error instead of a reply
+    failing: set[str] = field(default_factory=set)
+
+
+def _store_file(state: FakeBatchState, filename: str, purpose: str, content: str) -> dict:
+    file_id = f"file-{uuid.uuid4().hex}"
+    state.files[file_id] = {
+        "id": file_id,
+        "object": "file",
+        "bytes": len(content.encode("utf-8")),
+        "created_at": int(time.time()),
+        "filename": filename,
+        "purpose": purpose,
+        "status": "processed",
+    }
+    state.contents[file_id] = content
+    return state.files[file_id]
+
+
+def _result_line(state: FakeBatchState, request: dict) -> str:
+    custom_id = request["custom_id"]
+    if custom_id in state.failing:
+        response = {"status_code": 500, "request_id": uuid.uuid4().hex, "body": {"error": {"message": "fake failure"}}}
+    else:
+        response = {
+            "status_code": 200,
+            "request_id": uuid.uuid4().hex,
+            "body": {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "model": request["body"]["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": REPLY},
+                        "finish_reason": "stop",
+                    },
+                ],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120},
+            },
+        }
+    return json.dumps({"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": custom_id, "response": response})
+
+
+def create_app(state: FakeBatchState | None = None) -> FastAPI:
+    state = state or FakeBatchState()
+    app = FastAPI(title="Fake OpenAI Batch API")
+    app.state.batch = state
+
+    @app.post("/v1/files")
+    async def create_file(file: UploadFile = File(...), purpose: str = Form(...)):
+        return _store_file(state, file.filename or "upload.jsonl", purpose, (await file.read()).decode("utf-8"))
+
+    @app.get("/v1/files/{file_id}/content", response_class=PlainTextResponse)
+    def file_content(file_id: str):
+        if file_id not in state.contents:
+            raise HTTPException(status_code=404, detail="No such file")
+        return state.contents[file_id]
+
+    @app.post("/v1/batches")
+    def create_batch(body: dict):
+        if body.get("input_file_id") not in state.contents:
+            raise HTTPException(status_code=400, detail="Unknown input_file_id")
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        state.batches[batch_id] = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": body["endpoint"],
+            "input_file_id": body["input_file_id"],
+            "completion_window": body["completion_window"],
+            "status": "validating",
+            "created_at": int(time.time()),
+            "output_file_id": None,
+            "error_file_id": None,
+        }
+        return state.batches[batch_id]
+
+    @app.get("/v1/batches/{batch_id}")
+    def retrieve_batch(batch_id: str):
+        batch = state.batches.get(batch_id)
+        if batch is None:
+            raise HTTPException(status_code=404, detail="No such batch")
+        if batch["status"] == "validating":
+            requests = [json.loads(line) for line in state.contents[batch["input_file_id"]].splitlines() if line]
+            output = "\n".join(_result_line(state, request) for request in requests)
+            batch["output_file_id"] = _store_file(state, "batch_output.jsonl", "batch_output", output)["id"]
+            batch["status"] = "completed"
+            batch["completed_at"] = int(time.time())
+        return batch
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    args = parser.parse_args()
+    uvicorn.run(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Shared fixtures.
+
+Tests marked postgres run against the throwaway database in TEST_DATABASE_URL
+(e.g. postgresql://user:pw@localhost/mailki_test) and are skipped without it.
+They create the schema there and empty every table, so never point it at a
+real database.
+"""
+
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session, sessionmaker
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from app.db.base import Base  # noqa: E402
+from app.services.retention import ensure_partitions  # noqa: E402
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "postgres: needs the throwaway database in TEST_DATABASE_URL")
+
+
+@pytest.fixture(scope="session")
+def pg_engine():
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL not set")
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        ensure_partitions(db)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(pg_engine):
+    """A session like SessionLocal's on an emptied database."""
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    with pg_engine.begin() as conn:
+        conn.execute(text(f"TRUNCATE {tables} CASCADE"))
+    session = sessionmaker(autocommit=False, autoflush=False, bind=pg_engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def fake_batch_server():
+    """scripts/fake_batch_server.py on a free local port. Yields (base_url, state)."""
+    import uvicorn
+    from fake_batch_server import FakeBatchState, create_app
+
+    state = FakeBatchState()
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(create_app(state), log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield f"http://127.0.0.1:{sock.getsockname()[1]}/v1", state
+    server.should_exit = True
+    thread.join()
+    sock.close()
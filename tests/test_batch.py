@@ -0,0 +1,134 @@
+import json
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.db.models import EmailDraft, EmailEvent, LLMBatchJob, LLMUsage, Mailbox, ThreadDigest, User
+from app.services import batch
+from app.services.batch import _batch_client, _parse_output, collect_batch_results, submit_batch_job
+from app.services.digest import get_thread_context
+from app.services.llm import completions
+
+
+@pytest.fixture
+def batch_settings(monkeypatch, fake_batch_server):
+    base_url, state = fake_batch_server
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "fake")
+    monkeypatch.setattr(settings, "OPENAI_BATCH_BASE_URL", base_url)
+    monkeypatch.setattr(settings, "BATCH_MIN_REQUESTS", 1)
+    monkeypatch.setattr(settings, "PRECEDENTS_ENABLED", False)
+    monkeypatch.setattr(settings, "THREAD_DIGEST_ENABLED", True)
+    return state
+
+
+@pytest.fixture
+def interactive_calls(monkeypatch):
+    """Interactive completions made during the test; they fail, the batch flow must not need them."""
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        raise AssertionError("interactive completion")
+
+    monkeypatch.setattr(completions, "create", create)
+    return calls
+
+
+def _event(db, mailbox, thread_id, received_at):
+    event = EmailEvent(
+        mailbox_id=mailbox.id,
+        gmail_message_id=f"msg-{uuid.uuid4().hex}",
+        thread_id=thread_id,
+        sender="kunde@example.com",
+        recipient="inbox@example.com",
+        subject="Rechnung 4711",
+        body_text="Guten Tag, wann kommt die Rechnung?",
+        received_at=received_at,
+        priority="normal",
+    )
+    db.add(event)
+    return event
+
+
+def _mailbox(db):
+    user = User(email="batch-test@example.com", name="Batch Test")
+    mailbox = Mailbox(user=user, email_address="inbox@example.com")
+    db.add_all([user, mailbox])
+    return mailbox
+
+
+def test_fake_server_output_parses(batch_settings):
+    state = batch_settings
+    state.failing.add("broken")
+    client = _batch_client()
+    lines = "\n".join(
+        json.dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Hallo"}]},
+        })
+        for custom_id in ("ok", "broken")
+    )
+    input_file = client.files.create(file=("batch.jsonl", lines.encode("utf-8")), purpose="batch")
+    submitted = client.batches.create(
+        input_file_id=input_file.id, endpoint="/v1/chat/completions", completion_window="24h"
+    )
+    finished = client.batches.retrieve(submitted.id)
+
+    assert finished.status in batch.TERMINAL_STATES
+    replies = _parse_output(client.files.content(finished.output_file_id).text)
+    assert set(replies) == {"ok"}
+    reply, usage = replies["ok"]
+    assert reply and usage["prompt_tokens"] == 100
+
+
+@pytest.mark.postgres
+def test_submit_and_collect_round_trip(db, batch_settings, interactive_calls, monkeypatch):
+    state = batch_settings
+    mailbox = _mailbox(db)
+    now = datetime.utcnow().replace(microsecond=0)
+    answered = _event(db, mailbox, "thread-ok", now - timedelta(hours=2))
+    failing = _event(db, mailbox, "thread-failing", now - timedelta(hours=1))
+    db.commit()
+    state.failing.add(str(failing.id))
+
+    job = submit_batch_job(db)
+    assert job is not None and job.request_count == 2
+    assert {e.batch_job_id for e in db.query(EmailEvent).all()} == {job.id}
+
+    drafts = collect_batch_results(db)
+
+    assert [d.email_event_id for d in drafts] == [answered.id]
+    assert db.get(LLMBatchJob, job.id).status == "completed"
+    db.refresh(answered)
+    db.refresh(failing)
+    assert answered.is_processed and answered.digest_pending
+    assert not failing.is_processed and failing.batch_job_id is None and failing.batch_attempts == 1
+    assert [u.purpose for u in db.query(LLMUsage).all()] == ["batch"]
+    # Collecting summarizes nothing; the digest waits for the next message in the thread
+    assert interactive_calls == []
+    assert db.query(ThreadDigest).count() == 0
+
+    # A second collect finds nothing left to do
+    assert collect_batch_results(db) == []
+
+    # The next message folds the batch reply's message into the digest
+    response = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="Kunde fragt nach Rechnung 4711."))],
+        usage=SimpleNamespace(prompt_tokens=50, completion_tokens=10),
+        model=settings.OPENAI_MODEL,
+    )
+    monkeypatch.setattr(completions, "create", lambda **kwargs: response)
+    follow_up = _event(db, mailbox, "thread-ok", now)
+    db.commit()
+
+    assert get_thread_context(db, follow_up) == "Kunde fragt nach Rechnung 4711."
+    db.commit()
+    db.refresh(answered)
+    assert not answered.digest_pending
+    draft = db.query(EmailDraft).filter_by(email_event_id=answered.id).one()
+    assert sorted(u.purpose for u in draft.llm_usage) == ["batch", "digest"]
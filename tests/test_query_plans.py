@@ -0,0 +1,26 @@
+"""Query-plan regression check (scripts/check_query_plans.py) as a test.
+
+Seeds TEST_DATABASE_URL with TEST_QUERY_PLAN_EVENTS events (default as the
+script, 1M; takes a minute or two) and fails if a hot query scans email_events
+or email_drafts sequentially.
+"""
+
+import os
+
+import pytest
+from sqlalchemy.orm import Session
+
+from check_query_plans import DEFAULT_EVENTS, explain, hot_queries, seed, seq_scans
+
+
+@pytest.mark.postgres
+def test_hot_queries_use_indexes(db, pg_engine):
+    # db has emptied the tables, so seed fills them from scratch
+    db.close()
+    seed(pg_engine, int(os.environ.get("TEST_QUERY_PLAN_EVENTS", DEFAULT_EVENTS)))
+
+    with Session(pg_engine) as session:
+        scans = {name: seq_scans(explain(session, query)) for name, query in hot_queries(session).items()}
+        session.rollback()
+
+    assert {name: found for name, found in scans.items() if found} == {}